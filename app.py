@@ -1,39 +1,87 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash, send_file, Response
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash, Response, g, stream_with_context
 from werkzeug.utils import secure_filename
-import qrcode
 import io
-import base64
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
+import logging
 import csv
+import zlib
+import time
 from dotenv import load_dotenv
 from database import init_db
-from db_helper import execute_query, get_db_params
+from db_helper import execute_query, stream_query, get_db_params, acquire_connection, release_connection, PooledConnection
+from attendance_queue import get_attendance_writer, queue_mode_enabled, DUPLICATE
+from session_index import session_index, load_active_sessions, load_session
+from qr_render import get_qr_image, qr_etag, MIMETYPES, QR_BOX_SIZE
+from results_import import import_results
+from attachments import store_upload, send_attachment, init_app as init_attachments
+from attachment_pipeline import get_attachment_processor, is_image, thumbnail_path, send_thumbnail, repoint_if_moved
+from passwords import hash_password, verify_password, needs_rehash, PasswordHashBusy, PASSWORD_REHASH_ON_LOGIN
+from certificates import FORMATS as CERTIFICATE_FORMATS, certificate_fields, get_certificate, iter_certificates, archive_name, stream_zip
+from at_risk import at_risk_scheduler, last_run
+from response_cache import cached_response, invalidate
+from http_cache import conditional_response, init_app as init_http_cache
+from assets import init_app as init_assets
+from template_cache import init_app as init_templates, template_stats
+from metrics import init_app as init_metrics, render_prometheus
+from query_log import init_app as init_query_log
+from rollups import ROLLUPS, parse_range, distinct_present_students, daily_totals, timeseries
+from pagination import get_page_args, get_date_range, keyset_clause, paginated_response
+from qr_tokens import (new_session_id, issue_token, verify_token, current_issue_time, InvalidToken, QR_TOKEN_ROTATE_SECONDS,
+                       manual_code, match_manual_code, QR_CODE_ROTATE_SECONDS)
 
 # Load environment variables
 load_dotenv()
 
+# app.logger and the background modules' loggers share one handler; LOG_LEVEL=DEBUG for more
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO'), format='%(asctime)s %(levelname)s [%(name)s] %(message)s')
+
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'fallback-secret-key')
 app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', 5242880))
+app.config['CSV_EXPORT_CHUNK_ROWS'] = int(os.getenv('CSV_EXPORT_CHUNK_ROWS', 1000))
+
+# The password-hashing and certificate pools spawn processes that re-import the main
+# module as __mp_main__; under `python app.py` that is this file, and they serve nothing
+if __name__ != '__mp_main__':
+    # Initialize database
+    init_db()
+
+    # Request timing, registered first so the other request hooks are included
+    init_metrics(app)
 
-# Initialize database
-init_db()
+    # Per-request statement counts, slow-query plans and N+1 warnings
+    init_query_log(app)
+
+    # Shared Jinja bytecode cache and optional template warm-up
+    init_templates(app)
+
+    # Fingerprinted, precompressed static assets (falls back to plain files if not built)
+    try:
+        init_assets(app, build=os.getenv('ASSETS_BUILD_ON_STARTUP', '1') == '1')
+    except OSError as e:
+        app.logger.warning('Static asset build failed, serving unbuilt files: %s', e)
+        init_assets(app)
 
 def get_db_connection():
-    database_url = os.getenv('DATABASE_URL', 'sqlite:///attendance.db')
-    
-    if database_url.startswith('postgresql'):
-        import psycopg2
-        from psycopg2.extras import RealDictCursor
-        conn = psycopg2.connect(database_url, cursor_factory=RealDictCursor)
-        return conn
-    else:
-        import sqlite3
-        conn = sqlite3.connect('attendance.db')
-        conn.row_factory = sqlite3.Row
-        return conn
+    # One pooled connection per app context, returned to the pool on teardown
+    if 'db_conn' not in g:
+        g.db_conn = PooledConnection(acquire_connection())
+    return g.db_conn
+
+init_http_cache(app, get_db_connection)
+init_attachments(app)
+
+@app.teardown_appcontext
+def return_db_connection(exception):
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        release_connection(conn.raw)
+
+@app.before_request
+def start_background_jobs():
+    # Cheap pid check; (re)starts the schedule in each worker after fork
+    at_risk_scheduler.ensure_started()
 
 def login_required(f):
     from functools import wraps
@@ -74,6 +122,23 @@ def student_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def hashing_busy(template):
+    flash('Too many sign-ins right now. Please try again in a few seconds.')
+    return render_template(template), 503, {'Retry-After': '2'}
+
+def rehash_password(user, password):
+    """Store the password under the current hash settings; if this fails the next login tries again"""
+    try:
+        password_hash = hash_password(password)
+        conn = get_db_connection()
+        # Only replace the hash that was just verified, never a concurrent password change
+        conn.execute('UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?',
+                     (password_hash, user['id'], user['password_hash']))
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        app.logger.warning('Password rehash failed for user %s: %s', user['id'], e)
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
@@ -86,10 +151,17 @@ def login():
         conn.close()
         
         if user:
-            if check_password_hash(user['password_hash'], password):
+            try:
+                valid = verify_password(user['password_hash'], password)
+            except PasswordHashBusy:
+                return hashing_busy('login.html')
+            if valid:
                 if user['role'] != user_type:
                     flash(f'Please select the correct user type. You are registered as a {user["role"]}')
                     return render_template('login.html')
+                
+                if PASSWORD_REHASH_ON_LOGIN and needs_rehash(user['password_hash']):
+                    rehash_password(user, password)
                     
                 session['user_id'] = user['id']
                 session['username'] = user['username']
@@ -143,7 +215,11 @@ def register():
                     return render_template('register.html')
             
             # Create new user
-            password_hash = generate_password_hash(password)
+            try:
+                password_hash = hash_password(password)
+            except PasswordHashBusy:
+                conn.close()
+                return hashing_busy('register.html')
             cursor = conn.cursor()
             cursor.execute('INSERT INTO users (username, email, password_hash, role) VALUES (?, ?, ?, ?)',
                          (username, email, password_hash, role))
@@ -159,6 +235,8 @@ def register():
             
             conn.commit()
             conn.close()
+            if role == 'student':
+                invalidate('students')
             
             flash('Registration successful! Please login.')
             return redirect(url_for('login'))
@@ -200,11 +278,13 @@ def index():
                          student_name=student['name'],
                          student_id=student['student_id'],
                          student_email=student['email'],
-                         student_division=student.get('division', 'Not Set'),
-                         student_year=student.get('academic_year', 'Not Set'))
+                         student_division=student['division'] or 'Not Set',
+                         student_year=student['academic_year'] or 'Not Set')
 
 @app.route('/get_student_subjects')
 @login_required
+@conditional_response(tables=('subjects',))
+@cached_response(tags=('subjects',))
 def get_student_subjects():
     if session.get('role') != 'student':
         return jsonify({'success': False, 'message': 'Unauthorized'})
@@ -280,21 +360,89 @@ def teacher_dashboard():
         SELECT * FROM subjects WHERE teacher_id = ? ORDER BY created_at DESC
     ''', (session['user_id'],)).fetchall()
     
+    # Precomputed by the at-risk batch job
+    at_risk = get_at_risk_rows(conn, session['user_id'])
+    at_risk_run = last_run(conn)
+    
     conn.close()
     
     if not teacher:
         flash('Teacher profile not found.')
         return redirect(url_for('login'))
     
-    return render_template('teacher_dashboard.html', teacher_name=teacher['name'], subjects=subjects)
+    return render_template('teacher_dashboard.html', teacher_name=teacher['name'], subjects=subjects,
+                           at_risk=at_risk, at_risk_run=at_risk_run)
+
+def get_at_risk_rows(conn, teacher_id=None, subject_id=None):
+    query = '''
+        SELECT ar.student_id, st.name AS student_name, ar.subject_id, sub.name AS subject_name,
+               ar.sessions_held, ar.sessions_attended, ar.attendance_pct, ar.results_avg,
+               ar.reasons, ar.computed_at
+        FROM at_risk_students ar
+        JOIN subjects sub ON sub.id = ar.subject_id
+        LEFT JOIN students st ON st.student_id = ar.student_id
+    '''
+    clauses, params = [], []
+    if teacher_id is not None:
+        clauses.append('sub.teacher_id = ?')
+        params.append(teacher_id)
+    if subject_id is not None:
+        clauses.append('ar.subject_id = ?')
+        params.append(subject_id)
+    if clauses:
+        query += ' WHERE ' + ' AND '.join(clauses)
+    query += ' ORDER BY sub.name, ar.attendance_pct, ar.student_id'
+    return conn.execute(query, params).fetchall()
+
+@app.route('/get_at_risk_students')
+@login_required
+@conditional_response(tables=('at_risk_runs', 'students', 'subjects'))
+def get_at_risk_students():
+    if session.get('role') not in ['teacher', 'admin']:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    teacher_id = session['user_id'] if session.get('role') == 'teacher' else None
+    subject_id = request.args.get('subject_id', type=int)
+    conn = get_db_connection()
+    rows = get_at_risk_rows(conn, teacher_id, subject_id)
+    run = last_run(conn)
+    conn.close()
+    
+    return jsonify({
+        'computed_at': str(run['finished_at']) if run else None,
+        'students': [dict(row) for row in rows]
+    })
 
 @app.route('/admin')
 @admin_required
 def admin():
     conn = get_db_connection()
     students = conn.execute('SELECT * FROM students').fetchall()
+    subjects = conn.execute('SELECT id, name FROM subjects ORDER BY name').fetchall()
     conn.close()
-    return render_template('admin.html', students=students)
+    return render_template('admin.html', students=students, subjects=subjects)
+
+@app.route('/healthz')
+def healthz():
+    # Liveness plus a round trip to the database; used by load balancers and deploy checks
+    try:
+        get_db_connection().execute('SELECT 1').fetchone()
+    except Exception as e:
+        return jsonify({'status': 'error', 'database': str(e)}), 503
+    return jsonify({'status': 'ok', 'pid': os.getpid()})
+
+@app.route('/metrics')
+def metrics():
+    # Scrapers cannot log in; set METRICS_TOKEN to require "Authorization: Bearer <token>"
+    token = os.getenv('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return Response(status=401)
+    return Response(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/admin/template_stats')
+@admin_required
+def get_template_stats():
+    return jsonify(template_stats.snapshot())
 
 @app.route('/generate_qr', methods=['POST'])
 @login_required
@@ -308,49 +456,84 @@ def generate_qr():
             return jsonify({'success': False, 'message': 'No data received'})
             
         subject = data.get('subject')
-        class_start_time = data.get('class_start_time')
-        class_end_time = data.get('class_end_time')
-        expiry_seconds = int(data.get('expiry_seconds', 300))
+        subject_id = data.get('subject_id')
+        # The admin and activity pages send lecture_time/location/expiry_minutes; they fill the same columns
+        class_start_time = data.get('class_start_time') or data.get('lecture_time')
+        class_end_time = data.get('class_end_time') or data.get('location')
+        if 'expiry_seconds' not in data and data.get('expiry_minutes'):
+            expiry_seconds = int(data['expiry_minutes']) * 60
+        else:
+            expiry_seconds = int(data.get('expiry_seconds', 300))
         
-        if not all([subject, class_start_time, class_end_time]):
+        if not all([subject or subject_id, class_start_time, class_end_time]):
             return jsonify({'success': False, 'message': 'All fields are required'})
         
-        # Generate QR code with current timestamp
-        qr_data = f"attendance_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        # Time-ordered random id: no collisions between teachers generating in the same second
+        qr_data = new_session_id()
         
         # Calculate expiry time
-        from datetime import timedelta
         expiry_time = datetime.now() + timedelta(seconds=expiry_seconds)
         
-        # Store session in database
         conn = get_db_connection()
-        execute_query(conn, '''
-            INSERT INTO sessions (qr_data, subject, lecture_time, location, expiry_time, is_active) 
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (qr_data, subject, class_start_time, class_end_time, expiry_time.strftime('%Y-%m-%d %H:%M:%S'), True))
-        conn.commit()
-        conn.close()
         
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(qr_data)
-        qr.make(fit=True)
+        # Resolve the subject row; older clients only send the name, so fall back
+        # to the subject of that name (a teacher's own, or any for an admin)
+        if str(subject_id).isdigit():
+            # Teachers may only open sessions for their own subjects; admins for any
+            if session['role'] == 'teacher':
+                subject_row = execute_query(conn, 'SELECT id, name FROM subjects WHERE id = ? AND teacher_id = ?',
+                                            (int(subject_id), session['user_id']), fetch_one=True)
+            else:
+                subject_row = execute_query(conn, 'SELECT id, name FROM subjects WHERE id = ?', (int(subject_id),), fetch_one=True)
+            if not subject_row:
+                conn.close()
+                return jsonify({'success': False, 'message': 'Subject not found or access denied'}), 403
+        elif session['role'] == 'teacher':
+            subject_row = execute_query(conn, '''
+                SELECT id, name FROM subjects WHERE name = ? AND teacher_id = ? ORDER BY id LIMIT 1
+            ''', (subject, session['user_id']), fetch_one=True)
+        else:
+            subject_row = execute_query(conn, 'SELECT id, name FROM subjects WHERE name = ? ORDER BY id LIMIT 1',
+                                        (subject,), fetch_one=True)
+        subject_id = subject_row['id'] if subject_row else None
+        subject = subject_row['name'] if subject_row else subject
+        if not subject:
+            conn.close()
+            return jsonify({'success': False, 'message': 'All fields are required'})
         
-        img = qr.make_image(fill_color="black", back_color="white")
+        # Store session in database
+        cursor = execute_query(conn, f'''
+            INSERT INTO sessions (qr_data, subject, subject_id, lecture_time, location, expiry_time, is_active) 
+            VALUES (?, ?, ?, ?, ?, ?, ?) {get_db_params()['returning']}
+        ''', (qr_data, subject, subject_id, class_start_time, class_end_time, expiry_time.strftime('%Y-%m-%d %H:%M:%S'), True))
+        session_pk = cursor.fetchone()['id'] if get_db_params()['returning'] else cursor.lastrowid
+        conn.commit()
+        conn.close()
         
-        # Convert to base64
-        buffer = io.BytesIO()
-        img.save(buffer, format='PNG')
-        buffer.seek(0)
-        img_str = base64.b64encode(buffer.getvalue()).decode()
+        # Make the new session visible to the scan hot path in every worker
+        session_index.add({
+            'id': session_pk,
+            'qr_data': qr_data,
+            'subject': subject,
+            'lecture_time': class_start_time,
+            'expiry_time': expiry_time.strftime('%Y-%m-%d %H:%M:%S')
+        })
         
+        # The image itself is rendered (and cached) by the /qr/ endpoint on first fetch
         return jsonify({
             'success': True,
-            'qr_code': f'data:image/png;base64,{img_str}',
+            'qr_code': url_for('qr_image', session_id=qr_data, fmt='png'),
+            'qr_svg': url_for('qr_image', session_id=qr_data, fmt='svg'),
             'session_id': qr_data,
+            'manual_code_url': url_for('qr_manual_code', session_id=qr_data),
             'subject': subject,
             'class_start_time': class_start_time,
             'class_end_time': class_end_time,
-            'expiry_seconds': expiry_seconds
+            'lecture_time': class_start_time,
+            'location': class_end_time,
+            'expiry_time': expiry_time.strftime('%Y-%m-%d %H:%M:%S'),
+            'expiry_seconds': expiry_seconds,
+            'rotate_seconds': QR_TOKEN_ROTATE_SECONDS
         })
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
@@ -360,40 +543,73 @@ def generate_qr():
 def mark_attendance():
     data = request.json
     student_id = data.get('student_id')
-    session_id = data.get('session_id')
+    token = data.get('session_id')
+    code = data.get('code')
+    
+    if code:
+        # Typed in by hand: match the short code against the live sessions' current codes
+        session_ids = [row['qr_data'] for row in load_active_sessions(get_db_connection())]
+        session_id = match_manual_code(app.secret_key, code, session_ids)
+        if session_id is None:
+            return jsonify({'success': False, 'message': 'QR code expired or invalid'})
+    else:
+        # Reject forged or stale codes on signature and timestamps alone
+        try:
+            session_id, _ = verify_token(app.secret_key, token)
+        except InvalidToken:
+            return jsonify({'success': False, 'message': 'QR code expired or invalid'})
+    
+    # Check if session exists, is active, and not expired (answered from memory
+    # unless the sessions changed since our last sync, or it was created on another host)
+    session_record = session_index.lookup(session_id, lambda: load_active_sessions(get_db_connection()),
+                                          lambda: load_session(get_db_connection(), session_id))
+    if not session_record:
+        return jsonify({'success': False, 'message': 'QR code expired or invalid'})
     
     conn = get_db_connection()
     
-    # Check if student exists
-    student = conn.execute('SELECT * FROM students WHERE student_id = ?', (student_id,)).fetchone()
-    if not student:
+    if queue_mode_enabled():
+        # Check if student exists
+        student = conn.execute('SELECT id FROM students WHERE student_id = ?', (student_id,)).fetchone()
         conn.close()
-        return jsonify({'success': False, 'message': 'Student not found'})
-    
-    # Check if session exists, is active, and not expired
-    db_params = get_db_params()
-    session_record = execute_query(conn, f'''
-        SELECT id, subject, lecture_time, location, expiry_time 
-        FROM sessions 
-        WHERE qr_data = ? AND is_active = ? AND {db_params['now']} <= expiry_time
-    ''', (session_id, True), fetch_one=True)
-    
-    if not session_record:
-        conn.close()
-        return jsonify({'success': False, 'message': 'QR code expired or invalid'})
-    
-    # Check if already marked
-    existing = conn.execute('SELECT id FROM attendance WHERE student_id = ? AND session_id = ?', 
-                          (student_id, session_record['id'])).fetchone()
-    if existing:
+        if not student:
+            return jsonify({'success': False, 'message': 'Student not found'})
+        
+        # Hand the validated scan to the batching writer and wait for its verdict
+        try:
+            result = get_attendance_writer().submit(student_id, session_record['id'])
+        except Exception:
+            return jsonify({'success': False, 'message': 'Could not record attendance, please scan again'})
+        if result == DUPLICATE:
+            return jsonify({'success': False, 'message': 'Already marked attendance'})
+    else:
+        # Validate the student and the live session and insert in one statement;
+        # the unique (student_id, session_id) index turns double-taps into no-ops
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        cursor = execute_query(conn, '''
+            INSERT INTO attendance (student_id, session_id)
+            SELECT st.student_id, ses.id
+            FROM students st JOIN sessions ses ON ses.id = ?
+            WHERE st.student_id = ? AND ses.is_active = ? AND ses.expiry_time >= ?
+            ON CONFLICT (student_id, session_id) DO NOTHING
+        ''', (session_record['id'], student_id, True, now))
+        marked = cursor.rowcount == 1
+        
+        if not marked:
+            # Only the failure path pays for working out why nothing was inserted
+            reason = execute_query(conn, '''
+                SELECT EXISTS (SELECT 1 FROM students WHERE student_id = ?) AS student_exists,
+                       EXISTS (SELECT 1 FROM attendance WHERE student_id = ? AND session_id = ?) AS already_marked
+            ''', (student_id, student_id, session_record['id']), fetch_one=True)
+            conn.close()
+            if not reason['student_exists']:
+                return jsonify({'success': False, 'message': 'Student not found'})
+            if reason['already_marked']:
+                return jsonify({'success': False, 'message': 'Already marked attendance'})
+            return jsonify({'success': False, 'message': 'QR code expired or invalid'})
+        
+        conn.commit()
         conn.close()
-        return jsonify({'success': False, 'message': 'Already marked attendance'})
-    
-    # Mark attendance
-    conn.execute('INSERT INTO attendance (student_id, session_id) VALUES (?, ?)',
-                (student_id, session_record['id']))
-    conn.commit()
-    conn.close()
     
     return jsonify({
         'success': True, 
@@ -402,17 +618,36 @@ def mark_attendance():
 
 @app.route('/get_attendance')
 @login_required
+@conditional_response(tables=('attendance', 'sessions', 'students', 'subjects'))
 def get_attendance():
     if session.get('role') not in ['admin', 'teacher']:
         return jsonify({'success': False, 'message': 'Unauthorized'})
+    
+    # Keyset pagination on (marked_at, id), newest first; filters: from, to, subject_id, student_id
+    try:
+        limit, cursor = get_page_args()
+        filters, params = get_date_range('a.marked_at')
+        keyset, keyset_params = keyset_clause(['a.marked_at', 'a.id'], cursor)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    if request.args.get('subject_id', type=int):
+        filters.append('ses.subject_id = ?')
+        params.append(request.args.get('subject_id', type=int))
+    if request.args.get('student_id'):
+        filters.append('a.student_id = ?')
+        params.append(request.args['student_id'])
+    where = ' AND '.join(filters + keyset) or '1 = 1'
+    
     conn = get_db_connection()
-    attendance_records = conn.execute('''
-        SELECT s.name, s.student_id, a.marked_at, ses.qr_data
+    attendance_records = execute_query(conn, f'''
+        SELECT a.id, s.name, s.student_id, a.marked_at, ses.qr_data
         FROM attendance a
         JOIN students s ON a.student_id = s.student_id
         JOIN sessions ses ON a.session_id = ses.id
-        ORDER BY a.marked_at DESC
-    ''').fetchall()
+        WHERE {where}
+        ORDER BY a.marked_at DESC, a.id DESC
+        LIMIT ?
+    ''', (*params, *keyset_params, limit + 1), fetch_all=True)
     conn.close()
     
     attendance_data = []
@@ -424,10 +659,13 @@ def get_attendance():
             'timestamp': record['marked_at']
         })
     
-    return jsonify(attendance_data)
+    return paginated_response(attendance_data, attendance_records, limit,
+                              lambda record: [record['marked_at'], record['id']])
 
 @app.route('/get_students')
 @login_required
+@conditional_response(tables=('students',))
+@cached_response(tags=('students',))
 def get_students():
     if session.get('role') not in ['admin', 'teacher']:
         return jsonify({'success': False, 'message': 'Unauthorized'})
@@ -476,10 +714,14 @@ def activity():
     
     elif session.get('role') in ['teacher', 'admin']:
         teacher = conn.execute('SELECT name FROM teachers WHERE user_id = ?', (session['user_id'],)).fetchone()
+        if session['role'] == 'teacher':
+            subjects = conn.execute('SELECT id, name FROM subjects WHERE teacher_id = ? ORDER BY name', (session['user_id'],)).fetchall()
+        else:
+            subjects = conn.execute('SELECT id, name FROM subjects ORDER BY name').fetchall()
         conn.close()
         
         teacher_name = teacher['name'] if teacher else 'Teacher'
-        return render_template('teacher_activity.html', teacher_name=teacher_name)
+        return render_template('teacher_activity.html', teacher_name=teacher_name, subjects=subjects)
     
     conn.close()
     flash('Access denied.')
@@ -495,20 +737,45 @@ def analytics():
     conn = get_db_connection()
     total_students = conn.execute('SELECT COUNT(*) as count FROM students').fetchone()['count']
     
-    recent_attendance = conn.execute('''
-        SELECT COUNT(DISTINCT a.student_id) as present_count
-        FROM attendance a
-        WHERE a.marked_at >= date('now', '-30 days')
-    ''').fetchone()
+    # Read the daily rollups rather than scanning raw attendance
+    start, end = parse_range(None, None, default_days=31)
+    present_count = distinct_present_students(conn, start, end)
     
     conn.close()
     
-    attendance_rate = (recent_attendance['present_count'] / total_students * 100) if total_students > 0 else 0
+    attendance_rate = (present_count / total_students * 100) if total_students > 0 else 0
     
     return render_template('analytics.html', 
                          total_students=total_students,
                          attendance_rate=round(attendance_rate, 1))
 
+@app.route('/analytics/timeseries')
+@login_required
+@conditional_response(tables=('attendance',))
+def analytics_timeseries():
+    if session.get('role') not in ['teacher', 'admin']:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    group = request.args.get('group', 'total')
+    key = request.args.get('key')
+    try:
+        start, end = parse_range(request.args.get('from'), request.args.get('to'))
+        if group != 'total' and group not in ROLLUPS:
+            raise ValueError(f'group must be one of: total, {", ".join(ROLLUPS)}')
+        if key is not None and group == 'subject':
+            key = int(key)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    conn = get_db_connection()
+    if group == 'total':
+        series = daily_totals(conn, start, end)
+    else:
+        series = timeseries(conn, group, start, end, key)
+    conn.close()
+    
+    return jsonify({'from': start, 'to': end, 'group': group, 'series': series})
+
 @app.route('/delete_subject', methods=['POST'])
 @login_required
 def delete_subject():
@@ -533,18 +800,12 @@ def delete_subject():
         # Delete attendance records for sessions of this subject
         conn.execute('''
             DELETE FROM attendance WHERE session_id IN (
-                SELECT s.id FROM sessions s 
-                JOIN subjects sub ON s.subject = sub.name 
-                WHERE sub.id = ?
+                SELECT id FROM sessions WHERE subject_id = ?
             )
         ''', (subject_id,))
         
         # Delete sessions for this subject
-        conn.execute('''
-            DELETE FROM sessions WHERE subject IN (
-                SELECT name FROM subjects WHERE id = ?
-            )
-        ''', (subject_id,))
+        conn.execute('DELETE FROM sessions WHERE subject_id = ?', (subject_id,))
         
         # Delete results for this subject
         conn.execute('DELETE FROM results WHERE subject_id = ?', (subject_id,))
@@ -554,6 +815,8 @@ def delete_subject():
         
         conn.commit()
         conn.close()
+        session_index.invalidate()
+        invalidate('subjects')
         return jsonify({'success': True, 'message': 'Subject deleted successfully'})
     except Exception as e:
         conn.close()
@@ -588,6 +851,7 @@ def create_subject():
         subject_id = cursor.lastrowid
         conn.commit()
         conn.close()
+        invalidate('subjects')
         return jsonify({'success': True, 'message': 'Subject created successfully', 'subject_id': subject_id})
     except Exception as e:
         conn.close()
@@ -631,25 +895,18 @@ def submit_leave():
     end_date = request.form.get('endDate')
     reason = request.form.get('reason')
     
-    print(f"Received data: {leave_type}, {start_date}, {end_date}, {reason}")
-    
     if not all([leave_type, start_date, end_date, reason]):
         return jsonify({'success': False, 'message': 'All fields are required'})
     
-    # Handle file upload
-    attachment_path = None
+    # Handle file upload: streamed to disk, hashed and stored once per distinct content
+    attachment = None
     try:
         if 'attachment' in request.files:
             file = request.files['attachment']
             if file and file.filename:
-                upload_dir = 'uploads/leave_documents'
-                os.makedirs(upload_dir, exist_ok=True)
-                
-                filename = secure_filename(f"{session['user_id']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{file.filename}")
-                attachment_path = os.path.join(upload_dir, filename)
-                file.save(attachment_path)
+                attachment = store_upload(file)
     except Exception as e:
-        print(f"File upload error: {str(e)}")
+        app.logger.warning('Leave attachment upload failed: %s', e)
         return jsonify({'success': False, 'message': f'File upload error: {str(e)}'})
     
     conn = get_db_connection()
@@ -661,28 +918,54 @@ def submit_leave():
     
     try:
         conn.execute('''
-            INSERT INTO leave_applications (student_id, student_name, leave_type, start_date, end_date, reason, attachment_path)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (student['student_id'], student['name'], leave_type, start_date, end_date, reason, attachment_path))
+            INSERT INTO leave_applications (student_id, student_name, leave_type, start_date, end_date, reason,
+                                            attachment_path, attachment_name, attachment_sha256)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (student['student_id'], student['name'], leave_type, start_date, end_date, reason,
+              attachment and attachment.path, attachment and attachment.filename, attachment and attachment.sha256))
         conn.commit()
         conn.close()
+        if attachment and attachment.created:
+            # Resized and thumbnailed off the request; the row must exist first so it can be updated
+            get_attachment_processor().submit(attachment.path, attachment.filename)
+        elif attachment:
+            # The identical file we deduped onto may have been re-encoded before our row existed
+            repoint_if_moved(attachment.path)
         return jsonify({'success': True, 'message': 'Leave application submitted successfully'})
     except Exception as e:
         conn.close()
-        print(f"Database error: {str(e)}")
+        app.logger.error('Leave application insert failed: %s', e)
         return jsonify({'success': False, 'message': f'Database error: {str(e)}'})
 
 @app.route('/get_leave_applications')
 @login_required
+@conditional_response(tables=('leave_applications',))
 def get_leave_applications():
     if session.get('role') not in ['teacher', 'admin']:
         return jsonify({'success': False, 'message': 'Unauthorized'})
     
+    # Keyset pagination on (applied_at, id), newest first; filters: from, to, status, student_id
+    try:
+        limit, cursor = get_page_args()
+        filters, params = get_date_range('applied_at')
+        keyset, keyset_params = keyset_clause(['applied_at', 'id'], cursor)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    if request.args.get('status'):
+        filters.append('status = ?')
+        params.append(request.args['status'])
+    if request.args.get('student_id'):
+        filters.append('student_id = ?')
+        params.append(request.args['student_id'])
+    where = ' AND '.join(filters + keyset) or '1 = 1'
+    
     conn = get_db_connection()
-    applications = conn.execute('''
+    applications = execute_query(conn, f'''
         SELECT * FROM leave_applications 
-        ORDER BY applied_at DESC
-    ''').fetchall()
+        WHERE {where}
+        ORDER BY applied_at DESC, id DESC
+        LIMIT ?
+    ''', (*params, *keyset_params, limit + 1), fetch_all=True)
     conn.close()
     
     apps_data = []
@@ -697,10 +980,12 @@ def get_leave_applications():
             'reason': app['reason'],
             'status': app['status'],
             'applied_at': app['applied_at'],
-            'attachment_path': app.get('attachment_path')
+            'attachment_path': app['attachment_path'],
+            'attachment_preview': attachment_preview_url(app)
         })
     
-    return jsonify(apps_data)
+    return paginated_response(apps_data, applications, limit,
+                              lambda app: [app['applied_at'], app['id']])
 
 @app.route('/update_leave_status', methods=['POST'])
 @login_required
@@ -759,6 +1044,7 @@ def create_activity():
         ''', (title, description, activity_type, event_date, start_time, end_time, location, max_participants, requirements, organizer, session['user_id'], certificate_enabled))
         conn.commit()
         conn.close()
+        invalidate('activities')
         return jsonify({'success': True, 'message': 'Activity created successfully'})
     except Exception as e:
         conn.close()
@@ -766,14 +1052,30 @@ def create_activity():
 
 @app.route('/get_activities')
 @login_required
+@conditional_response(tables=('activities', 'teachers'))
+@cached_response(tags=('activities',))
 def get_activities():
+    # Keyset pagination on (event_date, id), soonest first; filters: from, to, activity_type
+    try:
+        limit, cursor = get_page_args()
+        filters, params = get_date_range('a.event_date', include_time=False)
+        keyset, keyset_params = keyset_clause(['a.event_date', 'a.id'], cursor, descending=False)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    if request.args.get('activity_type'):
+        filters.append('a.activity_type = ?')
+        params.append(request.args['activity_type'])
+    where = ' AND '.join(filters + keyset) or '1 = 1'
+    
     conn = get_db_connection()
-    activities = conn.execute('''
+    activities = execute_query(conn, f'''
         SELECT a.*, t.name as teacher_name
         FROM activities a
         JOIN teachers t ON a.teacher_id = t.user_id
-        ORDER BY a.event_date ASC
-    ''').fetchall()
+        WHERE {where}
+        ORDER BY a.event_date ASC, a.id ASC
+        LIMIT ?
+    ''', (*params, *keyset_params, limit + 1), fetch_all=True)
     conn.close()
     
     activities_data = []
@@ -794,7 +1096,8 @@ def get_activities():
             'created_at': activity['created_at']
         })
     
-    return jsonify(activities_data)
+    return paginated_response(activities_data, activities, limit,
+                              lambda activity: [activity['event_date'], activity['id']])
 
 @app.route('/download_attachment/<int:app_id>')
 @login_required
@@ -803,17 +1106,55 @@ def download_attachment(app_id):
         return jsonify({'success': False, 'message': 'Unauthorized'})
     
     conn = get_db_connection()
-    app = conn.execute('SELECT attachment_path FROM leave_applications WHERE id = ?', (app_id,)).fetchone()
+    app = conn.execute('''
+        SELECT attachment_path, attachment_name, attachment_sha256 FROM leave_applications WHERE id = ?
+    ''', (app_id,)).fetchone()
     conn.close()
     
     if not app or not app['attachment_path']:
         return jsonify({'success': False, 'message': 'File not found'})
     
+    if not os.path.exists(app['attachment_path']) and repoint_if_moved(app['attachment_path']):
+        return redirect(url_for('download_attachment', app_id=app_id))
+    
     if os.path.exists(app['attachment_path']):
-        return send_file(app['attachment_path'], as_attachment=True)
+        # Conditional and Range requests are answered here (or by the proxy with a sendfile hand-off)
+        return send_attachment(app['attachment_path'], app['attachment_name'], app['attachment_sha256'])
     else:
         return jsonify({'success': False, 'message': 'File not found on server'})
 
+def attachment_preview_url(app_row):
+    if app_row['attachment_path'] and is_image(app_row['attachment_name'] or app_row['attachment_path']):
+        return url_for('attachment_thumbnail', app_id=app_row['id'])
+    return None
+
+@app.route('/attachment_thumbnail/<int:app_id>')
+@login_required
+def attachment_thumbnail(app_id):
+    if session.get('role') not in ['teacher', 'admin']:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+    
+    conn = get_db_connection()
+    app = conn.execute('''
+        SELECT attachment_path, attachment_name FROM leave_applications WHERE id = ?
+    ''', (app_id,)).fetchone()
+    conn.close()
+    
+    if not app or not app['attachment_path'] or not is_image(app['attachment_name'] or app['attachment_path']):
+        return jsonify({'success': False, 'message': 'No preview'}), 404
+    
+    if os.path.exists(thumbnail_path(app['attachment_path'])):
+        return send_thumbnail(app['attachment_path'])
+    if not os.path.exists(app['attachment_path']) and repoint_if_moved(app['attachment_path']):
+        return redirect(url_for('attachment_thumbnail', app_id=app_id))
+    
+    # Uploaded before previews existed, or still being processed: queue it and let the page retry later
+    if os.path.exists(app['attachment_path']):
+        get_attachment_processor().submit(app['attachment_path'], app['attachment_name'])
+    response = jsonify({'success': False, 'message': 'Preview not ready'})
+    response.headers['Cache-Control'] = 'no-store'
+    return response, 404
+
 @app.route('/qr_display/<session_id>')
 @login_required
 def qr_display(session_id):
@@ -830,31 +1171,73 @@ def qr_display(session_id):
         flash('QR session not found or expired')
         return redirect(url_for('teacher_dashboard'))
     
-    # Generate QR code
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(session_id)
-    qr.make(fit=True)
-    
-    img = qr.make_image(fill_color="black", back_color="white")
-    buffer = io.BytesIO()
-    img.save(buffer, format='PNG')
-    buffer.seek(0)
-    img_str = base64.b64encode(buffer.getvalue()).decode()
-    
     # Calculate remaining time
-    from datetime import datetime
     expiry_time = datetime.strptime(qr_session['expiry_time'], '%Y-%m-%d %H:%M:%S')
     remaining_seconds = max(0, int((expiry_time - datetime.now()).total_seconds()))
     
     return render_template('qr_display.html',
                          subject=qr_session['subject'],
-                         qr_image=img_str,
+                         qr_image_url=url_for('qr_image', session_id=session_id, fmt='svg'),
+                         manual_code_url=url_for('qr_manual_code', session_id=session_id),
+                         rotate_seconds=QR_TOKEN_ROTATE_SECONDS,
                          class_start_time=datetime.strptime(qr_session['lecture_time'], '%Y-%m-%dT%H:%M'),
                          class_end_time=datetime.strptime(qr_session['location'], '%Y-%m-%dT%H:%M'),
                          expiry_seconds=remaining_seconds)
 
+@app.route('/qr/<session_id>.<fmt>')
+@login_required
+def qr_image(session_id, fmt):
+    if session.get('role') not in ['admin', 'teacher']:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+    if fmt not in MIMETYPES:
+        return jsonify({'success': False, 'message': 'Unsupported format'}), 404
+    
+    box_size = min(max(request.args.get('size', QR_BOX_SIZE, type=int), 2), 20)
+    qr_session = session_index.lookup(session_id, lambda: load_active_sessions(get_db_connection()),
+                                      lambda: load_session(get_db_connection(), session_id))
+    if not qr_session:
+        return jsonify({'success': False, 'message': 'QR session not found or expired'}), 404
+    
+    # Every worker signs the same token within a rotation window, so the image
+    # can be cached until the window (or the session) ends
+    issued_at = current_issue_time()
+    token = issue_token(app.secret_key, session_id, qr_session['expiry_time'].timestamp(), issued_at)
+    valid_until = min(datetime.fromtimestamp(issued_at + QR_TOKEN_ROTATE_SECONDS), qr_session['expiry_time'])
+    max_age = max(0, int((valid_until - datetime.now()).total_seconds()))
+    
+    etag = qr_etag(token, fmt, box_size)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        body = get_qr_image(token, fmt, box_size, expires_at=valid_until)
+        response = Response(body, mimetype=MIMETYPES[fmt])
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'private, max-age={max_age}'
+    return response
+
+@app.route('/qr/<session_id>/code')
+@login_required
+def qr_manual_code(session_id):
+    if session.get('role') not in ['admin', 'teacher']:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+    qr_session = session_index.lookup(session_id, lambda: load_active_sessions(get_db_connection()),
+                                      lambda: load_session(get_db_connection(), session_id))
+    if not qr_session:
+        return jsonify({'success': False, 'message': 'QR session not found or expired'}), 404
+    
+    now = int(time.time())
+    response = jsonify({
+        'success': True,
+        'code': manual_code(app.secret_key, session_id),
+        'rotate_seconds': QR_CODE_ROTATE_SECONDS,
+        'expires_in': QR_CODE_ROTATE_SECONDS - now % QR_CODE_ROTATE_SECONDS
+    })
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
 @app.route('/get_subject_attendance/<int:subject_id>')
 @login_required
+@conditional_response(tables=('attendance', 'sessions', 'students', 'subjects'))
 def get_subject_attendance(subject_id):
     if session.get('role') != 'teacher':
         return jsonify({'success': False, 'message': 'Unauthorized'})
@@ -865,7 +1248,7 @@ def get_subject_attendance(subject_id):
         FROM attendance a
         JOIN students s ON a.student_id = s.student_id
         JOIN sessions ses ON a.session_id = ses.id
-        JOIN subjects sub ON ses.subject = sub.name
+        JOIN subjects sub ON ses.subject_id = sub.id
         WHERE sub.id = ? AND sub.teacher_id = ?
         ORDER BY a.marked_at DESC
     ''', (subject_id, session['user_id'])).fetchall()
@@ -894,33 +1277,63 @@ def download_attendance_csv(subject_id):
         conn.close()
         return jsonify({'success': False, 'message': 'Subject not found'})
     
-    attendance_records = conn.execute('''
+    # Optional date range (inclusive, YYYY-MM-DD) for whole-term extracts
+    try:
+        date_clauses, date_params = get_date_range('a.marked_at')
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Dates must be in YYYY-MM-DD format'})
+    date_filters = ''.join(f' AND {clause}' for clause in date_clauses)
+    params = [subject_id, session['user_id'], *date_params]
+    
+    query = f'''
         SELECT s.name, s.student_id, a.marked_at, ses.subject
         FROM attendance a
         JOIN students s ON a.student_id = s.student_id
         JOIN sessions ses ON a.session_id = ses.id
-        JOIN subjects sub ON ses.subject = sub.name
-        WHERE sub.id = ? AND sub.teacher_id = ?
+        JOIN subjects sub ON ses.subject_id = sub.id
+        WHERE sub.id = ? AND sub.teacher_id = ?{date_filters}
         ORDER BY a.marked_at DESC
-    ''', (subject_id, session['user_id'])).fetchall()
-    conn.close()
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['Student Name', 'Student ID', 'Subject', 'Attendance Date'])
+    '''
+    chunk_rows = app.config['CSV_EXPORT_CHUNK_ROWS']
+    
+    def generate_csv():
+        # Rows flow from the cursor a chunk at a time, so memory stays flat
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(['Student Name', 'Student ID', 'Subject', 'Attendance Date'])
+        yield output.getvalue()
+        
+        for rows in stream_query(conn, query, params, chunk_rows):
+            output.seek(0)
+            output.truncate(0)
+            for record in rows:
+                writer.writerow([record['name'], record['student_id'], record['subject'], record['marked_at']])
+            yield output.getvalue()
+        conn.close()
     
-    for record in attendance_records:
-        writer.writerow([record['name'], record['student_id'], record['subject'], record['marked_at']])
+    def generate_gzip(chunks):
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            data = compressor.compress(chunk.encode('utf-8'))
+            if data:
+                yield data
+        yield compressor.flush()
+    
+    filename = f'{subject["name"]}_attendance.csv'
+    if request.args.get('gzip') == '1':
+        body, mimetype, filename = generate_gzip(generate_csv()), 'application/gzip', filename + '.gz'
+    else:
+        body, mimetype = generate_csv(), 'text/csv'
     
-    output.seek(0)
     return Response(
-        output.getvalue(),
-        mimetype='text/csv',
-        headers={'Content-Disposition': f'attachment; filename={subject["name"]}_attendance.csv'}
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
     )
 
 @app.route('/get_subject_leave_applications/<int:subject_id>')
 @login_required
+@conditional_response(tables=('leave_applications', 'subjects'))
 def get_subject_leave_applications(subject_id):
     if session.get('role') != 'teacher':
         return jsonify({'success': False, 'message': 'Unauthorized'})
@@ -949,7 +1362,8 @@ def get_subject_leave_applications(subject_id):
             'reason': app['reason'],
             'status': app['status'],
             'applied_at': app['applied_at'],
-            'attachment_path': app.get('attachment_path')
+            'attachment_path': app['attachment_path'],
+            'attachment_preview': attachment_preview_url(app)
         })
     
     return jsonify(apps_data)
@@ -986,6 +1400,8 @@ def enter_result():
 
 @app.route('/get_students_subjects')
 @login_required
+@conditional_response(tables=('students', 'subjects'))
+@cached_response(tags=('students', 'subjects'), vary_on_user=True)
 def get_students_subjects():
     if session.get('role') != 'teacher':
         return jsonify({'success': False, 'message': 'Unauthorized'})
@@ -1013,42 +1429,25 @@ def upload_results_csv():
     if file.filename == '' or not file.filename.endswith('.csv'):
         return jsonify({'success': False, 'message': 'Please upload a CSV file'})
     
+    conn = get_db_connection()
     try:
-        content = file.read().decode('utf-8')
-        lines = content.strip().split('\n')
-        
-        if len(lines) < 2:
-            return jsonify({'success': False, 'message': 'CSV must have header and data rows'})
-        
-        conn = get_db_connection()
-        success_count = 0
-        error_count = 0
-        
-        for line in lines[1:]:  # Skip header
-            try:
-                parts = [p.strip() for p in line.split(',')]
-                if len(parts) >= 6:
-                    student_id, name, subject_id, exam_type, marks_obtained, max_marks = parts[:6]
-                    remarks = parts[6] if len(parts) > 6 else ''
-                    
-                    conn.execute('''
-                        INSERT INTO results (student_id, subject_id, exam_type, marks_obtained, max_marks, remarks, teacher_id, created_at)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'))
-                    ''', (student_id, int(subject_id), exam_type, float(marks_obtained), float(max_marks), remarks, session['user_id']))
-                    success_count += 1
-            except:
-                error_count += 1
-        
-        conn.commit()
+        report = import_results(conn, file.stream, session['user_id'])
+    except ValueError as e:
         conn.close()
-        
-        return jsonify({
-            'success': True, 
-            'message': f'Uploaded {success_count} results successfully. {error_count} errors.'
-        })
-    
+        return jsonify({'success': False, 'message': str(e)})
+    except UnicodeDecodeError:
+        conn.close()
+        return jsonify({'success': False, 'message': 'CSV file must be UTF-8 encoded'})
     except Exception as e:
+        conn.close()
         return jsonify({'success': False, 'message': 'Failed to process CSV file'})
+    conn.close()
+    
+    return jsonify({
+        'success': True, 
+        'message': f'Uploaded {report.inserted} results successfully. {report.error_count} errors.',
+        **report.to_dict()
+    })
 
 @app.route('/join_activity/<int:activity_id>', methods=['POST'])
 @login_required
@@ -1105,10 +1504,53 @@ def download_certificate(activity_id):
         flash('Certificate not available')
         return redirect(url_for('index'))
     
+    # ?format=pdf or png returns a rendered file (cached on disk) instead of the printable page
+    fmt = request.args.get('format')
+    if fmt in CERTIFICATE_FORMATS:
+        data, key = get_certificate(certificate_fields(student['name'], student['student_id'], activity), fmt)
+        response = Response(data, mimetype=CERTIFICATE_FORMATS[fmt])
+        response.headers['Content-Disposition'] = f'attachment; filename="certificate-{activity_id}.{fmt}"'
+        response.set_etag(key)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response.make_conditional(request)
+    
     return render_template('certificate.html', 
                          student_name=student['name'],
                          student_id=student['student_id'],
                          activity=activity)
 
+@app.route('/activity_certificates/<int:activity_id>')
+@login_required
+def activity_certificates(activity_id):
+    """Every participant's certificate for one activity, streamed as a zip"""
+    if session.get('role') not in ['teacher', 'admin']:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+    
+    fmt = request.args.get('format', 'pdf')
+    if fmt not in CERTIFICATE_FORMATS:
+        return jsonify({'success': False, 'message': 'format must be pdf or png'}), 400
+    
+    conn = get_db_connection()
+    activity = conn.execute('SELECT * FROM activities WHERE id = ? AND certificate_enabled = 1', (activity_id,)).fetchone()
+    if not activity or (session.get('role') == 'teacher' and activity['teacher_id'] != session['user_id']):
+        conn.close()
+        return jsonify({'success': False, 'message': 'Activity not found'}), 404
+    
+    participants = conn.execute('''
+        SELECT ap.student_id, COALESCE(s.name, ap.student_name) AS name
+        FROM activity_participants ap
+        LEFT JOIN students s ON s.student_id = ap.student_id
+        WHERE ap.activity_id = ?
+        ORDER BY ap.student_id
+    ''', (activity_id,)).fetchall()
+    conn.close()
+    
+    fields_list = [certificate_fields(p['name'], p['student_id'], activity) for p in participants]
+    entries = ((archive_name(fields, fmt), data) for fields, data in iter_certificates(fields_list, fmt))
+    download_name = secure_filename(activity['title']) or f'activity-{activity_id}'
+    response = Response(stream_zip(entries), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename="{download_name}-certificates.zip"'
+    return response
+
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=os.getenv('FLASK_DEBUG') == '1')
\ No newline at end of file
@@ -0,0 +1,137 @@
+import os
+import re
+import json
+import gzip
+import hashlib
+from flask import request, send_from_directory
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+# Fingerprinted files never change, so browsers may keep them for a year without revalidating
+IMMUTABLE_MAX_AGE = 31536000
+ASSET_EXTENSIONS = ('.css', '.js')
+
+def minify_css(source):
+    """Strip comments and collapse whitespace around CSS punctuation"""
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    source = re.sub(r'\s+', ' ', source)
+    source = re.sub(r'\s*([{};,>])\s*', r'\1', source)
+    source = re.sub(r':\s+', ':', source)
+    return source.replace(';}', '}').strip()
+
+def minify_js(source):
+    """Drop indentation, blank lines and whole-line // comments
+
+    Deliberately conservative: no tokenizing, so lines inside template
+    literals are left untouched and nothing inside a statement is rewritten.
+    """
+    lines = []
+    in_template = False
+    for line in source.split('\n'):
+        if in_template:
+            lines.append(line)
+        else:
+            stripped = line.strip()
+            if stripped and not stripped.startswith('//'):
+                lines.append(stripped)
+        # An odd number of unescaped backticks toggles template-literal state
+        if len(re.findall(r'(?<!\\)`', line)) % 2:
+            in_template = not in_template
+    return '\n'.join(lines) + '\n'
+
+MINIFIERS = {
+    '.css': minify_css,
+    '.js': minify_js
+}
+
+def build_assets(static_dir=STATIC_DIR):
+    """Minify, fingerprint and gzip every CSS/JS file under static_dir into static_dir/dist
+
+    Writes dist/manifest.json mapping each source path (as passed to
+    url_for('static', filename=...)) to its fingerprinted path. Returns the manifest.
+    """
+    dist_dir = os.path.join(static_dir, DIST_DIR)
+    manifest = {}
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != dist_dir]
+        for name in sorted(files):
+            base, ext = os.path.splitext(name)
+            if ext not in ASSET_EXTENSIONS:
+                continue
+            source_path = os.path.join(root, name)
+            rel_path = os.path.relpath(source_path, static_dir).replace(os.sep, '/')
+            with open(source_path, encoding='utf-8') as f:
+                body = MINIFIERS[ext](f.read()).encode('utf-8')
+
+            digest = hashlib.sha256(body).hexdigest()[:12]
+            hashed_rel = f'{DIST_DIR}/{os.path.dirname(rel_path) + "/" if os.path.dirname(rel_path) else ""}{base}.{digest}{ext}'
+            hashed_path = os.path.join(static_dir, *hashed_rel.split('/'))
+            if not os.path.exists(hashed_path):
+                os.makedirs(os.path.dirname(hashed_path), exist_ok=True)
+                _write_atomic(hashed_path, body)
+                _write_atomic(hashed_path + '.gz', gzip.compress(body, 9, mtime=0))
+            manifest[rel_path] = hashed_rel
+
+    os.makedirs(dist_dir, exist_ok=True)
+    _write_atomic(os.path.join(dist_dir, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+def _write_atomic(path, data):
+    # Several workers may build at startup; readers only ever see complete files
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def load_manifest(static_dir=STATIC_DIR):
+    """Read dist/manifest.json, or return {} when assets have not been built"""
+    try:
+        with open(os.path.join(static_dir, DIST_DIR, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def init_app(app, build=False):
+    """Serve fingerprinted, precompressed assets behind the existing url_for('static', ...) calls
+
+    With a manifest present, url_for('static', filename='css/style.css')
+    returns the fingerprinted name; those files are served with immutable
+    cache headers and as .gz to clients that accept gzip. Without one,
+    static files are served exactly as before.
+    """
+    manifest = build_assets(app.static_folder) if build else load_manifest(app.static_folder)
+    app.extensions['assets'] = manifest
+    if not manifest:
+        return
+
+    @app.url_defaults
+    def fingerprint_static_urls(endpoint, values):
+        if endpoint == 'static' and values.get('filename') in manifest:
+            values['filename'] = manifest[values['filename']]
+
+    fingerprinted = set(manifest.values())
+    default_static_view = app.view_functions['static']
+
+    def static(filename):
+        if filename not in fingerprinted:
+            return default_static_view(filename=filename)
+        gz_path = os.path.join(app.static_folder, *filename.split('/')) + '.gz'
+        if request.accept_encodings['gzip'] and os.path.exists(gz_path):
+            response = send_from_directory(app.static_folder, filename + '.gz', max_age=IMMUTABLE_MAX_AGE,
+                                           mimetype=_mimetype(filename))
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = send_from_directory(app.static_folder, filename, max_age=IMMUTABLE_MAX_AGE)
+        response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        response.vary.add('Accept-Encoding')
+        return response
+
+    app.view_functions['static'] = static
+
+def _mimetype(filename):
+    return 'text/css' if filename.endswith('.css') else 'text/javascript'
+
+if __name__ == '__main__':
+    manifest = build_assets()
+    print(f'Built {len(manifest)} assets into {os.path.join(STATIC_DIR, DIST_DIR)}')
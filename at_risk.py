@@ -0,0 +1,219 @@
+import os
+import math
+import logging
+import time
+import threading
+from array import array
+from collections import defaultdict
+from datetime import datetime, timedelta
+from db_helper import acquire_connection, release_connection, get_db_params, run_with_retry, stream_query, execute_query
+
+AT_RISK_ATTENDANCE_PCT = float(os.getenv('AT_RISK_ATTENDANCE_PCT', 75))
+AT_RISK_RESULTS_PCT = float(os.getenv('AT_RISK_RESULTS_PCT', 40))
+# Attendance is not judged until a subject has held this many sessions
+AT_RISK_MIN_SESSIONS = int(os.getenv('AT_RISK_MIN_SESSIONS', 3))
+AT_RISK_LOOKBACK_DAYS = int(os.getenv('AT_RISK_LOOKBACK_DAYS', 180))
+# 0 disables the in-process schedule; the CLI can still be run from cron
+AT_RISK_INTERVAL_MINUTES = int(os.getenv('AT_RISK_INTERVAL_MINUTES', 0))
+AT_RISK_CHUNK_ROWS = 5000
+
+logger = logging.getLogger(__name__)
+
+def _cohort(academic_year, division):
+    return (academic_year or '', division or '')
+
+def compute_at_risk(conn, now=None):
+    """Score every (student, subject) pair in one pass
+
+    Four grouped queries (students, sessions held, attendance counts, result
+    averages) are streamed into dense per-subject arrays indexed by student
+    position, so the cost is a handful of scans no matter how many students
+    there are. Students are evaluated for subjects of their own year and
+    division, plus any subject they attended or were graded in.
+    Returns (at_risk_rows, pairs_evaluated).
+    """
+    now = now or datetime.utcnow()
+    since = (now - timedelta(days=AT_RISK_LOOKBACK_DAYS)).strftime('%Y-%m-%d %H:%M:%S')
+
+    positions = {}
+    student_ids = []
+    cohorts = defaultdict(list)
+    for chunk in stream_query(conn, 'SELECT student_id, academic_year, division FROM students', chunk_size=AT_RISK_CHUNK_ROWS):
+        for row in chunk:
+            positions[row['student_id']] = len(student_ids)
+            cohorts[_cohort(row['academic_year'], row['division'])].append(len(student_ids))
+            student_ids.append(row['student_id'])
+    count = len(student_ids)
+
+    subjects = execute_query(conn, 'SELECT id, academic_year, division FROM subjects', fetch_all=True) or []
+    held = {row['subject_id']: row['held'] for row in execute_query(conn, '''
+        SELECT subject_id, COUNT(*) AS held FROM sessions
+        WHERE subject_id IS NOT NULL AND created_at >= ?
+        GROUP BY subject_id
+    ''', (since,), fetch_all=True) or []}
+
+    attended = {}
+    touched = defaultdict(set)
+    # Grouping by student first lets SQLite walk the (student_id, session_id) unique index
+    for chunk in stream_query(conn, '''
+        SELECT a.student_id, ses.subject_id, COUNT(*) AS attended
+        FROM attendance a JOIN sessions ses ON ses.id = a.session_id
+        WHERE ses.subject_id IS NOT NULL AND ses.created_at >= ?
+        GROUP BY a.student_id, ses.subject_id
+    ''', (since,), chunk_size=AT_RISK_CHUNK_ROWS):
+        for row in chunk:
+            pos = positions.get(row['student_id'])
+            if pos is None:
+                continue
+            column = attended.get(row['subject_id'])
+            if column is None:
+                column = attended[row['subject_id']] = array('I', bytes(4 * count))
+            column[pos] = row['attended']
+            touched[row['subject_id']].add(pos)
+
+    averages = {}
+    for chunk in stream_query(conn, '''
+        SELECT subject_id, student_id, AVG(marks_obtained * 100.0 / max_marks) AS average
+        FROM results
+        WHERE max_marks > 0 AND created_at >= ?
+        GROUP BY subject_id, student_id
+    ''', (since,), chunk_size=AT_RISK_CHUNK_ROWS):
+        for row in chunk:
+            pos = positions.get(row['student_id'])
+            if pos is None:
+                continue
+            column = averages.get(row['subject_id'])
+            if column is None:
+                column = averages[row['subject_id']] = array('d', [math.nan]) * count
+            column[pos] = float(row['average'])
+            touched[row['subject_id']].add(pos)
+
+    at_risk = []
+    evaluated = 0
+    for subject in subjects:
+        subject_id = subject['id']
+        sessions_held = held.get(subject_id, 0)
+        attended_column = attended.get(subject_id)
+        average_column = averages.get(subject_id)
+        members = set(cohorts.get(_cohort(subject['academic_year'], subject['division']), ()))
+        members.update(touched.get(subject_id, ()))
+        evaluated += len(members)
+
+        for pos in members:
+            present = attended_column[pos] if attended_column is not None else 0
+            percent = present * 100.0 / sessions_held if sessions_held else None
+            average = average_column[pos] if average_column is not None else math.nan
+            average = None if math.isnan(average) else round(average, 1)
+
+            reasons = []
+            if percent is not None and sessions_held >= AT_RISK_MIN_SESSIONS and percent < AT_RISK_ATTENDANCE_PCT:
+                reasons.append('attendance')
+            if average is not None and average < AT_RISK_RESULTS_PCT:
+                reasons.append('results')
+            if reasons:
+                at_risk.append((student_ids[pos], subject_id, sessions_held, present,
+                                None if percent is None else round(percent, 1), average, ','.join(reasons)))
+    return at_risk, evaluated
+
+def store_at_risk(conn, rows, evaluated, started_at):
+    """Replace the at_risk_students snapshot and record the run, in one transaction"""
+    placeholder = get_db_params()['placeholder']
+    finished_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    cursor = conn.cursor()
+    try:
+        cursor.execute('DELETE FROM at_risk_students')
+        for start in range(0, len(rows), AT_RISK_CHUNK_ROWS):
+            cursor.executemany(f'''
+                INSERT INTO at_risk_students
+                    (student_id, subject_id, sessions_held, sessions_attended, attendance_pct, results_avg, reasons, computed_at)
+                VALUES ({', '.join([placeholder] * 8)})
+            ''', [row + (finished_at,) for row in rows[start:start + AT_RISK_CHUNK_ROWS]])
+        cursor.execute(f'''
+            INSERT INTO at_risk_runs (started_at, finished_at, pairs_evaluated, at_risk_count)
+            VALUES ({', '.join([placeholder] * 4)})
+        ''', (started_at, finished_at, evaluated, len(rows)))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def last_run(conn):
+    """Most recent completed run as a row (finished_at, pairs_evaluated, at_risk_count), or None"""
+    return execute_query(conn, '''
+        SELECT finished_at, pairs_evaluated, at_risk_count FROM at_risk_runs
+        ORDER BY id DESC LIMIT 1
+    ''', fetch_one=True)
+
+def run_at_risk_job():
+    """Recompute the at-risk snapshot; returns (at_risk_count, pairs_evaluated, seconds)"""
+    started = time.monotonic()
+    started_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    conn = acquire_connection()
+    try:
+        rows, evaluated = compute_at_risk(conn)
+        run_with_retry(store_at_risk, conn, rows, evaluated, started_at)
+    finally:
+        release_connection(conn)
+    return len(rows), evaluated, time.monotonic() - started
+
+class AtRiskScheduler:
+    """Background thread that refreshes the snapshot every AT_RISK_INTERVAL_MINUTES"""
+
+    def __init__(self, interval_minutes=AT_RISK_INTERVAL_MINUTES):
+        self.interval = interval_minutes * 60
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def ensure_started(self):
+        # Threads do not survive fork, so every worker process starts its own
+        if self.interval <= 0:
+            return
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='at-risk-scheduler', daemon=True)
+                self._thread.start()
+
+    def _claim(self):
+        """Take the next run if it is due; exactly one worker wins each interval
+
+        The conditional UPDATE only matches while claimed_at still holds the
+        value we read, so workers racing for the same run see rowcount 0.
+        """
+        now = datetime.utcnow()
+        conn = acquire_connection()
+        try:
+            row = execute_query(conn, 'SELECT claimed_at FROM at_risk_schedule WHERE id = 1', fetch_one=True)
+            if row is None:
+                return False
+            claimed_at = row['claimed_at']
+            if now - datetime.strptime(claimed_at, '%Y-%m-%d %H:%M:%S') < timedelta(seconds=self.interval):
+                return False
+            cursor = execute_query(conn, 'UPDATE at_risk_schedule SET claimed_at = ? WHERE id = 1 AND claimed_at = ?',
+                                   (now.strftime('%Y-%m-%d %H:%M:%S'), claimed_at))
+            conn.commit()
+            return cursor.rowcount == 1
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            release_connection(conn)
+
+    def _run(self):
+        while True:
+            try:
+                if self._claim():
+                    count, evaluated, seconds = run_at_risk_job()
+                    logger.info('At-risk job: %d at risk of %d evaluated in %.2fs', count, evaluated, seconds)
+            except Exception:
+                logger.exception('At-risk job failed')
+            time.sleep(self.interval)
+
+at_risk_scheduler = AtRiskScheduler()
+
+if __name__ == '__main__':
+    count, evaluated, seconds = run_at_risk_job()
+    print(f'{count} student/subject pairs at risk out of {evaluated} evaluated in {seconds:.2f}s')
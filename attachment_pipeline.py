@@ -0,0 +1,243 @@
+import os
+import io
+import hashlib
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import send_file
+from PIL import Image, ImageOps
+from db_helper import acquire_connection, release_connection, execute_query, get_db_params, run_with_retry
+from attachments import ATTACHMENT_MAX_AGE, MOVED_SUFFIX, attachment_path, reencoded_name, read_moved
+
+# Photos wider or taller than this are scaled down; 0 keeps the original size
+ATTACHMENT_MAX_DIMENSION = int(os.getenv('ATTACHMENT_MAX_DIMENSION', 2000))
+# Images over this size are re-encoded even when small enough in pixels
+ATTACHMENT_REENCODE_BYTES = int(os.getenv('ATTACHMENT_REENCODE_BYTES', 512 * 1024))
+ATTACHMENT_JPEG_QUALITY = int(os.getenv('ATTACHMENT_JPEG_QUALITY', 80))
+ATTACHMENT_THUMBNAIL_SIZE = int(os.getenv('ATTACHMENT_THUMBNAIL_SIZE', 240))
+# Pillow releases the GIL while decoding, resizing and encoding, so threads run in parallel
+ATTACHMENT_WORKERS = int(os.getenv('ATTACHMENT_WORKERS', 2))
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.gif', '.tif', '.tiff')
+THUMBNAIL_SUFFIX = '.thumb.jpg'
+
+logger = logging.getLogger(__name__)
+
+def is_image(filename):
+    return bool(filename) and filename.lower().endswith(IMAGE_EXTENSIONS)
+
+def thumbnail_path(path):
+    return path + THUMBNAIL_SUFFIX
+
+def _flatten(img):
+    """RGB copy of img, with any transparency composited onto white"""
+    if img.mode in ('RGBA', 'LA', 'P'):
+        img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, 'white')
+        background.paste(img, mask=img.getchannel('A'))
+        return background
+    return img.convert('RGB') if img.mode != 'RGB' else img
+
+def _encode_jpeg(img, quality):
+    out = io.BytesIO()
+    _flatten(img).save(out, 'JPEG', quality=quality, optimize=True, progressive=True)
+    return out.getvalue()
+
+def _write_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(prefix='.derived-', dir=os.path.dirname(path) or '.')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            out.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _record_reencode(path, new_path, sha256):
+    """Point every application sharing path at the re-encoded copy, its hash and a .jpg name"""
+    placeholder = get_db_params()['placeholder']
+    conn = acquire_connection()
+    try:
+        rows = execute_query(conn, f'SELECT id, attachment_name FROM leave_applications WHERE attachment_path = {placeholder}',
+                             (path,), fetch_all=True)
+        for row in rows:
+            name = reencoded_name(row['attachment_name'] or os.path.basename(path))
+            execute_query(conn, f'UPDATE leave_applications SET attachment_path = {placeholder}, attachment_sha256 = {placeholder}, '
+                          f'attachment_name = {placeholder} WHERE id = {placeholder}', (new_path, sha256, name, row['id']))
+        conn.commit()
+    finally:
+        release_connection(conn)
+
+def _referenced(path):
+    placeholder = get_db_params()['placeholder']
+    conn = acquire_connection()
+    try:
+        return execute_query(conn, f'SELECT 1 FROM leave_applications WHERE attachment_path = {placeholder} LIMIT 1',
+                             (path,), fetch_one=True) is not None
+    finally:
+        release_connection(conn)
+
+def repoint_if_moved(path):
+    """Move applications still pointing at a replaced original onto its copy
+
+    Returns the copy's path, or None if path was never replaced.
+    """
+    sha256 = read_moved(path)
+    if not sha256:
+        return None
+    new_path = attachment_path(sha256)
+    run_with_retry(_record_reencode, path, new_path, sha256)
+    return new_path
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def _replace_with(path, data, thumb):
+    """Store data under its own hash and retire path in favour of it
+
+    The original's hash must keep meaning the original's bytes, so the copy
+    is content-addressed like any upload. A marker left at the old path
+    sends later identical uploads to the copy. An upload that read before
+    the marker existed can still insert a row for the old path, so the
+    original is only deleted once no row refers to it; a row inserted after
+    that check moves itself (see repoint_if_moved).
+    """
+    sha256 = hashlib.sha256(data).hexdigest()
+    new_path = attachment_path(sha256)
+    os.makedirs(os.path.dirname(new_path), exist_ok=True)
+    if not os.path.exists(new_path):
+        _write_atomic(new_path, data)
+    _write_atomic(thumbnail_path(new_path), thumb)
+    _write_atomic(path + MOVED_SUFFIX, sha256.encode('ascii'))
+    for _ in range(3):
+        run_with_retry(_record_reencode, path, new_path, sha256)
+        if not run_with_retry(_referenced, path):
+            _remove(path)
+            _remove(thumbnail_path(path))
+            return
+    logger.warning('Attachment %s is still referenced after re-encoding; keeping the original', path)
+
+def process_attachment(path, filename=None):
+    """Write a thumbnail for an uploaded image and shrink the stored copy if it is oversized
+
+    Returns (original bytes, stored bytes), or None when the file is not an image.
+    """
+    if not os.path.exists(path) or not is_image(filename or path):
+        return None
+    original_size = os.path.getsize(path)
+    reencoded = None
+    with Image.open(path) as img:
+        if ATTACHMENT_MAX_DIMENSION:
+            # JPEG decodes straight to a reduced scale, far cheaper than decoding a full phone photo
+            img.draft('RGB', (ATTACHMENT_MAX_DIMENSION, ATTACHMENT_MAX_DIMENSION))
+        # Phone cameras store rotation in EXIF; apply it, since re-encoding drops the tag
+        img = ImageOps.exif_transpose(img)
+
+        thumb = img.copy()
+        thumb.thumbnail((ATTACHMENT_THUMBNAIL_SIZE, ATTACHMENT_THUMBNAIL_SIZE))
+        thumb_data = _encode_jpeg(thumb, 75)
+
+        oversized = ATTACHMENT_MAX_DIMENSION and max(img.size) > ATTACHMENT_MAX_DIMENSION
+        if oversized or original_size > ATTACHMENT_REENCODE_BYTES:
+            if oversized:
+                img.thumbnail((ATTACHMENT_MAX_DIMENSION, ATTACHMENT_MAX_DIMENSION))
+            data = _encode_jpeg(img, ATTACHMENT_JPEG_QUALITY)
+            # Marginal savings are not worth a generation of JPEG loss (or re-processing our own output)
+            if len(data) < original_size * 0.9:
+                reencoded = data
+    # Outside the with block: Windows cannot delete the original while it is open
+    if reencoded is not None:
+        _replace_with(path, reencoded, thumb_data)
+        return original_size, len(reencoded)
+    # Written last: a thumbnail on disk means the file has been fully processed
+    _write_atomic(thumbnail_path(path), thumb_data)
+    return original_size, original_size
+
+def send_thumbnail(path):
+    """Inline JPEG preview, revalidated by ETag once the browser's copy expires"""
+    response = send_file(os.path.abspath(thumbnail_path(path)), mimetype='image/jpeg',
+                         conditional=True, etag=True, max_age=ATTACHMENT_MAX_AGE)
+    response.headers['Cache-Control'] = f'private, max-age={ATTACHMENT_MAX_AGE}'
+    return response
+
+class AttachmentProcessor:
+    """Background pool that resizes uploaded images and writes their thumbnails"""
+
+    def __init__(self, workers=ATTACHMENT_WORKERS):
+        self.workers = workers
+        self._executor = None
+        self._pid = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def submit(self, path, filename=None):
+        """Queue path for processing; duplicates of a file already queued are ignored"""
+        if not is_image(filename or path):
+            return False
+        with self._lock:
+            # Threads do not survive fork, so every worker process starts its own pool
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='attachment')
+                self._pid = os.getpid()
+                self._pending = set()
+            if path in self._pending:
+                return False
+            self._pending.add(path)
+        self._executor.submit(self._run, path, filename)
+        return True
+
+    def pending(self):
+        return len(self._pending)
+
+    def _run(self, path, filename):
+        try:
+            process_attachment(path, filename)
+        except Exception:
+            logger.exception('Attachment processing failed for %s', path)
+        finally:
+            with self._lock:
+                self._pending.discard(path)
+
+_processor = None
+_processor_lock = threading.Lock()
+
+def get_attachment_processor():
+    """Get the process-wide attachment processor"""
+    global _processor
+    if _processor is None:
+        with _processor_lock:
+            if _processor is None:
+                _processor = AttachmentProcessor()
+    return _processor
+
+def backfill():
+    """Process every stored image that has no thumbnail yet; returns (files, bytes saved)"""
+    conn = acquire_connection()
+    try:
+        rows = execute_query(conn, 'SELECT DISTINCT attachment_path, attachment_name FROM leave_applications '
+                             'WHERE attachment_path IS NOT NULL', fetch_all=True)
+    finally:
+        release_connection(conn)
+    processed, saved = 0, 0
+    for row in rows:
+        path, filename = row['attachment_path'], row['attachment_name']
+        if os.path.exists(thumbnail_path(path)):
+            continue
+        try:
+            sizes = process_attachment(path, filename)
+        except Exception:
+            logger.exception('Attachment processing failed for %s', path)
+            continue
+        if sizes:
+            processed += 1
+            saved += sizes[0] - sizes[1]
+    return processed, saved
+
+if __name__ == '__main__':
+    processed, saved = backfill()
+    print(f'{processed} attachments processed, {saved / 1024 / 1024:.1f} MB saved')
@@ -0,0 +1,118 @@
+import os
+import hashlib
+import mimetypes
+import tempfile
+from flask import current_app, request, send_file
+from werkzeug.utils import secure_filename
+
+# Content-addressed store: <dir>/<first two hex digits>/<sha256>, one file per distinct upload
+ATTACHMENTS_DIR = os.getenv('ATTACHMENTS_DIR', os.path.join('uploads', 'leave_documents'))
+ATTACHMENT_CHUNK_BYTES = 64 * 1024
+# '' streams from the worker; 'x-sendfile' (Apache, lighttpd) or 'x-accel' (nginx) hands the transfer to the proxy
+ATTACHMENTS_SENDFILE = os.getenv('ATTACHMENTS_SENDFILE', '')
+# nginx internal location that maps onto ATTACHMENTS_DIR, used with 'x-accel'
+ATTACHMENTS_ACCEL_PREFIX = os.getenv('ATTACHMENTS_ACCEL_PREFIX', '/protected/attachments/')
+# Stored bytes never change, so clients may reuse a download for this long without asking
+ATTACHMENT_MAX_AGE = int(os.getenv('ATTACHMENT_MAX_AGE', 86400))
+# Left beside an original replaced by a smaller re-encoded copy; holds the copy's sha256
+MOVED_SUFFIX = '.moved'
+
+class StoredAttachment:
+    """Where an upload ended up and what to call it on download"""
+
+    def __init__(self, path, sha256, size, filename, created):
+        self.path = path
+        self.sha256 = sha256
+        self.size = size
+        self.filename = filename
+        self.created = created
+
+def attachment_path(sha256, base_dir=ATTACHMENTS_DIR):
+    return os.path.join(base_dir, sha256[:2], sha256)
+
+def reencoded_name(filename):
+    """Download name for the JPEG that replaced an upload"""
+    return os.path.splitext(filename)[0] + '.jpg'
+
+def read_moved(path):
+    """sha256 of the copy that replaced path, or None if it was never replaced"""
+    try:
+        with open(path + MOVED_SUFFIX) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def store_upload(file, base_dir=ATTACHMENTS_DIR):
+    """Stream an uploaded file to disk in chunks, hashing as it goes, and store it by content
+
+    Identical uploads are kept once: when the hash is already present the
+    new copy is discarded. If that file was since replaced by a re-encoded
+    copy, the upload resolves to the copy.
+    """
+    os.makedirs(base_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(prefix='.upload-', dir=base_dir)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = file.stream.read(ATTACHMENT_CHUNK_BYTES)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+
+        sha256 = digest.hexdigest()
+        path = attachment_path(sha256, base_dir)
+        filename = secure_filename(file.filename) or sha256
+        moved = read_moved(path)
+        if moved:
+            os.remove(tmp_path)
+            path = attachment_path(moved, base_dir)
+            return StoredAttachment(path, moved, os.path.getsize(path), reencoded_name(filename), False)
+        created = not os.path.exists(path)
+        if created:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Atomic, so a concurrent identical upload or a reader never sees a partial file
+            os.replace(tmp_path, path)
+        else:
+            os.remove(tmp_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return StoredAttachment(path, sha256, size, filename, created)
+
+def send_attachment(path, filename=None, sha256=None):
+    """Download response with If-None-Match and Range support, or a proxy hand-off
+
+    Content-addressed files use their hash as a strong ETag; legacy files
+    fall back to Werkzeug's mtime/size ETag.
+    """
+    filename = filename or os.path.basename(path)
+    if ATTACHMENTS_SENDFILE == 'x-accel' and sha256:
+        if request.if_none_match.contains(sha256):
+            response = current_app.response_class(status=304)
+        else:
+            # nginx serves the bytes (including Range requests) from its internal location
+            response = current_app.response_class(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+            response.headers['X-Accel-Redirect'] = ATTACHMENTS_ACCEL_PREFIX + os.path.relpath(path, ATTACHMENTS_DIR).replace(os.sep, '/')
+            response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response.set_etag(sha256)
+        response.headers['Cache-Control'] = f'private, max-age={ATTACHMENT_MAX_AGE}'
+        return response
+
+    # send_file adds X-Sendfile when USE_X_SENDFILE is set (see init_app); otherwise
+    # the file is streamed from disk, via sendfile() where the server supports it
+    response = send_file(os.path.abspath(path), as_attachment=True, download_name=filename,
+                         conditional=True, etag=sha256 or True, max_age=ATTACHMENT_MAX_AGE)
+    # Werkzeug only advertises ranges on 206 responses; say so up front so clients can resume
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.headers['Cache-Control'] = f'private, max-age={ATTACHMENT_MAX_AGE}'
+    return response
+
+def init_app(app):
+    """Configure the optional X-Sendfile hand-off"""
+    if ATTACHMENTS_SENDFILE == 'x-sendfile':
+        app.config['USE_X_SENDFILE'] = True
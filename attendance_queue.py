@@ -0,0 +1,168 @@
+import os
+import queue
+import threading
+import time
+from db_helper import acquire_connection, release_connection, get_db_params, run_with_retry
+
+# 'direct' writes each scan in its own transaction, 'queue' coalesces scans
+ATTENDANCE_WRITE_MODE = os.getenv('ATTENDANCE_WRITE_MODE', 'direct')
+QUEUE_FLUSH_INTERVAL_MS = int(os.getenv('ATTENDANCE_QUEUE_FLUSH_MS', 5))
+QUEUE_MAX_BATCH = int(os.getenv('ATTENDANCE_QUEUE_MAX_BATCH', 500))
+QUEUE_WAIT_TIMEOUT = float(os.getenv('ATTENDANCE_QUEUE_TIMEOUT', 10))
+
+ACCEPTED = 'accepted'
+DUPLICATE = 'duplicate'
+
+class PendingScan:
+    """A validated scan waiting for the writer thread"""
+
+    def __init__(self, student_id, session_pk):
+        self.student_id = student_id
+        self.session_pk = session_pk
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self.state = 'queued'
+        self._lock = threading.Lock()
+
+    def claim(self):
+        """Called by the writer before writing; False if the caller already gave up"""
+        with self._lock:
+            if self.state == 'cancelled':
+                return False
+            self.state = 'claimed'
+            return True
+
+    def cancel(self):
+        """Called by a caller that stops waiting; False if the writer already has the scan"""
+        with self._lock:
+            if self.state != 'queued':
+                return False
+            self.state = 'cancelled'
+            return True
+
+class AttendanceWriter:
+    """Single writer that drains queued scans into one transaction per batch"""
+
+    def __init__(self, flush_interval_ms=QUEUE_FLUSH_INTERVAL_MS, max_batch=QUEUE_MAX_BATCH):
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Threads do not survive fork, so every worker process starts its own writer
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='attendance-writer', daemon=True)
+                self._thread.start()
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def submit(self, student_id, session_pk, timeout=QUEUE_WAIT_TIMEOUT):
+        """Queue a scan and wait for its outcome (ACCEPTED or DUPLICATE)"""
+        self._ensure_started()
+        scan = PendingScan(student_id, session_pk)
+        self._queue.put(scan)
+        if not scan.done.wait(timeout):
+            # Withdraw the scan so it is never written after the client was told it failed;
+            # if the writer already claimed it, its transaction is under way, so wait for the outcome
+            if scan.cancel():
+                raise TimeoutError('Attendance writer did not respond in time')
+            scan.done.wait()
+        if scan.error is not None:
+            raise scan.error
+        return scan.result
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            batch = [scan for scan in batch if scan.claim()]
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch):
+        try:
+            conn = acquire_connection()
+            try:
+                run_with_retry(self._write_batch, conn, batch)
+            finally:
+                release_connection(conn)
+        except Exception as e:
+            for scan in batch:
+                scan.error = e
+        finally:
+            for scan in batch:
+                scan.done.set()
+
+    def _write_batch(self, conn, batch):
+        try:
+            self._insert_batch(conn, batch)
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _insert_batch(self, conn, batch):
+        placeholder = get_db_params()['placeholder']
+        cursor = conn.cursor()
+
+        # Rows already stored for the students in this batch, grouped per session
+        by_session = {}
+        for scan in batch:
+            by_session.setdefault(scan.session_pk, set()).add(scan.student_id)
+        existing = set()
+        for session_pk, student_ids in by_session.items():
+            marks = ', '.join([placeholder] * len(student_ids))
+            cursor.execute(
+                f'SELECT student_id FROM attendance WHERE session_id = {placeholder} AND student_id IN ({marks})',
+                (session_pk, *student_ids))
+            existing.update((row['student_id'], session_pk) for row in cursor.fetchall())
+
+        rows = []
+        for scan in batch:
+            key = (scan.student_id, scan.session_pk)
+            if key in existing:
+                scan.result = DUPLICATE
+            else:
+                # Double-taps inside the same batch count as duplicates too
+                existing.add(key)
+                rows.append(key)
+                scan.result = ACCEPTED
+
+        if rows:
+            cursor.executemany(
+                f'INSERT INTO attendance (student_id, session_id) VALUES ({placeholder}, {placeholder}) '
+                'ON CONFLICT (student_id, session_id) DO NOTHING', rows)
+        conn.commit()
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_attendance_writer():
+    """Get the process-wide attendance writer"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AttendanceWriter()
+    return _writer
+
+def queue_mode_enabled():
+    """Check whether scans should go through the ingestion queue"""
+    return ATTENDANCE_WRITE_MODE == 'queue'
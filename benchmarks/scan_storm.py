@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+Lecture-start scan storm benchmark
+
+Seeds a class of students, has the teacher open a QR session, fires every
+student's /mark_attendance at once, then loads the teacher's dashboards and
+exports. Reports throughput and p50/p95/p99 latency per phase and route as JSON.
+
+    python benchmarks/scan_storm.py --students 500 --concurrency 50
+    python benchmarks/scan_storm.py --database sqlite --database postgresql://localhost/qr_bench
+    python benchmarks/scan_storm.py --url http://127.0.0.1:5000 --database sqlite:///attendance.db
+    python benchmarks/scan_storm.py --output new.json --compare old.json
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import urllib.error
+import urllib.parse
+import urllib.request
+import http.cookiejar
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+RESULT_VERSION = 1
+BENCH_PASSWORD = 'bench-password'
+# Seeded accounts share one cheap hash so seeding 10k students takes seconds, not hours;
+# login cost is still measured, just not at production pbkdf2 strength
+BENCH_HASH_METHOD = 'pbkdf2:sha256:1000'
+# Otherwise the first login would upgrade every seeded hash and the login phase would time rehashing
+os.environ.setdefault('PASSWORD_REHASH_ON_LOGIN', '0')
+BENCH_YEAR = '1st Year'
+
+class InProcessClient:
+    """One browser session against the app through Flask's test client"""
+
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def request(self, method, path, json_body=None, form=None):
+        response = self._client.open(path, method=method, json=json_body, data=form)
+        # Drain streamed bodies (CSV export) so their cost is part of the timing
+        return response.status_code, response.get_data()
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+class HttpClient:
+    """One browser session against a running server, with its own cookie jar"""
+
+    def __init__(self, base_url):
+        self._base_url = base_url.rstrip('/')
+        self._opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect)
+
+    def request(self, method, path, json_body=None, form=None):
+        headers, body = {}, None
+        if json_body is not None:
+            headers['Content-Type'] = 'application/json'
+            body = json.dumps(json_body).encode('utf-8')
+        elif form is not None:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            body = urllib.parse.urlencode(form).encode('utf-8')
+        req = urllib.request.Request(self._base_url + path, data=body, headers=headers, method=method)
+        try:
+            with self._opener.open(req, timeout=60) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+class Recorder:
+    """Latency samples and error counts per route for one phase"""
+
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+
+    def call(self, client, label, method, path, check, json_body=None, form=None):
+        started = time.perf_counter()
+        try:
+            status, body = client.request(method, path, json_body, form)
+            ok = check(status, body)
+        except Exception:
+            status, body, ok = None, b'', False
+        elapsed = time.perf_counter() - started
+        # list.append and dict.setdefault are atomic under the GIL
+        self.samples.setdefault(label, []).append(elapsed)
+        if not ok:
+            self.errors[label] = self.errors.get(label, 0) + 1
+        return status, body
+
+def _json(body):
+    try:
+        return json.loads(body)
+    except ValueError:
+        return None
+
+def expect_status(*codes):
+    return lambda status, body: status in codes
+
+def expect_success(status, body):
+    data = _json(body)
+    return status == 200 and not (isinstance(data, dict) and data.get('success') is False)
+
+def expect_duplicate(status, body):
+    data = _json(body) or {}
+    return status == 200 and data.get('message') == 'Already marked attendance'
+
+def percentile(sorted_samples, pct):
+    """Linear-interpolated percentile of an already sorted list"""
+    if len(sorted_samples) == 1:
+        return sorted_samples[0]
+    return statistics.quantiles(sorted_samples, n=100, method='inclusive')[pct - 1]
+
+def summarize(recorder, seconds):
+    """Per-route statistics for one phase, latencies in milliseconds"""
+    routes = {}
+    for label, samples in sorted(recorder.samples.items()):
+        samples = sorted(samples)
+        routes[label] = {
+            'count': len(samples),
+            'errors': recorder.errors.get(label, 0),
+            'throughput_rps': round(len(samples) / seconds, 1) if seconds else None,
+            'mean_ms': round(statistics.fmean(samples) * 1000, 2),
+            'p50_ms': round(percentile(samples, 50) * 1000, 2),
+            'p95_ms': round(percentile(samples, 95) * 1000, 2),
+            'p99_ms': round(percentile(samples, 99) * 1000, 2),
+            'max_ms': round(samples[-1] * 1000, 2)
+        }
+    total = sum(route['count'] for route in routes.values())
+    return {
+        'seconds': round(seconds, 3),
+        'requests': total,
+        'throughput_rps': round(total / seconds, 1) if seconds else None,
+        'routes': routes
+    }
+
+def run_phase(jobs, concurrency):
+    """Run every job on a pool of concurrency threads; returns wall seconds"""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(job) for job in jobs]:
+            future.result()
+    return time.perf_counter() - started
+
+def _executemany(conn, query, rows):
+    from db_helper import get_db_params
+    if get_db_params()['placeholder'] == '%s':
+        query = query.replace('?', '%s')
+    cursor = conn.cursor()
+    cursor.executemany(query, rows)
+
+def seed(run_id, students):
+    """Create a teacher, a subject and a class of students with login accounts"""
+    from werkzeug.security import generate_password_hash
+    from db_helper import acquire_connection, release_connection, execute_query, get_db_params
+
+    password_hash = generate_password_hash(BENCH_PASSWORD, method=BENCH_HASH_METHOD)
+    division = f'Bench {run_id}'
+    teacher = f'bench_{run_id}_teacher'
+    student_ids = [f'B{run_id}-{i:05d}' for i in range(students)]
+
+    conn = acquire_connection()
+    try:
+        _executemany(conn, 'INSERT INTO users (username, email, password_hash, role) VALUES (?, ?, ?, ?)',
+                     [(teacher, f'{teacher}@bench.local', password_hash, 'teacher')] +
+                     [(sid, f'{sid}@bench.local', password_hash, 'student') for sid in student_ids])
+        execute_query(conn, '''
+            INSERT INTO teachers (teacher_id, name, subject, user_id)
+            SELECT ?, ?, ?, id FROM users WHERE username = ?
+        ''', (teacher, 'Benchmark Teacher', 'Benchmarking', teacher))
+        _executemany(conn, '''
+            INSERT INTO students (student_id, name, division, academic_year, user_id)
+            SELECT ?, ?, ?, ?, id FROM users WHERE username = ?
+        ''', [(sid, f'Student {sid}', division, BENCH_YEAR, sid) for sid in student_ids])
+        execute_query(conn, f'''
+            INSERT INTO subjects (name, code, academic_year, division, teacher_id, created_at)
+            SELECT ?, ?, ?, ?, id, {get_db_params()['now']} FROM users WHERE username = ?
+        ''', (f'Benchmark {run_id}', 'BENCH', BENCH_YEAR, division, teacher))
+        subject_id = execute_query(conn, 'SELECT MAX(id) AS id FROM subjects WHERE name = ?',
+                                   (f'Benchmark {run_id}',), fetch_one=True)['id']
+        conn.commit()
+    finally:
+        release_connection(conn)
+    return teacher, student_ids, subject_id
+
+def count_marked(session_qr):
+    from db_helper import acquire_connection, release_connection, execute_query
+    conn = acquire_connection()
+    try:
+        return execute_query(conn, '''
+            SELECT COUNT(*) AS count FROM attendance a JOIN sessions ses ON ses.id = a.session_id
+            WHERE ses.qr_data = ?
+        ''', (session_qr,), fetch_one=True)['count']
+    finally:
+        release_connection(conn)
+
+
+def run_benchmark(args, database):
+    """Run every phase against one database; returns that run's result"""
+    tmp_dir = tempfile.mkdtemp(prefix='scan_storm_')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmp_dir, 'bench.db') if database == 'sqlite' else database
+    run_id = datetime.now().strftime('%H%M%S') + f'{random.randrange(1000):03d}'
+    try:
+        if args.url:
+            # The server must share this database and SECRET_KEY
+            from database import init_db
+            init_db()
+            make_client = lambda: HttpClient(args.url)
+            secret = os.getenv('SECRET_KEY', 'fallback-secret-key')
+        else:
+            from app import app
+            make_client = lambda: InProcessClient(app)
+            secret = app.secret_key
+        from qr_tokens import issue_token
+
+        phases = {}
+        started = time.perf_counter()
+        teacher, student_ids, subject_id = seed(run_id, args.students)
+        phases['seed'] = {'seconds': round(time.perf_counter() - started, 3), 'students': len(student_ids)}
+
+        # Students sign in before the lecture; the teacher gets one session per dashboard worker
+        recorder = Recorder()
+        student_clients = {sid: make_client() for sid in student_ids}
+        teacher_clients = queue.Queue()
+        login = lambda client, username, role: recorder.call(
+            client, 'POST /login', 'POST', '/login', expect_status(302),
+            form={'username': username, 'password': BENCH_PASSWORD, 'user_type': role})
+        jobs = [lambda sid=sid: login(student_clients[sid], sid, 'student') for sid in student_ids]
+        for _ in range(args.concurrency):
+            client = make_client()
+            teacher_clients.put(client)
+            jobs.append(lambda client=client: login(client, teacher, 'teacher'))
+        phases['login'] = summarize(recorder, run_phase(jobs, args.concurrency))
+
+        # The teacher opens the QR session
+        recorder = Recorder()
+        lecture_time = datetime.now().strftime('%Y-%m-%dT%H:%M')
+        client = teacher_clients.get()
+        started = time.perf_counter()
+        status, body = recorder.call(client, 'POST /generate_qr', 'POST', '/generate_qr', expect_success, json_body={
+            'subject': f'Benchmark {run_id}', 'subject_id': subject_id,
+            'class_start_time': lecture_time, 'class_end_time': lecture_time,
+            'expiry_seconds': args.expiry_seconds
+        })
+        phases['generate_qr'] = summarize(recorder, time.perf_counter() - started)
+        teacher_clients.put(client)
+        qr_session = (_json(body) or {}).get('session_id')
+        if not qr_session:
+            raise RuntimeError(f'/generate_qr failed ({status}): {body[:200]!r}')
+        expires_at = time.time() + args.expiry_seconds - 1
+
+        # Everyone scans at once; some students double-tap and should be told they are already marked
+        recorder = Recorder()
+        double_tappers = set(random.sample(student_ids, int(len(student_ids) * args.rescan_ratio)))
+
+        def scan(sid):
+            client = student_clients[sid]
+            payload = {'student_id': sid, 'session_id': issue_token(secret, qr_session, expires_at)}
+            recorder.call(client, 'POST /mark_attendance', 'POST', '/mark_attendance', expect_success, json_body=payload)
+            if sid in double_tappers:
+                recorder.call(client, 'POST /mark_attendance (rescan)', 'POST', '/mark_attendance', expect_duplicate,
+                              json_body=payload)
+
+        phases['scan_storm'] = summarize(recorder, run_phase([lambda sid=sid: scan(sid) for sid in student_ids],
+                                                             args.concurrency))
+        phases['scan_storm']['marked'] = count_marked(qr_session)
+
+        # After the bell: dashboards and exports
+        recorder = Recorder()
+        reads = [
+            ('GET /teacher_dashboard', '/teacher_dashboard'),
+            ('GET /analytics', '/analytics'),
+            ('GET /analytics/timeseries', '/analytics/timeseries?group=subject'),
+            ('GET /get_attendance', f'/get_attendance?subject_id={subject_id}'),
+            ('GET /get_subject_attendance/<id>', f'/get_subject_attendance/{subject_id}'),
+            ('GET /download_attendance_csv/<id>', f'/download_attendance_csv/{subject_id}'),
+            ('GET /get_students', '/get_students'),
+            ('GET /get_student_subjects', '/get_student_subjects')
+        ]
+
+        def read(i):
+            label, path = reads[i % len(reads)]
+            if label == 'GET /get_student_subjects':
+                recorder.call(student_clients[student_ids[i % len(student_ids)]], label, 'GET', path, expect_success)
+                return
+            # A test client is not shared between threads, so borrow one exclusively
+            client = teacher_clients.get()
+            try:
+                recorder.call(client, label, 'GET', path, expect_success)
+            finally:
+                teacher_clients.put(client)
+
+        phases['dashboards'] = summarize(recorder, run_phase([lambda i=i: read(i) for i in range(args.dashboard_requests)],
+                                                             args.concurrency))
+        return {
+            'database': database.split(':', 1)[0],
+            'target': args.url or 'in-process',
+            'run_id': run_id,
+            'phases': phases
+        }
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def run_in_subprocess(args, database):
+    """Benchmark one database in a fresh interpreter; the app binds its database at import"""
+    fd, output = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    command = [sys.executable, os.path.abspath(__file__), '--quiet', '--database', database, '--output', output,
+               '--students', str(args.students), '--concurrency', str(args.concurrency),
+               '--rescan-ratio', str(args.rescan_ratio), '--dashboard-requests', str(args.dashboard_requests),
+               '--expiry-seconds', str(args.expiry_seconds)]
+    if args.url:
+        command += ['--url', args.url]
+    try:
+        subprocess.run(command, check=True)
+        with open(output, encoding='utf-8') as f:
+            return json.load(f)['runs'][0]
+    finally:
+        os.remove(output)
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_summary(result, out):
+    for run in result['runs']:
+        for name, phase in run['phases'].items():
+            if 'routes' not in phase:
+                print(f"[{run['database']}] {name}: {phase['seconds']:.2f} s", file=out)
+                continue
+            print(f"[{run['database']}] {name}: {phase['requests']} requests in {phase['seconds']:.2f} s "
+                  f"({phase['throughput_rps']} req/s)", file=out)
+            for label, route in phase['routes'].items():
+                print(f"    {label:<36} n={route['count']:<6} err={route['errors']:<4} p50={route['p50_ms']:>8.1f} "
+                      f"p95={route['p95_ms']:>8.1f} p99={route['p99_ms']:>8.1f} ms", file=out)
+
+def print_comparison(baseline, result, out):
+    """p95 and throughput of each route against a previous result file"""
+    previous = {run['database']: run for run in baseline['runs']}
+    print(f"Compared with {baseline.get('git_revision') or 'baseline'} ({baseline['started_at']}):", file=out)
+    for run in result['runs']:
+        old_run = previous.get(run['database'])
+        if old_run is None:
+            continue
+        for name, phase in run['phases'].items():
+            for label, route in phase.get('routes', {}).items():
+                old = old_run['phases'].get(name, {}).get('routes', {}).get(label)
+                if not old or not old['p95_ms'] or not old['throughput_rps']:
+                    continue
+                print(f"  [{run['database']}] {name + ' ' + label:<48} p95 {old['p95_ms']:.1f} -> {route['p95_ms']:.1f} ms "
+                      f"({(route['p95_ms'] / old['p95_ms'] - 1) * 100:+.0f}%), throughput "
+                      f"{(route['throughput_rps'] / old['throughput_rps'] - 1) * 100:+.0f}%", file=out)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Simulate a lecture-start QR scan storm')
+    parser.add_argument('--students', type=int, default=300, help='class size (default 300)')
+    parser.add_argument('--concurrency', type=int, default=32, help='simultaneous clients (default 32)')
+    parser.add_argument('--rescan-ratio', type=float, default=0.1, help='share of students who scan twice (default 0.1)')
+    parser.add_argument('--dashboard-requests', type=int, default=200, help='dashboard and export loads after the storm')
+    parser.add_argument('--expiry-seconds', type=int, default=300, help='QR session lifetime')
+    parser.add_argument('--database', action='append',
+                        help="'sqlite' (a fresh temporary file), sqlite:///path or postgresql://...; repeat to compare")
+    parser.add_argument('--url', help='benchmark a running server instead of the app in-process')
+    parser.add_argument('--output', help='write the JSON result here instead of stdout')
+    parser.add_argument('--compare', help='previous JSON result to compare against')
+    parser.add_argument('--quiet', action='store_true', help='no summary on stderr')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    databases = args.database or ['sqlite']
+    started_at = datetime.now().isoformat(timespec='seconds')
+    if len(databases) == 1:
+        runs = [run_benchmark(args, databases[0])]
+    else:
+        runs = [run_in_subprocess(args, database) for database in databases]
+
+    result = {
+        'benchmark': 'scan_storm',
+        'version': RESULT_VERSION,
+        'started_at': started_at,
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {
+            'students': args.students,
+            'concurrency': args.concurrency,
+            'rescan_ratio': args.rescan_ratio,
+            'dashboard_requests': args.dashboard_requests
+        },
+        'runs': runs
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+    else:
+        print(json.dumps(result, indent=2))
+    if not args.quiet:
+        print_summary(result, sys.stderr)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print_comparison(json.load(f), result, sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+import os
+import io
+import json
+import glob
+import time
+import hashlib
+import tempfile
+import textwrap
+import threading
+import zipfile
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont
+from werkzeug.utils import secure_filename
+
+# Rendered certificates, one directory per activity; safe to delete at any time
+CERTIFICATES_DIR = os.getenv('CERTIFICATES_DIR', os.path.join('uploads', 'certificates'))
+CERTIFICATE_WORKERS = int(os.getenv('CERTIFICATE_WORKERS', min(4, multiprocessing.cpu_count())))
+# Optional TrueType files; otherwise a serif system font (Georgia, DejaVu Serif) or Pillow's own
+CERTIFICATE_FONT = os.getenv('CERTIFICATE_FONT', '')
+CERTIFICATE_FONT_BOLD = os.getenv('CERTIFICATE_FONT_BOLD', '')
+# Part of every cache key: bump it whenever the layout below changes
+CERTIFICATE_TEMPLATE_VERSION = '1'
+
+FORMATS = {
+    'pdf': 'application/pdf',
+    'png': 'image/png'
+}
+
+# Drawn at twice the 800x600 CSS size of certificate.html; 200 dpi makes the PDF page 8x6 in
+WIDTH, HEIGHT = 1600, 1200
+PDF_RESOLUTION = 200
+GOLD = '#d4af37'
+NAVY = '#2c3e50'
+GREY = '#7f8c8d'
+RED = '#c0392b'
+
+_REGULAR_FONTS = ('georgia.ttf', 'Georgia.ttf', 'DejaVuSerif.ttf')
+_BOLD_FONTS = ('georgiab.ttf', 'Georgia Bold.ttf', 'DejaVuSerif-Bold.ttf')
+
+@lru_cache(maxsize=64)
+def _font(size, bold=False):
+    configured = CERTIFICATE_FONT_BOLD if bold else CERTIFICATE_FONT
+    for name in ((configured,) if configured else ()) + (_BOLD_FONTS if bold else _REGULAR_FONTS):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+def _fitted_font(draw, text, size, max_width, bold=False):
+    """Largest font up to size that keeps text within max_width"""
+    while size > 12 and draw.textlength(text, font=_font(size, bold)) > max_width:
+        size -= 4
+    return _font(size, bold)
+
+def certificate_fields(student_name, student_id, activity):
+    """Everything that appears on a certificate, as plain values that can be sent to a worker process"""
+    fields = {'student_name': str(student_name), 'student_id': str(student_id), 'activity_id': activity['id']}
+    for name in ('title', 'description', 'activity_type', 'event_date', 'location', 'organizer'):
+        # PostgreSQL hands back dates, not strings
+        fields[name] = str(activity[name] or '')
+    return fields
+
+def certificate_key(fields, fmt):
+    """Cache key and ETag: changes with the template version and with any printed value"""
+    payload = json.dumps([CERTIFICATE_TEMPLATE_VERSION, fmt, fields], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _student_prefix(fields):
+    # Hashed so any student id makes a safe, fixed-length file name
+    return hashlib.sha1(fields['student_id'].encode('utf-8')).hexdigest()[:16]
+
+def cache_path(fields, fmt, key=None):
+    key = key or certificate_key(fields, fmt)
+    return os.path.join(CERTIFICATES_DIR, str(fields['activity_id']), f'{_student_prefix(fields)}-{key[:32]}.{fmt}')
+
+def render_certificate(fields, fmt='pdf'):
+    """Draw the certificate.html design with Pillow and return it as PDF or PNG bytes"""
+    img = Image.new('RGB', (WIDTH, HEIGHT), 'white')
+    draw = ImageDraw.Draw(img)
+    center = WIDTH // 2
+
+    draw.rounded_rectangle((40, 40, WIDTH - 40, HEIGHT - 40), radius=30, fill='#fbfbfb', outline=GOLD, width=6)
+    for x, y in ((70, 70), (WIDTH - 130, 70), (70, HEIGHT - 130), (WIDTH - 130, HEIGHT - 130)):
+        draw.rectangle((x, y, x + 60, y + 60), outline=GOLD, width=4)
+
+    # Header: logo, institution, seal
+    draw.ellipse((470, 95, 570, 195), fill=GOLD)
+    draw.text((600, 125), 'QR ATTENDANCE SYSTEM', font=_font(34, bold=True), fill=NAVY, anchor='lm')
+    draw.text((600, 168), 'Excellence in Education', font=_font(24), fill=GREY, anchor='lm')
+    draw.ellipse((1280, 90, 1420, 230), outline=GOLD, width=6)
+    draw.ellipse((1310, 120, 1390, 200), fill=GOLD)
+
+    draw.text((center, 280), 'CERTIFICATE', font=_font(96, bold=True), fill=NAVY, anchor='mm')
+    draw.text((center, 355), 'of Participation', font=_font(36), fill=GREY, anchor='mm')
+
+    draw.text((center, 430), 'This is to certify that', font=_font(32), fill=GREY, anchor='mm')
+    name_font = _fitted_font(draw, fields['student_name'], 72, WIDTH - 320, bold=True)
+    draw.text((center, 510), fields['student_name'], font=name_font, fill=NAVY, anchor='mm')
+    draw.line((center - 400, 565, center + 400, 565), fill=GOLD, width=4)
+    draw.text((center, 610), 'has successfully participated in', font=_font(32), fill=GREY, anchor='mm')
+
+    ribbon_font = _font(28, bold=True)
+    ribbon_text = fields['activity_type'].upper()
+    half = draw.textlength(ribbon_text, font=ribbon_font) / 2 + 50
+    draw.rounded_rectangle((center - half, 655, center + half, 715), radius=30, fill=RED)
+    draw.text((center, 685), ribbon_text, font=ribbon_font, fill='white', anchor='mm')
+
+    title_font = _fitted_font(draw, fields['title'], 48, WIDTH - 320, bold=True)
+    draw.text((center, 770), fields['title'], font=title_font, fill=NAVY, anchor='mm')
+    for i, line in enumerate(textwrap.wrap(fields['description'], 80, max_lines=2, placeholder=' ...')):
+        draw.text((center, 825 + i * 36), line, font=_font(26), fill=GREY, anchor='mm')
+    meta = '   |   '.join(value for value in (fields['event_date'], fields['location']) if value)
+    draw.text((center, 920), meta, font=_font(26), fill=NAVY, anchor='mm')
+
+    # Footer: date and organizer over signature lines
+    for x, label, value in ((380, 'Date', fields['event_date']), (WIDTH - 380, 'Organizer', fields['organizer'])):
+        draw.text((x, 1030), value, font=_fitted_font(draw, value, 30, 440, bold=True), fill=NAVY, anchor='mm')
+        draw.line((x - 220, 1065, x + 220, 1065), fill=GREY, width=2)
+        draw.text((x, 1095), label, font=_font(24), fill=GREY, anchor='mm')
+
+    out = io.BytesIO()
+    if fmt == 'pdf':
+        img.save(out, 'PDF', resolution=PDF_RESOLUTION)
+    else:
+        img.save(out, 'PNG', optimize=True)
+    return out.getvalue()
+
+def _read_cached(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def _store(path, data):
+    """Write a rendering atomically and drop this student's renderings of older versions"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.render-', dir=directory)
+    with os.fdopen(fd, 'wb') as out:
+        out.write(data)
+    os.replace(tmp_path, path)
+    prefix, ext = os.path.basename(path).split('-', 1)[0], os.path.splitext(path)[1]
+    for stale in glob.glob(os.path.join(directory, f'{prefix}-*{ext}')):
+        if stale != path:
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                pass
+
+def get_certificate(fields, fmt='pdf'):
+    """(bytes, key) for one certificate, rendered in this process on a cache miss"""
+    key = certificate_key(fields, fmt)
+    path = cache_path(fields, fmt, key)
+    data = _read_cached(path)
+    if data is None:
+        data = render_certificate(fields, fmt)
+        _store(path, data)
+    return data, key
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def get_render_pool():
+    """Process-wide pool of renderer processes, recreated in each forked worker"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # spawn, not fork: the web worker has background threads holding locks
+            _pool = ProcessPoolExecutor(CERTIFICATE_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+            _pool_pid = os.getpid()
+        return _pool
+
+def iter_certificates(fields_list, fmt='pdf'):
+    """Yield (fields, bytes) in order, rendering cache misses in the process pool
+
+    Only a bounded window of renders is outstanding, so memory stays flat
+    however many participants there are.
+    """
+    window = deque()
+    limit = CERTIFICATE_WORKERS * 4
+
+    def finish(entry):
+        fields, path, result = entry
+        if isinstance(result, Future):
+            result = result.result()
+            _store(path, result)
+        return fields, result
+
+    try:
+        for fields in fields_list:
+            path = cache_path(fields, fmt)
+            data = _read_cached(path)
+            window.append((fields, path, data if data is not None else get_render_pool().submit(render_certificate, fields, fmt)))
+            while len(window) > limit:
+                yield finish(window.popleft())
+        while window:
+            yield finish(window.popleft())
+    finally:
+        # The client went away: do not keep rendering for nobody
+        for _, _, result in window:
+            if isinstance(result, Future):
+                result.cancel()
+
+def archive_name(fields, fmt):
+    name = secure_filename(f"{fields['student_id']}_{fields['student_name']}") or str(fields['student_id'])
+    return f'{name}.{fmt}'
+
+class _ZipStream:
+    """Write-only file for zipfile; the generator hands each written chunk to the client"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        return b''.join(chunks)
+
+def stream_zip(entries):
+    """Yield a zip archive of (name, bytes) entries one member at a time, without seeking
+
+    PDFs and PNGs are already compressed, so members are stored as they are.
+    """
+    out = _ZipStream()
+    date_time = time.localtime()[:6]
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_STORED) as archive:
+        for name, data in entries:
+            archive.writestr(zipfile.ZipInfo(name, date_time), data)
+            yield out.drain()
+    yield out.drain()
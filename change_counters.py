@@ -0,0 +1,143 @@
+from db_helper import execute_query
+
+# Tables whose writes bump a counter; HTTP validators are derived from these
+TRACKED_TABLES = (
+    'attendance', 'sessions', 'students', 'teachers', 'subjects', 'results',
+    'leave_applications', 'activities', 'activity_participants', 'at_risk_runs'
+)
+# PostgreSQL writers bump one of this many rows per table at random; fixed when migration 13 runs
+CHANGE_COUNTER_SHARDS = 16
+
+def create_change_counters(cursor, dialect):
+    """Create one monotonically increasing counter per tracked table, bumped by triggers
+
+    The counters live in a change_counters table updated by the triggers, so
+    a bump commits or rolls back with the write that caused it. PostgreSQL
+    bumps once per statement, SQLite once per row (writes are already
+    serialized there).
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_counters (
+            table_name TEXT PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0
+        )
+    ''')
+    placeholder = dialect['placeholder']
+    for table in TRACKED_TABLES:
+        cursor.execute(f'INSERT INTO change_counters (table_name) VALUES ({placeholder}) ON CONFLICT (table_name) DO NOTHING',
+                       (table,))
+
+    if dialect['is_postgres']:
+        cursor.execute('''
+            CREATE OR REPLACE FUNCTION bump_change_counter() RETURNS trigger AS $$
+            BEGIN
+                UPDATE change_counters SET version = version + 1 WHERE table_name = TG_TABLE_NAME;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        ''')
+        for table in TRACKED_TABLES:
+            cursor.execute(f'DROP TRIGGER IF EXISTS trg_{table}_change_counter ON {table}')
+            cursor.execute(f'''
+                CREATE TRIGGER trg_{table}_change_counter AFTER INSERT OR UPDATE OR DELETE ON {table}
+                FOR EACH STATEMENT EXECUTE FUNCTION bump_change_counter()
+            ''')
+        return
+
+    for table in TRACKED_TABLES:
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_change_counter_{event.lower()} AFTER {event} ON {table}
+                BEGIN
+                    UPDATE change_counters SET version = version + 1 WHERE table_name = '{table}';
+                END
+            ''')
+
+def drop_change_counter_sequences(cursor, dialect):
+    """Carry PostgreSQL counters over from the old per-table sequences, then drop them
+
+    nextval() is not transactional: a reader could see the new value before
+    the write that bumped it had committed, and cache the old data under it.
+    """
+    if not dialect['is_postgres']:
+        return
+    create_change_counters(cursor, dialect)
+    for table in TRACKED_TABLES:
+        cursor.execute(f"SELECT to_regclass('change_counter_{table}') IS NOT NULL AS present")
+        if not cursor.fetchone()['present']:
+            continue
+        # Never go backwards, or a client could get a 304 for data it has not seen
+        cursor.execute(f'''
+            UPDATE change_counters SET version = GREATEST(version, (SELECT last_value FROM change_counter_{table}))
+            WHERE table_name = %s
+        ''', (table,))
+        cursor.execute(f'DROP SEQUENCE change_counter_{table}')
+
+def shard_change_counters(cursor, dialect):
+    """Spread each table's counter over shard rows, so concurrent writers do not queue on one row
+
+    Every write still bumps a counter in its own transaction, but a PostgreSQL
+    statement picks one of CHANGE_COUNTER_SHARDS rows at random. Two scans
+    only wait for each other when they land on the same shard, and readers
+    sum the shards. SQLite serializes writers anyway and keeps one shard.
+    """
+    shards = CHANGE_COUNTER_SHARDS if dialect['is_postgres'] else 1
+    placeholder = dialect['placeholder']
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_counter_shards (
+            table_name TEXT NOT NULL,
+            shard INTEGER NOT NULL,
+            version BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (table_name, shard)
+        )
+    ''')
+    for table in TRACKED_TABLES:
+        for shard in range(shards):
+            cursor.execute(f'''
+                INSERT INTO change_counter_shards (table_name, shard) VALUES ({placeholder}, {placeholder})
+                ON CONFLICT (table_name, shard) DO NOTHING
+            ''', (table, shard))
+    # Shard 0 carries the old total, so no validator goes backwards
+    cursor.execute('''
+        UPDATE change_counter_shards SET version = version + (
+            SELECT c.version FROM change_counters c WHERE c.table_name = change_counter_shards.table_name)
+        WHERE shard = 0 AND table_name IN (SELECT table_name FROM change_counters)
+    ''')
+
+    if dialect['is_postgres']:
+        cursor.execute(f'''
+            CREATE OR REPLACE FUNCTION bump_change_counter() RETURNS trigger AS $$
+            DECLARE
+                -- Drawn once: random() in the WHERE clause would be re-evaluated for every row
+                picked INTEGER := floor(random() * {shards})::int;
+            BEGIN
+                UPDATE change_counter_shards SET version = version + 1
+                WHERE table_name = TG_TABLE_NAME AND shard = picked;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        ''')
+    else:
+        for table in TRACKED_TABLES:
+            for event in ('INSERT', 'UPDATE', 'DELETE'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS trg_{table}_change_counter_{event.lower()}')
+                cursor.execute(f'''
+                    CREATE TRIGGER trg_{table}_change_counter_{event.lower()} AFTER {event} ON {table}
+                    BEGIN
+                        UPDATE change_counter_shards SET version = version + 1 WHERE table_name = '{table}' AND shard = 0;
+                    END
+                ''')
+    cursor.execute('DROP TABLE change_counters')
+
+def get_change_versions(conn, tables):
+    """Current counter for each of tables, in the given order"""
+    unknown = set(tables) - set(TRACKED_TABLES)
+    if unknown:
+        raise ValueError(f'Untracked tables: {", ".join(sorted(unknown))}')
+    marks = ', '.join(['?'] * len(tables))
+    rows = execute_query(conn, f'''
+        SELECT table_name, CAST(SUM(version) AS BIGINT) AS version FROM change_counter_shards
+        WHERE table_name IN ({marks}) GROUP BY table_name
+    ''', tuple(tables), fetch_all=True)
+    versions = {row['table_name']: row['version'] for row in rows}
+    return tuple(versions.get(table, 0) for table in tables)
@@ -1,50 +1,62 @@
-import os
+from db_helper import get_sqlite_path, get_db_params, is_postgres, get_database_url
 from werkzeug.security import generate_password_hash
+from passwords import HASH_METHOD
+from rollups import create_rollup_schema, backfill_rollups
+from change_counters import create_change_counters, drop_change_counter_sequences, shard_change_counters
 
-def init_db():
-    database_url = os.getenv('DATABASE_URL', 'sqlite:///attendance.db')
-    
-    if database_url.startswith('postgresql'):
+def get_dialect():
+    """Get the SQL fragments that differ between SQLite and PostgreSQL"""
+    dialect = dict(get_db_params())
+    if is_postgres():
+        dialect.update({
+            'is_postgres': True,
+            'autoincrement': 'SERIAL PRIMARY KEY',
+            'current_timestamp': 'TIMESTAMP DEFAULT NOW()'
+        })
+    else:
+        dialect.update({
+            'is_postgres': False,
+            'autoincrement': 'INTEGER PRIMARY KEY AUTOINCREMENT',
+            'current_timestamp': 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP'
+        })
+    return dialect
+
+def get_connection():
+    """Open a dedicated (non-pooled) connection for schema work"""
+    if is_postgres():
         import psycopg2
         from psycopg2.extras import RealDictCursor
-        conn = psycopg2.connect(database_url, cursor_factory=RealDictCursor)
-        cursor = conn.cursor()
-        
-        # PostgreSQL syntax
-        autoincrement = 'SERIAL PRIMARY KEY'
-        current_timestamp = 'TIMESTAMP DEFAULT NOW()'
-        datetime_now = 'NOW()'
+        return psycopg2.connect(get_database_url(), cursor_factory=RealDictCursor)
     else:
         import sqlite3
-        conn = sqlite3.connect('attendance.db')
-        cursor = conn.cursor()
-        
-        # SQLite syntax
-        autoincrement = 'INTEGER PRIMARY KEY AUTOINCREMENT'
-        current_timestamp = 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP'
-        datetime_now = "datetime('now')"
-    
-    # Check if missing columns exist in sessions table, add if missing
-    try:
-        cursor.execute("ALTER TABLE sessions ADD COLUMN subject TEXT")
-    except sqlite3.OperationalError:
-        pass  # Column already exists
-    
-    try:
-        cursor.execute("ALTER TABLE sessions ADD COLUMN lecture_time TEXT")
-    except sqlite3.OperationalError:
-        pass  # Column already exists
-    
-    try:
-        cursor.execute("ALTER TABLE sessions ADD COLUMN location TEXT")
-    except sqlite3.OperationalError:
-        pass  # Column already exists
-    
-    try:
-        cursor.execute("ALTER TABLE sessions ADD COLUMN expiry_time TIMESTAMP")
-    except sqlite3.OperationalError:
-        pass  # Column already exists
-    
+        conn = sqlite3.connect(get_sqlite_path())
+        conn.row_factory = sqlite3.Row
+        return conn
+
+def _execute(cursor, dialect, query, params=()):
+    if dialect['placeholder'] == '%s':
+        query = query.replace('?', '%s')
+    cursor.execute(query, params)
+    return cursor
+
+def _column_exists(cursor, dialect, table, column):
+    if dialect['is_postgres']:
+        _execute(cursor, dialect, '''
+            SELECT 1 FROM information_schema.columns WHERE table_name = ? AND column_name = ?
+        ''', (table, column))
+        return cursor.fetchone() is not None
+    cursor.execute(f'PRAGMA table_info({table})')
+    return any(row['name'] == column for row in cursor.fetchall())
+
+def _add_column(cursor, dialect, table, column, definition):
+    if not _column_exists(cursor, dialect, table, column):
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+def migration_001_base_schema(cursor, dialect):
+    """Create the original tables and backfill columns added over time"""
+    autoincrement = dialect['autoincrement']
+    current_timestamp = dialect['current_timestamp']
+
     # Users table for authentication
     cursor.execute(f'''
         CREATE TABLE IF NOT EXISTS users (
@@ -56,7 +68,7 @@ def init_db():
             created_at {current_timestamp}
         )
     ''')
-    
+
     # Students table
     cursor.execute(f'''
         CREATE TABLE IF NOT EXISTS students (
@@ -69,18 +81,9 @@ def init_db():
             FOREIGN KEY (user_id) REFERENCES users (id)
         )
     ''')
-    
-    # Add division and academic_year columns if they don't exist
-    try:
-        cursor.execute("ALTER TABLE students ADD COLUMN division TEXT DEFAULT 'Section A'")
-    except:
-        pass
-    
-    try:
-        cursor.execute("ALTER TABLE students ADD COLUMN academic_year TEXT DEFAULT '1st Year'")
-    except:
-        pass
-    
+    _add_column(cursor, dialect, 'students', 'division', "TEXT DEFAULT 'Section A'")
+    _add_column(cursor, dialect, 'students', 'academic_year', "TEXT DEFAULT '1st Year'")
+
     # Teachers table
     cursor.execute(f'''
         CREATE TABLE IF NOT EXISTS teachers (
@@ -92,7 +95,7 @@ def init_db():
             FOREIGN KEY (user_id) REFERENCES users (id)
         )
     ''')
-    
+
     # Attendance sessions table
     cursor.execute(f'''
         CREATE TABLE IF NOT EXISTS sessions (
@@ -103,10 +106,14 @@ def init_db():
             location TEXT,
             expiry_time TIMESTAMP,
             created_at {current_timestamp},
-            is_active BOOLEAN DEFAULT {'TRUE' if database_url.startswith('postgresql') else '1'}
+            is_active BOOLEAN DEFAULT {dialect['bool_true']}
         )
     ''')
-    
+    _add_column(cursor, dialect, 'sessions', 'subject', 'TEXT')
+    _add_column(cursor, dialect, 'sessions', 'lecture_time', 'TEXT')
+    _add_column(cursor, dialect, 'sessions', 'location', 'TEXT')
+    _add_column(cursor, dialect, 'sessions', 'expiry_time', 'TIMESTAMP')
+
     # Attendance records table
     cursor.execute(f'''
         CREATE TABLE IF NOT EXISTS attendance (
@@ -117,11 +124,11 @@ def init_db():
             FOREIGN KEY (session_id) REFERENCES sessions (id)
         )
     ''')
-    
+
     # Subjects table
-    cursor.execute('''
+    cursor.execute(f'''
         CREATE TABLE IF NOT EXISTS subjects (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            id {autoincrement},
             name TEXT NOT NULL,
             code TEXT,
             academic_year TEXT NOT NULL,
@@ -131,15 +138,15 @@ def init_db():
             semester TEXT,
             department TEXT,
             teacher_id INTEGER NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_at {current_timestamp},
             FOREIGN KEY (teacher_id) REFERENCES users (id)
         )
     ''')
-    
+
     # Leave applications table
-    cursor.execute('''
+    cursor.execute(f'''
         CREATE TABLE IF NOT EXISTS leave_applications (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            id {autoincrement},
             student_id TEXT NOT NULL,
             student_name TEXT NOT NULL,
             leave_type TEXT NOT NULL,
@@ -148,17 +155,17 @@ def init_db():
             reason TEXT NOT NULL,
             attachment_path TEXT,
             status TEXT DEFAULT 'pending',
-            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            applied_at {current_timestamp},
             reviewed_at TIMESTAMP,
             reviewed_by INTEGER,
             FOREIGN KEY (reviewed_by) REFERENCES users (id)
         )
     ''')
-    
+
     # Activities table
-    cursor.execute('''
+    cursor.execute(f'''
         CREATE TABLE IF NOT EXISTS activities (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            id {autoincrement},
             title TEXT NOT NULL,
             description TEXT NOT NULL,
             activity_type TEXT NOT NULL,
@@ -170,34 +177,29 @@ def init_db():
             requirements TEXT,
             organizer TEXT NOT NULL,
             teacher_id INTEGER NOT NULL,
-            certificate_enabled BOOLEAN DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            certificate_enabled BOOLEAN DEFAULT {dialect['bool_false']},
+            created_at {current_timestamp},
             FOREIGN KEY (teacher_id) REFERENCES users (id)
         )
     ''')
-    
-    # Add certificate_enabled column if it doesn't exist
-    try:
-        cursor.execute("ALTER TABLE activities ADD COLUMN certificate_enabled BOOLEAN DEFAULT 0")
-    except sqlite3.OperationalError:
-        pass  # Column already exists
-    
+    _add_column(cursor, dialect, 'activities', 'certificate_enabled', f"BOOLEAN DEFAULT {dialect['bool_false']}")
+
     # Activity participants table
-    cursor.execute('''
+    cursor.execute(f'''
         CREATE TABLE IF NOT EXISTS activity_participants (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            id {autoincrement},
             activity_id INTEGER NOT NULL,
             student_id TEXT NOT NULL,
             student_name TEXT NOT NULL,
-            participated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            participated_at {current_timestamp},
             FOREIGN KEY (activity_id) REFERENCES activities (id)
         )
     ''')
-    
+
     # Results table
-    cursor.execute('''
+    cursor.execute(f'''
         CREATE TABLE IF NOT EXISTS results (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            id {autoincrement},
             student_id TEXT NOT NULL,
             subject_id INTEGER NOT NULL,
             exam_type TEXT NOT NULL,
@@ -205,34 +207,33 @@ def init_db():
             max_marks REAL NOT NULL,
             remarks TEXT,
             teacher_id INTEGER NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_at {current_timestamp},
             FOREIGN KEY (subject_id) REFERENCES subjects (id),
             FOREIGN KEY (teacher_id) REFERENCES users (id)
         )
     ''')
-    
-    # Create default admin user
-    admin_hash = generate_password_hash('admin123')
-    cursor.execute('''
-        INSERT OR IGNORE INTO users (username, email, password_hash, role)
-        VALUES (?, ?, ?, ?)
-    ''', ('admin', 'admin@example.com', admin_hash, 'admin'))
-    
-    # Create default teacher user
-    teacher_hash = generate_password_hash('teacher123')
-    cursor.execute('''
-        INSERT OR IGNORE INTO users (username, email, password_hash, role)
-        VALUES (?, ?, ?, ?)
-    ''', ('teacher', 'teacher@example.com', teacher_hash, 'teacher'))
-    
+
+def migration_002_default_accounts(cursor, dialect):
+    """Seed the default admin, teacher and sample student accounts"""
+    # Create default admin and teacher users
+    default_users = [
+        ('admin', 'admin@example.com', 'admin123', 'admin'),
+        ('teacher', 'teacher@example.com', 'teacher123', 'teacher')
+    ]
+    for username, email, password, role in default_users:
+        _execute(cursor, dialect, '''
+            INSERT INTO users (username, email, password_hash, role)
+            VALUES (?, ?, ?, ?) ON CONFLICT DO NOTHING
+        ''', (username, email, generate_password_hash(password, HASH_METHOD), role))
+
     # Get teacher user ID and create teacher record
-    teacher_user = cursor.execute('SELECT id FROM users WHERE username = ?', ('teacher',)).fetchone()
+    teacher_user = _execute(cursor, dialect, 'SELECT id FROM users WHERE username = ?', ('teacher',)).fetchone()
     if teacher_user:
-        cursor.execute('''
-            INSERT OR IGNORE INTO teachers (teacher_id, name, subject, user_id)
-            VALUES (?, ?, ?, ?)
-        ''', ('T001', 'Sanket Patil', 'Computer Science', teacher_user[0]))
-    
+        _execute(cursor, dialect, '''
+            INSERT INTO teachers (teacher_id, name, subject, user_id)
+            VALUES (?, ?, ?, ?) ON CONFLICT DO NOTHING
+        ''', ('T001', 'Sanket Patil', 'Computer Science', teacher_user['id']))
+
     # Add sample students
     sample_students = [
         ('student1@gmail.com', 'student123', '001', 'John Doe'),
@@ -240,44 +241,223 @@ def init_db():
         ('student3@gmail.com', 'student123', '003', 'Mike Johnson'),
         ('sanketpatil@gmail.com', 'student123', '5345', 'Sanket Patil')
     ]
-    
+
     for email, password, student_id, name in sample_students:
-        password_hash = generate_password_hash(password)
-        cursor.execute('''
-            INSERT OR IGNORE INTO users (username, email, password_hash, role)
-            VALUES (?, ?, ?, ?)
-        ''', (email, email, password_hash, 'student'))
-        
-        user_id = cursor.execute('SELECT id FROM users WHERE email = ?', (email,)).fetchone()
-        if user_id:
-            cursor.execute('''
-                INSERT OR IGNORE INTO students (student_id, name, user_id)
-                VALUES (?, ?, ?)
-            ''', (student_id, name, user_id[0]))
-    
+        _execute(cursor, dialect, '''
+            INSERT INTO users (username, email, password_hash, role)
+            VALUES (?, ?, ?, ?) ON CONFLICT DO NOTHING
+        ''', (email, email, generate_password_hash(password, HASH_METHOD), 'student'))
+
+        user = _execute(cursor, dialect, 'SELECT id FROM users WHERE email = ?', (email,)).fetchone()
+        if user:
+            _execute(cursor, dialect, '''
+                INSERT INTO students (student_id, name, user_id)
+                VALUES (?, ?, ?) ON CONFLICT DO NOTHING
+            ''', (student_id, name, user['id']))
+
     # Add sample teachers
     sample_teachers = [
         ('teacher1@gmail.com', 'teacher123', 'T002', 'Dr. Smith', 'Mathematics'),
         ('teacher2@gmail.com', 'teacher123', 'T003', 'Prof. Johnson', 'Physics')
     ]
-    
+
     for email, password, teacher_id, name, subject in sample_teachers:
-        password_hash = generate_password_hash(password)
-        cursor.execute('''
-            INSERT OR IGNORE INTO users (username, email, password_hash, role)
-            VALUES (?, ?, ?, ?)
-        ''', (email, email, password_hash, 'teacher'))
-        
-        user_id = cursor.execute('SELECT id FROM users WHERE email = ?', (email,)).fetchone()
-        if user_id:
-            cursor.execute('''
-                INSERT OR IGNORE INTO teachers (teacher_id, name, subject, user_id)
-                VALUES (?, ?, ?, ?)
-            ''', (teacher_id, name, subject, user_id[0]))
-    
-    conn.commit()
-    conn.close()
+        _execute(cursor, dialect, '''
+            INSERT INTO users (username, email, password_hash, role)
+            VALUES (?, ?, ?, ?) ON CONFLICT DO NOTHING
+        ''', (email, email, generate_password_hash(password, HASH_METHOD), 'teacher'))
+
+        user = _execute(cursor, dialect, 'SELECT id FROM users WHERE email = ?', (email,)).fetchone()
+        if user:
+            _execute(cursor, dialect, '''
+                INSERT INTO teachers (teacher_id, name, subject, user_id)
+                VALUES (?, ?, ?, ?) ON CONFLICT DO NOTHING
+            ''', (teacher_id, name, subject, user['id']))
+
+def migration_003_hot_query_indexes(cursor, dialect):
+    """Index the columns used by the attendance, results and leave queries"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_attendance_student_id ON attendance (student_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_attendance_session_id ON attendance (session_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_expiry_time ON sessions (expiry_time)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_results_subject_id ON results (subject_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_leave_applications_applied_at ON leave_applications (applied_at)')
+
+def migration_004_unique_attendance(cursor, dialect):
+    """Allow one attendance row per student per session"""
+    # Drop duplicates left behind by the old check-then-insert path
+    cursor.execute('''
+        DELETE FROM attendance WHERE id NOT IN (
+            SELECT MIN(id) FROM attendance GROUP BY student_id, session_id
+        )
+    ''')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_attendance_student_session
+        ON attendance (student_id, session_id)
+    ''')
+    # The unique index has student_id as its leading column
+    cursor.execute('DROP INDEX IF EXISTS idx_attendance_student_id')
+
+def migration_005_keyset_pagination_indexes(cursor, dialect):
+    """Composite indexes matching the paginated list endpoints' sort keys"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_attendance_marked_at ON attendance (marked_at, id)')
+    cursor.execute('DROP INDEX IF EXISTS idx_leave_applications_applied_at')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_leave_applications_applied_at ON leave_applications (applied_at, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_leave_applications_status ON leave_applications (status, applied_at, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_activities_event_date ON activities (event_date, id)')
+
+def migration_006_sessions_subject_id(cursor, dialect):
+    """Link sessions to subjects by id instead of by name"""
+    _add_column(cursor, dialect, 'sessions', 'subject_id', 'INTEGER REFERENCES subjects (id)')
+    # Backfill by name; where two subjects share a name the older one wins
+    cursor.execute('''
+        UPDATE sessions SET subject_id = (
+            SELECT MIN(sub.id) FROM subjects sub WHERE sub.name = sessions.subject
+        )
+        WHERE subject_id IS NULL
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_subject_id ON sessions (subject_id)')
+
+def migration_007_attendance_rollups(cursor, dialect):
+    """Daily attendance rollups kept current by triggers, backfilled from history"""
+    create_rollup_schema(cursor, dialect)
+    backfill_rollups(cursor, dialect['placeholder'])
+
+def migration_008_at_risk_students(cursor, dialect):
+    """Snapshot table written by the at-risk batch job, plus its run log"""
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS at_risk_students (
+            student_id TEXT NOT NULL,
+            subject_id INTEGER NOT NULL,
+            sessions_held INTEGER NOT NULL,
+            sessions_attended INTEGER NOT NULL,
+            attendance_pct REAL,
+            results_avg REAL,
+            reasons TEXT NOT NULL,
+            computed_at TIMESTAMP NOT NULL,
+            PRIMARY KEY (subject_id, student_id)
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS at_risk_runs (
+            id {dialect['autoincrement']},
+            started_at TIMESTAMP NOT NULL,
+            finished_at TIMESTAMP NOT NULL,
+            pairs_evaluated INTEGER NOT NULL,
+            at_risk_count INTEGER NOT NULL
+        )
+    ''')
+    # The job filters sessions and results by age
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_created_at ON sessions (created_at)')
+
+def migration_009_change_counters(cursor, dialect):
+    """Per-table change counters used to build HTTP validators"""
+    create_change_counters(cursor, dialect)
+
+def migration_010_attachment_metadata(cursor, dialect):
+    """Original filename and content hash of content-addressed leave attachments"""
+    _add_column(cursor, dialect, 'leave_applications', 'attachment_name', 'TEXT')
+    _add_column(cursor, dialect, 'leave_applications', 'attachment_sha256', 'TEXT')
+
+def migration_011_at_risk_schedule(cursor, dialect):
+    """Single-row claim on the next scheduled at-risk run, shared by every worker"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS at_risk_schedule (
+            id INTEGER PRIMARY KEY,
+            claimed_at TEXT NOT NULL
+        )
+    ''')
+    _execute(cursor, dialect, 'INSERT INTO at_risk_schedule (id, claimed_at) VALUES (1, ?) ON CONFLICT (id) DO NOTHING',
+             ('1970-01-01 00:00:00',))
+
+def migration_012_transactional_change_counters(cursor, dialect):
+    """PostgreSQL change counters move from sequences into the change_counters table"""
+    drop_change_counter_sequences(cursor, dialect)
+
+def migration_013_sharded_change_counters(cursor, dialect):
+    """Change counters move to change_counter_shards, so concurrent writes do not contend"""
+    shard_change_counters(cursor, dialect)
+
+# Ordered migration steps: (version, description, function). Append new steps
+# with the next version number; never edit or reorder a released step.
+MIGRATIONS = [
+    (1, 'base schema', migration_001_base_schema),
+    (2, 'default accounts', migration_002_default_accounts),
+    (3, 'hot query indexes', migration_003_hot_query_indexes),
+    (4, 'unique attendance per session', migration_004_unique_attendance),
+    (5, 'keyset pagination indexes', migration_005_keyset_pagination_indexes),
+    (6, 'sessions.subject_id', migration_006_sessions_subject_id),
+    (7, 'attendance rollups', migration_007_attendance_rollups),
+    (8, 'at-risk students', migration_008_at_risk_students),
+    (9, 'change counters', migration_009_change_counters),
+    (10, 'attachment metadata', migration_010_attachment_metadata),
+    (11, 'at-risk schedule claim', migration_011_at_risk_schedule),
+    (12, 'transactional change counters', migration_012_transactional_change_counters),
+    (13, 'sharded change counters', migration_013_sharded_change_counters),
+]
+
+def get_schema_version(conn):
+    """Get the applied schema version, or None if schema_version does not exist"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT MAX(version) AS version FROM schema_version')
+        row = cursor.fetchone()
+    except Exception:
+        conn.rollback()
+        return None
+    return (row['version'] or 0) if row else 0
+
+def _begin_migration(conn, cursor, dialect):
+    # Serialize concurrent workers booting against the same database
+    if dialect['is_postgres']:
+        cursor.execute('LOCK TABLE schema_version IN EXCLUSIVE MODE')
+    else:
+        cursor.execute('BEGIN IMMEDIATE')
+
+def migrate(conn):
+    """Apply pending migrations in order; returns the list of versions applied"""
+    latest = MIGRATIONS[-1][0]
+    current = get_schema_version(conn)
+    if current is not None and current >= latest:
+        return []
+
+    dialect = get_dialect()
+    cursor = conn.cursor()
+    if current is None:
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at {dialect['current_timestamp']}
+            )
+        ''')
+        conn.commit()
+
+    applied = []
+    for version, description, step in MIGRATIONS:
+        _begin_migration(conn, cursor, dialect)
+        try:
+            # Re-check under the lock in case another worker got here first
+            cursor.execute('SELECT 1 FROM schema_version WHERE version = ' + dialect['placeholder'], (version,))
+            if cursor.fetchone():
+                conn.rollback()
+                continue
+            step(cursor, dialect)
+            _execute(cursor, dialect, 'INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                     (version, description))
+            conn.commit()
+            applied.append(version)
+        except Exception:
+            conn.rollback()
+            raise
+    return applied
+
+def init_db():
+    conn = get_connection()
+    try:
+        migrate(conn)
+    finally:
+        conn.close()
 
 if __name__ == '__main__':
     init_db()
-    print("Database initialized successfully!")
\ No newline at end of file
+    print("Database initialized successfully!")
@@ -1,9 +1,47 @@
 import os
+import time
+import random
+import threading
+
+# Pool settings (overridable through the environment)
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+PG_POOL_MIN = int(os.getenv('PG_POOL_MIN', 1))
+PG_POOL_MAX = int(os.getenv('PG_POOL_MAX', 10))
+PG_POOL_TIMEOUT = float(os.getenv('PG_POOL_TIMEOUT', 10))
+DB_LOCK_RETRIES = int(os.getenv('DB_LOCK_RETRIES', 5))
+DB_LOCK_BACKOFF = float(os.getenv('DB_LOCK_BACKOFF', 0.05))
+
+_sqlite_local = threading.local()
+_pg_pool = None
+_pg_pool_lock = threading.Lock()
+_pg_slots = threading.BoundedSemaphore(PG_POOL_MAX)
+_pool_pid = os.getpid()
+_in_use = 0
+_in_use_lock = threading.Lock()
+# Called with the seconds spent in each pool checkout and database call (see metrics.py)
+_db_time_observer = None
+# Called after every statement with (cursor, statement, params, seconds, many) (see query_log.py)
+_query_observers = []
+
+def get_database_url():
+    """Get the configured database URL"""
+    return os.getenv('DATABASE_URL', 'sqlite:///attendance.db')
+
+def is_postgres():
+    """Check whether the configured database is PostgreSQL"""
+    return get_database_url().startswith('postgresql')
+
+def get_sqlite_path():
+    """Get the SQLite file path from DATABASE_URL"""
+    database_url = get_database_url()
+    if database_url.startswith('sqlite:///'):
+        return database_url[len('sqlite:///'):] or 'attendance.db'
+    return 'attendance.db'
 
 def get_db_params():
     """Get database-specific parameters and syntax"""
-    database_url = os.getenv('DATABASE_URL', 'sqlite:///attendance.db')
-    
+    database_url = get_database_url()
+
     if database_url.startswith('postgresql'):
         return {
             'placeholder': '%s',
@@ -23,23 +61,246 @@ def get_db_params():
             'bool_false': '0'
         }
 
-def execute_query(conn, query, params=None, fetch_one=False, fetch_all=False):
-    """Execute query with proper parameter handling"""
-    db_params = get_db_params()
-    
-    # Replace placeholders if needed
-    if db_params['placeholder'] == '%s':
+def is_locked_error(error):
+    """Check whether an exception is SQLite's transient lock contention error"""
+    message = str(error).lower()
+    return 'database is locked' in message or 'database table is locked' in message
+
+def set_db_time_observer(observer):
+    """Register a callable that receives the duration of every database call"""
+    global _db_time_observer
+    _db_time_observer = observer
+
+def _observe_db_time(started):
+    if _db_time_observer is not None:
+        _db_time_observer(time.perf_counter() - started)
+
+def add_query_observer(observer):
+    """Register a callable that sees every statement run through timed_execute"""
+    _query_observers.append(observer)
+
+def run_with_retry(func, *args, **kwargs):
+    """Run a database call, retrying with jittered backoff while the database is locked"""
+    started = time.perf_counter()
+    delay = DB_LOCK_BACKOFF
+    try:
+        for attempt in range(DB_LOCK_RETRIES + 1):
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if attempt == DB_LOCK_RETRIES or not is_locked_error(e):
+                    raise
+                time.sleep(delay + random.uniform(0, delay))
+                delay *= 2
+    finally:
+        _observe_db_time(started)
+
+def _connect_sqlite():
+    """Open a SQLite connection with WAL and busy_timeout configured once"""
+    import sqlite3
+    conn = sqlite3.connect(get_sqlite_path(), timeout=SQLITE_BUSY_TIMEOUT_MS / 1000.0,
+                           check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+def _get_pg_pool():
+    """Create the bounded psycopg2 pool on first use"""
+    global _pg_pool
+    if _pg_pool is None:
+        with _pg_pool_lock:
+            if _pg_pool is None:
+                from psycopg2.pool import ThreadedConnectionPool
+                from psycopg2.extras import RealDictCursor
+                _pg_pool = ThreadedConnectionPool(PG_POOL_MIN, PG_POOL_MAX, get_database_url(),
+                                                  cursor_factory=RealDictCursor)
+    return _pg_pool
+
+def _check_fork():
+    """Drop connections inherited from a parent process"""
+    global _pool_pid, _pg_pool, _pg_slots, _sqlite_local, _in_use
+    if os.getpid() != _pool_pid:
+        _pool_pid = os.getpid()
+        _in_use = 0
+        _pg_pool = None
+        _pg_slots = threading.BoundedSemaphore(PG_POOL_MAX)
+        _sqlite_local = threading.local()
+
+def _checkout():
+    if is_postgres():
+        # Block (up to PG_POOL_TIMEOUT) instead of failing when the pool is exhausted
+        if not _pg_slots.acquire(timeout=PG_POOL_TIMEOUT):
+            raise RuntimeError('Timed out waiting for a database connection')
+        try:
+            return _get_pg_pool().getconn()
+        except Exception:
+            _pg_slots.release()
+            raise
+
+    conn = getattr(_sqlite_local, 'conn', None)
+    if conn is None:
+        conn = _connect_sqlite()
+        _sqlite_local.conn = conn
+    return conn
+
+def acquire_connection():
+    """Take a raw connection from the pool"""
+    global _in_use
+    _check_fork()
+    started = time.perf_counter()
+    try:
+        conn = _checkout()
+    finally:
+        _observe_db_time(started)
+    with _in_use_lock:
+        _in_use += 1
+    return conn
+
+def release_connection(conn):
+    """Return a raw connection to the pool, discarding any uncommitted work"""
+    global _in_use
+    with _in_use_lock:
+        _in_use -= 1
+    try:
+        conn.rollback()
+        broken = False
+    except Exception:
+        broken = True
+
+    if is_postgres():
+        # A broken connection is closed so the pool does not hand it out again
+        _get_pg_pool().putconn(conn, close=broken)
+        _pg_slots.release()
+    elif broken:
+        _sqlite_local.conn = None
+
+def close_pool():
+    """Close every pooled connection owned by this process"""
+    global _pg_pool
+    if _pg_pool is not None:
+        _pg_pool.closeall()
+        _pg_pool = None
+    conn = getattr(_sqlite_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _sqlite_local.conn = None
+
+def pool_stats():
+    """Connections this process has checked out, and the pool limit (None for SQLite)"""
+    return {'in_use': _in_use, 'max': PG_POOL_MAX if is_postgres() else None}
+
+def timed_execute(cursor, query, params=None, many=False):
+    """Run one statement on cursor; the single path every request query goes through
+
+    Fixes placeholders for the configured database, retries lock errors and
+    reports the statement and its duration to the query observers.
+    """
+    if isinstance(cursor, InstrumentedCursor):
+        cursor = cursor.raw
+    if get_db_params()['placeholder'] == '%s':
         query = query.replace('?', '%s')
-    
-    cursor = conn.cursor()
-    if params:
-        cursor.execute(query, params)
+    started = time.perf_counter()
+    if many:
+        run_with_retry(cursor.executemany, query, params)
+    elif params:
+        run_with_retry(cursor.execute, query, params)
     else:
-        cursor.execute(query)
-    
+        run_with_retry(cursor.execute, query)
+    seconds = time.perf_counter() - started
+    for observer in _query_observers:
+        observer(cursor, query, params, seconds, many)
+    return cursor
+
+class InstrumentedCursor:
+    """Cursor wrapper that sends execute/executemany through timed_execute"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    @property
+    def raw(self):
+        return self._cursor
+
+    def execute(self, query, params=None):
+        timed_execute(self._cursor, query, params)
+        return self
+
+    def executemany(self, query, seq_of_params):
+        timed_execute(self._cursor, query, seq_of_params, many=True)
+        return self
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class PooledConnection:
+    """Request-scoped handle on a pooled connection
+
+    close() is a no-op so existing route code can keep calling it; the
+    underlying connection goes back to the pool on app context teardown.
+    Statements run through instrumented cursors, so conn.execute also works
+    on PostgreSQL.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    @property
+    def raw(self):
+        return self._conn
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs))
+
+    def execute(self, query, params=()):
+        return self.cursor().execute(query, params)
+
+    def executemany(self, query, seq_of_params):
+        return self.cursor().executemany(query, seq_of_params)
+
+    def commit(self):
+        return run_with_retry(self._conn.commit)
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+def _raw_connection(conn):
+    return conn.raw if isinstance(conn, PooledConnection) else conn
+
+def stream_query(conn, query, params=None, chunk_size=1000):
+    """Yield lists of rows in chunks without materializing the whole result set"""
+    conn = _raw_connection(conn)
+    if get_db_params()['placeholder'] == '%s':
+        # Named cursors are server-side in psycopg2; a plain cursor would fetch everything
+        cursor = conn.cursor(name=f'stream_{id(query)}_{time.monotonic_ns()}')
+        cursor.itersize = chunk_size
+    else:
+        cursor = conn.cursor()
+
+    timed_execute(cursor, query, params)
+    try:
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+def execute_query(conn, query, params=None, fetch_one=False, fetch_all=False):
+    """Execute query with proper parameter handling"""
+    cursor = timed_execute(_raw_connection(conn).cursor(), query, params)
+
     if fetch_one:
         return cursor.fetchone()
     elif fetch_all:
         return cursor.fetchall()
     else:
-        return cursor
\ No newline at end of file
+        return cursor
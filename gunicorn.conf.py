@@ -0,0 +1,48 @@
+"""
+Gunicorn settings for production (python run.py --production)
+Every value can be overridden from the environment.
+"""
+
+import os
+import multiprocessing
+
+bind = os.getenv('BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+
+# Processes use every core; threads overlap the database and file I/O inside each one
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Import the app (migrations, asset build, template warm-up) once in the master, then fork.
+# Code changes then need a new master: send USR2, then QUIT to the old one. HUP only restarts workers.
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+
+# Recycle workers after N requests (jittered so they do not all restart together)
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+# Precompile templates in the master so every forked worker starts warm
+os.environ.setdefault('TEMPLATE_WARMUP', '1')
+
+def on_starting(server):
+    # Workers write metrics under the master's pid; counters restart with the server,
+    # and snapshots left by servers that have exited are dropped
+    os.environ['METRICS_SERVER_PID'] = str(os.getpid())
+    from metrics import clear
+    clear()
+
+def pre_fork(server, worker):
+    # Never hand the master's database handles to a child
+    from db_helper import close_pool
+    close_pool()
+
+def post_fork(server, worker):
+    server.log.info(f'Worker spawned (pid: {worker.pid})')
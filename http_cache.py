@@ -0,0 +1,84 @@
+import os
+import gzip
+import zlib
+import hashlib
+from functools import wraps
+from flask import request, session, current_app, g
+from change_counters import get_change_versions
+
+# JSON bodies smaller than this are sent as-is; compressing them saves less than the headers cost
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))
+COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))
+COMPRESS_MIMETYPES = {'application/json'}
+
+def _etag_for(versions):
+    # The body is a function of the request, the viewer and the source tables' contents
+    raw = '|'.join([request.full_path, session.get('role') or '', str(session.get('user_id')),
+                    ','.join(str(v) for v in versions)])
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:20]
+
+def conditional_response(tables):
+    """Answer GETs with a 304 when none of tables changed since the client's ETag
+
+    The ETag is computed from per-table change counters before the view runs,
+    so a matching request costs one small query and no serialization.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method != 'GET':
+                return f(*args, **kwargs)
+
+            conn = current_app.extensions['http_cache']['get_connection']()
+            versions = get_change_versions(conn, tables)
+            # Inner cached_response decorators key on the same versions as the ETag
+            g.change_versions = (tables, versions)
+            etag = _etag_for(versions)
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            # Weak because the bytes differ between identity and compressed encodings
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Cookie')
+            return response
+        return decorated_function
+    return decorator
+
+def _pick_encoding():
+    accepted = request.accept_encodings
+    for encoding in ('gzip', 'deflate'):
+        if accepted[encoding]:
+            return encoding
+    return None
+
+def compress_response(response):
+    """after_request hook: gzip or deflate JSON bodies above COMPRESS_MIN_BYTES"""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or response.mimetype not in COMPRESS_MIMETYPES or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    if response.content_length is not None and response.content_length < COMPRESS_MIN_BYTES:
+        return response
+
+    encoding = _pick_encoding()
+    if encoding is None:
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+    if encoding == 'gzip':
+        body = gzip.compress(body, COMPRESS_LEVEL, mtime=0)
+    else:
+        body = zlib.compress(body, COMPRESS_LEVEL)
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def init_app(app, get_connection):
+    """Register the compression hook; get_connection returns the request's DB connection"""
+    app.extensions['http_cache'] = {'get_connection': get_connection}
+    app.after_request(compress_response)
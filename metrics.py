@@ -0,0 +1,293 @@
+import os
+import json
+import time
+import atexit
+import shutil
+import tempfile
+import threading
+from flask import g, request, has_app_context, before_render_template, template_rendered
+from db_helper import set_db_time_observer
+
+# Each process writes its counters under METRICS_DIR/<server pid>/; /metrics merges that server's files.
+# '' keeps metrics per process
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'qr_attendance_metrics'))
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 5))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name -> (type, help); gauges are summed over live processes only
+METRICS = {
+    'http_requests_total': ('counter', 'Requests by route, method and status code'),
+    'http_request_duration_seconds': ('histogram', 'Request latency by route'),
+    'http_request_db_seconds': ('histogram', 'Time per request spent checking out connections and running queries'),
+    'http_request_render_seconds': ('histogram', 'Time per request spent rendering templates'),
+    'qr_render_seconds': ('histogram', 'QR image renders (cache misses) by format'),
+    'http_requests_in_flight': ('gauge', 'Requests currently being handled'),
+    'db_pool_connections_in_use': ('gauge', 'Database connections checked out'),
+    'db_pool_connections_max': ('gauge', 'Database pool size limit (PostgreSQL only)'),
+    'attendance_queue_depth': ('gauge', 'Scans waiting for the attendance writer')
+}
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+class MetricsRegistry:
+    """Counters and histograms for this process, with gauges read on collection"""
+
+    def __init__(self):
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, labels, amount=1):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        key = _key(name, labels)
+        with self._lock:
+            entry = self._histograms.get(key)
+            if entry is None:
+                entry = self._histograms[key] = {'buckets': [0] * (len(LATENCY_BUCKETS) + 1), 'sum': 0.0, 'count': 0}
+            index = next((i for i, bound in enumerate(LATENCY_BUCKETS) if value <= bound), len(LATENCY_BUCKETS))
+            entry['buckets'][index] += 1
+            entry['sum'] += value
+            entry['count'] += 1
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def gauge(self, name, labels, read):
+        """Register a callable whose value is sampled whenever the registry is collected"""
+        self._gauges[_key(name, labels)] = read
+
+    def snapshot(self):
+        with self._lock:
+            counters = [[name, dict(labels), value] for (name, labels), value in self._counters.items()]
+            histograms = [[name, dict(labels), dict(entry, buckets=list(entry['buckets']))]
+                          for (name, labels), entry in self._histograms.items()]
+        gauges = [[name, dict(labels), read()] for (name, labels), read in self._gauges.items()]
+        return {'pid': os.getpid(), 'counters': counters, 'histograms': histograms, 'gauges': gauges}
+
+registry = MetricsRegistry()
+
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+_dirty = False
+_flusher_pid = None
+_process_pid = os.getpid()
+# gunicorn.conf.py exports the master's pid; otherwise the process that imported this module is the server
+_server_pid = os.getpid()
+# Unique per process lifetime, so a recycled worker whose pid is reused keeps its own file
+_snapshot_name = f'{_process_pid}-{time.time_ns()}.json'
+
+def _check_fork():
+    """Start from zero in a forked worker instead of re-reporting the parent's counts"""
+    global _process_pid, _snapshot_name, _in_flight
+    if os.getpid() != _process_pid:
+        _process_pid = os.getpid()
+        _snapshot_name = f'{_process_pid}-{time.time_ns()}.json'
+        _in_flight = 0
+        registry.reset()
+
+def _process_alive(pid):
+    if os.name == 'nt':
+        # os.kill on Windows terminates the process instead of probing it
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _server_dir():
+    """This server's snapshot directory; workers of one master share it"""
+    return os.path.join(METRICS_DIR, os.getenv('METRICS_SERVER_PID') or str(_server_pid))
+
+def flush():
+    """Write this process's snapshot for the other workers' /metrics to read"""
+    global _dirty
+    _dirty = False
+    if not METRICS_DIR:
+        return
+    _check_fork()
+    directory = _server_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, _snapshot_name)
+    tmp_path = f'{path}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(registry.snapshot(), f)
+    os.replace(tmp_path, path)
+
+def _flush_loop():
+    while True:
+        time.sleep(METRICS_FLUSH_SECONDS)
+        if _dirty:
+            flush()
+
+def _ensure_flusher():
+    # Threads do not survive fork, so each worker starts its own on its first request
+    global _flusher_pid
+    if _flusher_pid == os.getpid() or not METRICS_DIR:
+        return
+    with _in_flight_lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_loop, name='metrics-flush', daemon=True).start()
+
+def prune():
+    """Remove the snapshots of servers that have exited (and files from before per-server directories)"""
+    if not METRICS_DIR or not os.path.isdir(METRICS_DIR):
+        return
+    for name in os.listdir(METRICS_DIR):
+        path = os.path.join(METRICS_DIR, name)
+        if name.endswith('.json') and os.path.isfile(path):
+            os.remove(path)
+        elif name.isdigit() and not _process_alive(int(name)):
+            shutil.rmtree(path, ignore_errors=True)
+
+def clear():
+    """Start this server's counters from zero; run once when the server (re)starts"""
+    if not METRICS_DIR:
+        return
+    prune()
+    shutil.rmtree(_server_dir(), ignore_errors=True)
+
+def _snapshots():
+    if not METRICS_DIR:
+        return [registry.snapshot()]
+    flush()
+    directory = _server_dir()
+    snapshots = []
+    for name in os.listdir(directory):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+def collect():
+    """Merge every process's snapshot: counters and histograms from all, gauges from live ones"""
+    merged = {}
+    for snapshot in _snapshots():
+        # A recycled worker's requests still count; its in-flight and pool gauges do not
+        alive = snapshot['pid'] == os.getpid() or _process_alive(snapshot['pid'])
+        for name, labels, value in snapshot['counters'] + (snapshot['gauges'] if alive else []):
+            key = _key(name, labels)
+            merged[key] = merged.get(key, 0) + value
+        for name, labels, entry in snapshot['histograms']:
+            key = _key(name, labels)
+            total = merged.setdefault(key, {'buckets': [0] * len(entry['buckets']), 'sum': 0.0, 'count': 0})
+            total['buckets'] = [a + b for a, b in zip(total['buckets'], entry['buckets'])]
+            total['sum'] += entry['sum']
+            total['count'] += entry['count']
+    return merged
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(labels) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def render_prometheus():
+    """All metrics in the Prometheus text exposition format"""
+    merged = collect()
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        series = sorted((labels, value) for (metric, labels), value in merged.items() if metric == name)
+        if not series:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in series:
+            if kind != 'histogram':
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+                continue
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), value['buckets']):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {value["sum"]:.6f}')
+            lines.append(f'{name}_count{_format_labels(labels)} {value["count"]}')
+    return '\n'.join(lines) + '\n'
+
+def _add_request_time(attr, seconds):
+    # Only time spent inside a request is attributed; background threads have no app context
+    if has_app_context():
+        setattr(g, attr, g.get(attr, 0.0) + seconds)
+
+def _route_label():
+    # The URL rule, not the path, so ids do not create a series per object
+    return request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+
+def _before_request():
+    global _in_flight
+    _check_fork()
+    _ensure_flusher()
+    with _in_flight_lock:
+        _in_flight += 1
+    g._metrics_started = time.perf_counter()
+
+def _after_request(response):
+    g._metrics_status = response.status_code
+    return response
+
+def _teardown_request(exception):
+    global _in_flight, _dirty
+    started = g.pop('_metrics_started', None)
+    if started is None:
+        return
+    with _in_flight_lock:
+        _in_flight -= 1
+    route, method = _route_label(), request.method
+    status = 500 if exception is not None else g.pop('_metrics_status', 500)
+    registry.inc('http_requests_total', {'route': route, 'method': method, 'status': str(status)})
+    registry.observe('http_request_duration_seconds', {'route': route, 'method': method}, time.perf_counter() - started)
+    registry.observe('http_request_db_seconds', {'route': route}, g.pop('_metrics_db_seconds', 0.0))
+    render_seconds = g.pop('_metrics_render_seconds', None)
+    if render_seconds is not None:
+        registry.observe('http_request_render_seconds', {'route': route}, render_seconds)
+    _dirty = True
+
+def _before_render(sender, template, context, **extra):
+    g.setdefault('_metrics_render_started', []).append(time.perf_counter())
+
+def _after_render(sender, template, context, **extra):
+    started = g.get('_metrics_render_started')
+    if started:
+        _add_request_time('_metrics_render_seconds', time.perf_counter() - started.pop())
+
+def observe_qr_render(fmt, seconds):
+    registry.observe('qr_render_seconds', {'format': fmt}, seconds)
+
+def init_app(app):
+    """Time every request; register before other request hooks so their work is included"""
+    from db_helper import pool_stats
+    from attendance_queue import get_attendance_writer, queue_mode_enabled
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+    set_db_time_observer(lambda seconds: _add_request_time('_metrics_db_seconds', seconds))
+
+    registry.gauge('http_requests_in_flight', {}, lambda: _in_flight)
+    registry.gauge('db_pool_connections_in_use', {}, lambda: pool_stats()['in_use'])
+    if pool_stats()['max'] is not None:
+        registry.gauge('db_pool_connections_max', {}, lambda: pool_stats()['max'])
+    registry.gauge('attendance_queue_depth', {},
+                   lambda: get_attendance_writer().qsize() if queue_mode_enabled() else 0)
+    atexit.register(flush)
+    prune()
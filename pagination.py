@@ -0,0 +1,73 @@
+import os
+import json
+import base64
+from urllib.parse import urlencode
+from datetime import datetime, timedelta
+from flask import jsonify, request
+
+DEFAULT_PAGE_SIZE = int(os.getenv('DEFAULT_PAGE_SIZE', 100))
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 500))
+
+def encode_cursor(values):
+    """Encode the sort key of the last row into an opaque cursor"""
+    raw = json.dumps([str(v) if isinstance(v, datetime) else v for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor"""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+def get_page_args():
+    """Read limit and cursor from the query string; raises ValueError on bad input"""
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    if limit is None or limit < 1:
+        raise ValueError('limit must be a positive integer')
+    cursor = request.args.get('cursor')
+    return min(limit, MAX_PAGE_SIZE), decode_cursor(cursor) if cursor else None
+
+def get_date_range(column, start_arg='from', end_arg='to', include_time=True):
+    """Build an inclusive YYYY-MM-DD range filter on column; raises ValueError on bad dates"""
+    clauses, params = [], []
+    fmt = '%Y-%m-%d %H:%M:%S' if include_time else '%Y-%m-%d'
+    if request.args.get(start_arg):
+        start = datetime.strptime(request.args[start_arg], '%Y-%m-%d')
+        clauses.append(f'{column} >= ?')
+        params.append(start.strftime(fmt))
+    if request.args.get(end_arg):
+        end = datetime.strptime(request.args[end_arg], '%Y-%m-%d') + timedelta(days=1)
+        clauses.append(f'{column} < ?')
+        params.append(end.strftime(fmt))
+    return clauses, params
+
+def keyset_clause(columns, cursor, descending=True):
+    """WHERE fragment selecting rows strictly after cursor in (columns...) order"""
+    if cursor is None:
+        return [], []
+    if len(cursor) != len(columns):
+        raise ValueError('Invalid cursor')
+    op = '<' if descending else '>'
+    # Row-value comparison lets both SQLite and PostgreSQL seek on the composite index
+    marks = ', '.join(['?'] * len(columns))
+    return [f"({', '.join(columns)}) {op} ({marks})"], list(cursor)
+
+def paginated_response(items, rows, limit, key):
+    """JSON list of one page; the next page's cursor is returned in X-Next-Cursor and Link
+
+    rows must have been fetched with LIMIT limit + 1 so we can tell whether
+    another page exists; key(row) returns the row's sort key values.
+    """
+    response = jsonify(items[:limit])
+    if len(rows) > limit:
+        next_cursor = encode_cursor(key(rows[limit - 1]))
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{request.path}?{urlencode(args)}>; rel="next"'
+    return response
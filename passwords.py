@@ -0,0 +1,84 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# 'pbkdf2:sha256' or 'scrypt'; the work factor is the pbkdf2 iteration count or scrypt's N
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+PASSWORD_WORK_FACTOR = int(os.getenv('PASSWORD_WORK_FACTOR', 0))
+# Hashing processes per web worker; 0 hashes on the request thread
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 1))
+# Hashes queued or running per web worker before new ones wait, and how long they wait
+PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 16))
+PASSWORD_HASH_WAIT_SECONDS = float(os.getenv('PASSWORD_HASH_WAIT_SECONDS', 5))
+# Hashing processes run at lower priority, so scans keep the CPU during a login rush
+PASSWORD_HASH_NICE = int(os.getenv('PASSWORD_HASH_NICE', 10))
+PASSWORD_REHASH_ON_LOGIN = os.getenv('PASSWORD_REHASH_ON_LOGIN', '1') == '1'
+
+DEFAULT_WORK_FACTORS = {
+    'pbkdf2': 600000,
+    'scrypt': 32768
+}
+
+class PasswordHashBusy(Exception):
+    """Too many hashes already waiting; the client should retry shortly"""
+
+def hash_method(method=PASSWORD_HASH_METHOD, work_factor=PASSWORD_WORK_FACTOR):
+    """The full Werkzeug method string, as recorded at the start of every stored hash"""
+    name, *params = method.split(':')
+    if name == 'pbkdf2':
+        digest = params[0] if params else 'sha256'
+        iterations = work_factor or (int(params[1]) if len(params) > 1 else DEFAULT_WORK_FACTORS[name])
+        return f'pbkdf2:{digest}:{iterations}'
+    if name == 'scrypt':
+        n = work_factor or (int(params[0]) if params else DEFAULT_WORK_FACTORS[name])
+        r, p = params[1:3] if len(params) >= 3 else (8, 1)
+        return f'scrypt:{n}:{r}:{p}'
+    raise ValueError(f'Unsupported PASSWORD_HASH_METHOD: {method}')
+
+HASH_METHOD = hash_method()
+
+def needs_rehash(password_hash):
+    """True when a stored hash was made with a different method or work factor"""
+    return password_hash.split('$', 1)[0] != HASH_METHOD
+
+def _init_worker():
+    if PASSWORD_HASH_NICE and hasattr(os, 'nice'):
+        os.nice(PASSWORD_HASH_NICE)
+
+_pool = None
+_pool_pid = None
+_slots = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    global _pool, _pool_pid, _slots
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # spawn, not fork: the web worker has background threads holding locks
+            _pool = ProcessPoolExecutor(PASSWORD_HASH_WORKERS, mp_context=multiprocessing.get_context('spawn'),
+                                        initializer=_init_worker)
+            _slots = threading.BoundedSemaphore(PASSWORD_HASH_MAX_PENDING)
+            _pool_pid = os.getpid()
+        return _pool, _slots
+
+def _run(func, *args):
+    if PASSWORD_HASH_WORKERS <= 0:
+        return func(*args)
+    pool, slots = _get_pool()
+    # Backpressure: a full queue makes callers wait here, then fail fast, rather than pile up
+    if not slots.acquire(timeout=PASSWORD_HASH_WAIT_SECONDS):
+        raise PasswordHashBusy()
+    try:
+        return pool.submit(func, *args).result()
+    finally:
+        slots.release()
+
+def hash_password(password):
+    """Hash with the configured method, off the request thread"""
+    return _run(generate_password_hash, password, HASH_METHOD)
+
+def verify_password(password_hash, password):
+    """Check a password against its stored hash, off the request thread"""
+    return _run(check_password_hash, password_hash, password)
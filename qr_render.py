@@ -0,0 +1,114 @@
+import os
+import io
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+import qrcode
+from metrics import observe_qr_render
+
+QR_CACHE_SIZE = int(os.getenv('QR_CACHE_SIZE', 256))
+QR_BOX_SIZE = 10
+QR_BORDER = 5
+
+MIMETYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml'
+}
+
+def _build_qr(payload, box_size, border):
+    qr = qrcode.QRCode(version=1, box_size=box_size, border=border)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    return qr
+
+def render_png(payload, box_size=QR_BOX_SIZE, border=QR_BORDER):
+    """Render a QR code to PNG bytes with Pillow"""
+    qr = _build_qr(payload, box_size, border)
+    img = qr.make_image(fill_color="black", back_color="white")
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def render_svg(payload, box_size=QR_BOX_SIZE, border=QR_BORDER):
+    """Render a QR code to SVG bytes straight from the module matrix (no Pillow)"""
+    matrix = _build_qr(payload, box_size, border=0).get_matrix()
+    size = len(matrix) + 2 * border
+
+    # One subpath per horizontal run of dark modules keeps the markup small
+    path = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < len(row):
+            if row[x]:
+                start = x
+                while x < len(row) and row[x]:
+                    x += 1
+                path.append(f'M{start + border} {y + border}h{x - start}v1h-{x - start}z')
+            else:
+                x += 1
+
+    pixels = size * box_size
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{pixels}" height="{pixels}" '
+        f'viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<rect width="{size}" height="{size}" fill="#fff"/>'
+        f'<path d="{"".join(path)}" fill="#000"/></svg>'
+    )
+    return svg.encode('utf-8')
+
+RENDERERS = {
+    'png': render_png,
+    'svg': render_svg
+}
+
+def qr_etag(payload, fmt, box_size=QR_BOX_SIZE):
+    """ETag for a rendered QR image, derived from its inputs so no rendering is needed"""
+    return hashlib.sha1(f'{fmt}:{box_size}:{QR_BORDER}:{payload}'.encode('utf-8')).hexdigest()
+
+class QRImageCache:
+    """Size-bounded LRU of rendered QR images; entries expire with their session"""
+
+    def __init__(self, max_entries=QR_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            body, expires_at = entry
+            if expires_at is not None and expires_at < datetime.now():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body, expires_at=None):
+        with self._lock:
+            now = datetime.now()
+            for stale in [k for k, (_, exp) in self._entries.items() if exp is not None and exp < now]:
+                del self._entries[stale]
+            self._entries[key] = (body, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+qr_cache = QRImageCache()
+
+def get_qr_image(payload, fmt='png', box_size=QR_BOX_SIZE, expires_at=None):
+    """Return rendered QR bytes for payload, rendering only on a cache miss"""
+    key = (payload, fmt, box_size)
+    body = qr_cache.get(key)
+    if body is None:
+        started = time.perf_counter()
+        body = RENDERERS[fmt](payload, box_size=box_size)
+        observe_qr_render(fmt, time.perf_counter() - started)
+        qr_cache.put(key, body, expires_at)
+    return body
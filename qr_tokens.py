@@ -0,0 +1,101 @@
+import os
+import hmac
+import time
+import base64
+import hashlib
+
+# The displayed token changes every QR_TOKEN_ROTATE_SECONDS; a scanned token is
+# accepted for one rotation plus QR_TOKEN_GRACE_SECONDS after it was issued.
+QR_TOKEN_ROTATE_SECONDS = int(os.getenv('QR_TOKEN_ROTATE_SECONDS', 10))
+QR_TOKEN_GRACE_SECONDS = int(os.getenv('QR_TOKEN_GRACE_SECONDS', 10))
+QR_TOKEN_VERSION = 'A1'
+# Short code shown beside the QR for students who type it in; long enough to read off a projector
+QR_CODE_ROTATE_SECONDS = int(os.getenv('QR_CODE_ROTATE_SECONDS', 60))
+QR_CODE_LENGTH = 6
+
+_CROCKFORD = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+
+class InvalidToken(Exception):
+    """Raised when a scanned token is malformed, forged or stale"""
+
+def _b32(value, length):
+    chars = []
+    for _ in range(length):
+        chars.append(_CROCKFORD[value & 31])
+        value >>= 5
+    return ''.join(reversed(chars))
+
+def new_session_id(now=None):
+    """Generate a collision-free, time-ordered session id (ULID layout)
+
+    48 bits of millisecond timestamp followed by 80 random bits, encoded as
+    26 Crockford base32 characters, so ids sort by creation time.
+    """
+    millis = int((time.time() if now is None else now) * 1000)
+    randomness = int.from_bytes(os.urandom(10), 'big')
+    return _b32(millis, 10) + _b32(randomness, 16)
+
+def _signature(secret, payload):
+    digest = hmac.new(secret.encode('utf-8'), payload.encode('utf-8'), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:18]).decode('ascii')
+
+def current_issue_time(now=None):
+    """Start of the current rotation window; every worker signs the same token within it"""
+    now = int(time.time() if now is None else now)
+    return now - now % QR_TOKEN_ROTATE_SECONDS
+
+def issue_token(secret, session_id, expires_at, issued_at=None):
+    """Sign session id, issue time and expiry (both epoch seconds) into a QR payload"""
+    if issued_at is None:
+        issued_at = current_issue_time()
+    payload = f'{QR_TOKEN_VERSION}.{session_id}.{int(issued_at):x}.{int(expires_at):x}'
+    return f'{payload}.{_signature(secret, payload)}'
+
+def verify_token(secret, token, now=None):
+    """Check signature and freshness without any storage access
+
+    Returns (session_id, expires_at) or raises InvalidToken.
+    """
+    now = time.time() if now is None else now
+    try:
+        version, session_id, issued_hex, expires_hex, signature = token.split('.')
+        issued_at = int(issued_hex, 16)
+        expires_at = int(expires_hex, 16)
+    except (AttributeError, ValueError):
+        raise InvalidToken('Malformed token')
+
+    if version != QR_TOKEN_VERSION:
+        raise InvalidToken('Unknown token version')
+    expected = _signature(secret, f'{version}.{session_id}.{issued_hex}.{expires_hex}')
+    if not hmac.compare_digest(expected, signature):
+        raise InvalidToken('Bad signature')
+    if now > expires_at:
+        raise InvalidToken('Session expired')
+    if now > issued_at + QR_TOKEN_ROTATE_SECONDS + QR_TOKEN_GRACE_SECONDS or issued_at > now + QR_TOKEN_GRACE_SECONDS:
+        raise InvalidToken('Token no longer current')
+    return session_id, expires_at
+
+def manual_code(secret, session_id, window=None):
+    """Short code for typing in by hand; changes every QR_CODE_ROTATE_SECONDS"""
+    if window is None:
+        window = int(time.time()) // QR_CODE_ROTATE_SECONDS
+    digest = hmac.new(secret.encode('utf-8'), f'code.{session_id}.{window}'.encode('utf-8'), hashlib.sha256).digest()
+    return _b32(int.from_bytes(digest[:4], 'big'), QR_CODE_LENGTH)
+
+def normalize_code(code):
+    """Uppercase, without separators, and with the letters Crockford base32 reads as digits"""
+    code = ''.join(str(code).split()).replace('-', '').upper()
+    return code.translate(str.maketrans('OIL', '011'))
+
+def match_manual_code(secret, code, session_ids, now=None):
+    """Session id whose current or previous code is code, or None"""
+    code = normalize_code(code)
+    if len(code) != QR_CODE_LENGTH:
+        return None
+    window = int(time.time() if now is None else now) // QR_CODE_ROTATE_SECONDS
+    for session_id in session_ids:
+        # The previous window too, so a code read just before it changed still works
+        for candidate in (window, window - 1):
+            if hmac.compare_digest(manual_code(secret, session_id, candidate), code):
+                return session_id
+    return None
@@ -0,0 +1,168 @@
+import os
+import re
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from flask import g, request, has_app_context, has_request_context
+from db_helper import add_query_observer, is_postgres
+
+# Statements slower than this are logged with their plan; 0 logs every statement
+QUERY_SLOW_MS = float(os.getenv('QUERY_SLOW_MS', 100))
+QUERY_EXPLAIN = os.getenv('QUERY_EXPLAIN', '1') == '1'
+# The same statement shape this many times in one request is reported as a likely N+1
+QUERY_REPEAT_THRESHOLD = int(os.getenv('QUERY_REPEAT_THRESHOLD', 5))
+# Adds X-Query-Count and X-Query-Time-Ms to every response
+QUERY_DEBUG_HEADERS = os.getenv('QUERY_DEBUG_HEADERS', '0') == '1'
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s")
+_IN_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+_FULL_SCAN = re.compile(r'^\s*(?:SCAN (?:TABLE )?\w+(?: AS \w+)?\s*$|.*Seq Scan on )')
+
+_explained = set()
+_explained_lock = threading.Lock()
+_captures = threading.local()
+logger = logging.getLogger(__name__)
+
+def statement_shape(statement):
+    """Statement text with literals and placeholders folded, so repeats compare equal"""
+    shape = _LITERALS.sub('?', statement)
+    shape = _IN_LISTS.sub('(?)', shape)
+    return ' '.join(shape.split())
+
+def explain(cursor, statement, params):
+    """Plan lines for statement from the database that ran it
+
+    On PostgreSQL this runs inside a savepoint: a failed EXPLAIN would otherwise
+    abort the request's own transaction.
+    """
+    savepoint = is_postgres()
+    prefix = 'EXPLAIN ' if savepoint else 'EXPLAIN QUERY PLAN '
+    plan_cursor = cursor.connection.cursor()
+    try:
+        if savepoint:
+            plan_cursor.execute('SAVEPOINT query_log_explain')
+        try:
+            if params:
+                plan_cursor.execute(prefix + statement, params)
+            else:
+                plan_cursor.execute(prefix + statement)
+            rows = plan_cursor.fetchall()
+        except Exception:
+            if savepoint:
+                plan_cursor.execute('ROLLBACK TO SAVEPOINT query_log_explain')
+            raise
+        if savepoint:
+            plan_cursor.execute('RELEASE SAVEPOINT query_log_explain')
+    finally:
+        plan_cursor.close()
+    # SQLite rows are (id, parent, notused, detail); PostgreSQL returns one text column
+    return [row['QUERY PLAN'] if is_postgres() else row[3] for row in rows]
+
+def _route():
+    if has_request_context() and request.url_rule is not None:
+        return f'{request.method} {request.url_rule.rule}'
+    return 'background'
+
+def _log_slow(cursor, statement, params, seconds, shape, many):
+    logger.warning('Slow query (%.0f ms, %s): %s', seconds * 1000, _route(), ' '.join(statement.split()))
+    if many or not QUERY_EXPLAIN or not shape.upper().startswith(_EXPLAINABLE):
+        return
+    # One plan per statement shape per process is enough to spot a scan
+    with _explained_lock:
+        if shape in _explained:
+            return
+        _explained.add(shape)
+    try:
+        plan = explain(cursor, statement, params)
+    except Exception as e:
+        logger.warning('    (no plan: %s)', e)
+        return
+    for line in plan:
+        flag = '   <- full table scan' if _FULL_SCAN.match(line) else ''
+        logger.warning('    %s%s', line, flag)
+
+def _on_query(cursor, statement, params, seconds, many):
+    shape = statement_shape(statement)
+    if has_app_context():
+        stats = g.setdefault('_query_stats', {'count': 0, 'seconds': 0.0, 'shapes': Counter()})
+        stats['count'] += 1
+        stats['seconds'] += seconds
+        if not many:
+            stats['shapes'][shape] += 1
+    for capture in getattr(_captures, 'active', ()):
+        capture.record(shape, seconds, many)
+    if seconds * 1000 >= QUERY_SLOW_MS:
+        _log_slow(cursor, statement, params, seconds, shape, many)
+
+def request_query_stats():
+    """Statements run so far in this request: {'count', 'seconds', 'shapes'}"""
+    return g.get('_query_stats') or {'count': 0, 'seconds': 0.0, 'shapes': Counter()}
+
+def repeated_shapes(shapes, threshold=QUERY_REPEAT_THRESHOLD):
+    return {shape: count for shape, count in shapes.items() if count >= threshold}
+
+def _add_debug_headers(response):
+    stats = request_query_stats()
+    response.headers['X-Query-Count'] = str(stats['count'])
+    response.headers['X-Query-Time-Ms'] = f"{stats['seconds'] * 1000:.1f}"
+    return response
+
+def _report_repeats(exception):
+    stats = g.pop('_query_stats', None)
+    if stats is None:
+        return
+    for shape, count in repeated_shapes(stats['shapes']).items():
+        logger.warning('Possible N+1 in %s: %dx %s', _route(), count, shape)
+
+class QueryCapture:
+    """Statements seen inside a query_budget block"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    def record(self, shape, seconds, many):
+        self.count += 1
+        self.seconds += seconds
+        if not many:
+            self.shapes[shape] += 1
+
+    def repeated(self, threshold=QUERY_REPEAT_THRESHOLD):
+        return repeated_shapes(self.shapes, threshold)
+
+@contextmanager
+def query_budget(max_queries, max_repeats=None):
+    """Fail if the block runs more than max_queries statements (or repeats one shape over max_repeats times)
+
+    Meant for tests, around a test-client request:
+
+        with query_budget(4):
+            client.get('/teacher_dashboard')
+    """
+    capture = QueryCapture()
+    active = getattr(_captures, 'active', None)
+    if active is None:
+        active = _captures.active = []
+    active.append(capture)
+    try:
+        yield capture
+    finally:
+        active.remove(capture)
+    if capture.count > max_queries:
+        raise AssertionError(f'{capture.count} queries, budget is {max_queries}:\n' +
+                             '\n'.join(f'  {count}x {shape}' for shape, count in capture.shapes.most_common()))
+    if max_repeats is not None:
+        repeats = capture.repeated(max_repeats + 1)
+        if repeats:
+            raise AssertionError('Repeated statements:\n' +
+                                 '\n'.join(f'  {count}x {shape}' for shape, count in repeats.items()))
+
+def init_app(app):
+    """Count, time and check every statement the app runs"""
+    add_query_observer(_on_query)
+    app.teardown_request(_report_repeats)
+    if QUERY_DEBUG_HEADERS:
+        app.after_request(_add_debug_headers)
@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+from functools import wraps
+from collections import OrderedDict
+from flask import request, session, current_app, g
+from change_counters import get_change_versions
+
+# 'memory' is per process; 'sqlite' is shared by every worker on the host; 'off' disables caching
+RESPONSE_CACHE_BACKEND = os.getenv('RESPONSE_CACHE_BACKEND', 'memory')
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 300))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 1024))
+RESPONSE_CACHE_PATH = os.getenv('RESPONSE_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'qr_attendance_cache.db'))
+
+# Headers that are recomputed for every response rather than replayed from the cache
+_SKIP_HEADERS = {'content-length', 'set-cookie'}
+
+class MemoryBackend:
+    """Size-bounded LRU with per-entry TTL and a tag -> keys index"""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at, _ = entry
+            if expires_at < time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl, tags):
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, time.time() + ttl, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, tags):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+class SQLiteBackend:
+    """Cache in a local SQLite file so every worker process sees the same entries and invalidations"""
+
+    def __init__(self, path=RESPONSE_CACHE_PATH, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        # Connections must not be shared across fork
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=1, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA foreign_keys=ON')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS cache_tags (
+                tag TEXT NOT NULL,
+                key TEXT NOT NULL REFERENCES cache_entries (key) ON DELETE CASCADE,
+                PRIMARY KEY (tag, key)
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_cache_tags_key ON cache_tags (key)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_cache_entries_accessed_at ON cache_entries (accessed_at)')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute('SELECT value, expires_at, accessed_at FROM cache_entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires_at, accessed_at = row
+        if expires_at < now:
+            conn.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+            return None
+        # Refreshing recency at most once a second keeps hot keys from turning every hit into a write
+        if now - accessed_at > 1:
+            conn.execute('UPDATE cache_entries SET accessed_at = ? WHERE key = ?', (now, key))
+        return json.loads(value)
+
+    def set(self, key, value, ttl, tags):
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+            conn.execute('INSERT INTO cache_entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+                         (key, json.dumps(value), now + ttl, now))
+            conn.executemany('INSERT INTO cache_tags (tag, key) VALUES (?, ?)', [(tag, key) for tag in tags])
+            excess = conn.execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute('''
+                    DELETE FROM cache_entries WHERE key IN (
+                        SELECT key FROM cache_entries ORDER BY expires_at < ? DESC, accessed_at LIMIT ?
+                    )
+                ''', (now, excess))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def invalidate(self, tags):
+        conn = self._connect()
+        marks = ', '.join(['?'] * len(tags))
+        conn.execute(f'DELETE FROM cache_entries WHERE key IN (SELECT key FROM cache_tags WHERE tag IN ({marks}))', tuple(tags))
+
+    def clear(self):
+        self._connect().execute('DELETE FROM cache_entries')
+
+BACKENDS = {
+    'memory': MemoryBackend,
+    'sqlite': SQLiteBackend
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_cache_backend():
+    """Get the process-wide cache backend, or None when caching is off"""
+    global _backend
+    if RESPONSE_CACHE_BACKEND not in BACKENDS:
+        return None
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = BACKENDS[RESPONSE_CACHE_BACKEND]()
+    return _backend
+
+def _change_versions(tags):
+    """Counters the cached body depends on: the ETag's, or else those of tags"""
+    if 'change_versions' in g:
+        return g.change_versions
+    conn = current_app.extensions['http_cache']['get_connection']()
+    return tags, get_change_versions(conn, tags)
+
+def _cache_key(tags, vary_on_user):
+    # Role is always part of the key so an Unauthorized reply is never served to another role
+    parts = [request.path, request.query_string.decode('latin-1'), session.get('role') or '']
+    if vary_on_user:
+        parts.append(str(session.get('user_id')))
+    # A write bumps the counters in every worker at once, so a per-process entry
+    # that missed its invalidate() is never served again
+    tables, versions = _change_versions(tags)
+    parts.append(','.join(f'{table}={version}' for table, version in zip(tables, versions)))
+    return '|'.join(parts)
+
+def cached_response(tags, ttl=RESPONSE_CACHE_TTL, vary_on_user=False):
+    """Cache a view's successful GET responses, keyed by path, query string and role
+
+    tags name the tables the response is built from. Their change counters
+    are part of the key, so any committed write moves readers to a fresh
+    entry; write routes also call invalidate(*tags) to free the old ones
+    early. Cache errors fall back to the view.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            backend = get_cache_backend()
+            if backend is None or request.method != 'GET':
+                return f(*args, **kwargs)
+
+            try:
+                key = _cache_key(tags, vary_on_user)
+            except Exception as e:
+                current_app.logger.warning('Response cache key failed: %s', e)
+                return f(*args, **kwargs)
+            try:
+                cached = backend.get(key)
+            except Exception as e:
+                current_app.logger.warning('Response cache read failed: %s', e)
+                cached = None
+            if cached is not None:
+                body, status, headers = cached
+                response = current_app.response_class(body, status=status, headers=headers)
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            response = current_app.make_response(f(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                headers = [(k, v) for k, v in response.headers.items() if k.lower() not in _SKIP_HEADERS]
+                try:
+                    backend.set(key, [response.get_data(as_text=True), response.status_code, headers], ttl, tags)
+                except Exception as e:
+                    current_app.logger.warning('Response cache write failed: %s', e)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return decorated_function
+    return decorator
+
+def invalidate(*tags):
+    """Drop every cached response built from any of tags"""
+    backend = get_cache_backend()
+    if backend is None:
+        return
+    try:
+        backend.invalidate(tags)
+    except Exception as e:
+        # A stale entry would otherwise live for up to RESPONSE_CACHE_TTL
+        current_app.logger.error('Response cache invalidation failed: %s', e)
@@ -0,0 +1,134 @@
+import os
+import io
+import csv
+from itertools import islice
+from db_helper import get_db_params, timed_execute
+
+RESULTS_IMPORT_CHUNK_ROWS = int(os.getenv('RESULTS_IMPORT_CHUNK_ROWS', 1000))
+MAX_REPORTED_ERRORS = int(os.getenv('RESULTS_IMPORT_MAX_ERRORS', 200))
+
+# Column order of the results CSV (see README): student_id, name, subject_id,
+# exam_type, marks_obtained, max_marks, remarks (optional)
+REQUIRED_COLUMNS = 6
+
+class ImportReport:
+    """Outcome of a results import: counts plus a per-row error list"""
+
+    def __init__(self):
+        self.inserted = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, line_no, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': line_no, 'error': message})
+
+    def to_dict(self):
+        return {
+            'inserted': self.inserted,
+            'error_count': self.error_count,
+            'errors': sorted(self.errors, key=lambda e: e['row']),
+            'errors_truncated': self.error_count > len(self.errors)
+        }
+
+def _parse_row(fields):
+    """Turn one CSV record into typed values; raises ValueError with a readable message"""
+    if len(fields) < REQUIRED_COLUMNS:
+        raise ValueError(f'Expected at least {REQUIRED_COLUMNS} columns, got {len(fields)}')
+    student_id, _name, subject_id, exam_type, marks_obtained, max_marks = [f.strip() for f in fields[:REQUIRED_COLUMNS]]
+    remarks = fields[REQUIRED_COLUMNS].strip() if len(fields) > REQUIRED_COLUMNS else ''
+
+    if not student_id:
+        raise ValueError('student_id is empty')
+    if not exam_type:
+        raise ValueError('exam_type is empty')
+    try:
+        subject_id = int(subject_id)
+    except ValueError:
+        raise ValueError(f'subject_id "{subject_id}" is not an integer')
+    try:
+        marks_obtained = float(marks_obtained)
+        max_marks = float(max_marks)
+    except ValueError:
+        raise ValueError('marks_obtained and max_marks must be numbers')
+    if max_marks <= 0:
+        raise ValueError('max_marks must be greater than 0')
+    if not 0 <= marks_obtained <= max_marks:
+        raise ValueError('marks_obtained must be between 0 and max_marks')
+    return student_id, subject_id, exam_type, marks_obtained, max_marks, remarks
+
+def _known_students(cursor, placeholder, student_ids):
+    if not student_ids:
+        return set()
+    marks = ', '.join([placeholder] * len(student_ids))
+    cursor.execute(f'SELECT student_id FROM students WHERE student_id IN ({marks})', tuple(student_ids))
+    return {row['student_id'] for row in cursor.fetchall()}
+
+def import_results(conn, stream, teacher_id, chunk_rows=RESULTS_IMPORT_CHUNK_ROWS):
+    """Stream a results CSV into the results table
+
+    Rows are parsed with the csv module (so quoted fields work), validated a
+    chunk at a time against known students and this teacher's subjects, and
+    inserted with one executemany and one commit per chunk. Returns an
+    ImportReport; raises ValueError if the file has no data rows.
+    """
+    db_params = get_db_params()
+    placeholder = db_params['placeholder']
+    report = ImportReport()
+
+    reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    if next(reader, None) is None:
+        raise ValueError('CSV must have header and data rows')
+
+    cursor = conn.cursor()
+    cursor.execute(f'SELECT id FROM subjects WHERE teacher_id = {placeholder}', (teacher_id,))
+    teacher_subjects = {row['id'] for row in cursor.fetchall()}
+
+    insert_sql = f'''
+        INSERT INTO results (student_id, subject_id, exam_type, marks_obtained, max_marks, remarks, teacher_id, created_at)
+        VALUES ({', '.join([placeholder] * 7)}, {db_params['datetime_now']})
+    '''
+
+    # Data rows start on line 2; reader.line_num would drift on multi-line quoted fields
+    numbered = enumerate(reader, start=2)
+    seen_rows = False
+    while True:
+        chunk = list(islice(numbered, chunk_rows))
+        if not chunk:
+            break
+
+        parsed = []
+        for line_no, fields in chunk:
+            if not any(f.strip() for f in fields):
+                continue  # Skip blank lines
+            seen_rows = True
+            try:
+                parsed.append((line_no, _parse_row(fields)))
+            except ValueError as e:
+                report.add_error(line_no, str(e))
+
+        known = _known_students(cursor, placeholder, {row[0] for _, row in parsed})
+        rows, row_lines = [], []
+        for line_no, row in parsed:
+            if row[0] not in known:
+                report.add_error(line_no, f'Unknown student_id "{row[0]}"')
+            elif row[1] not in teacher_subjects:
+                report.add_error(line_no, f'Subject {row[1]} not found or not yours')
+            else:
+                rows.append((*row, teacher_id))
+                row_lines.append(line_no)
+
+        if rows:
+            try:
+                timed_execute(cursor, insert_sql, rows, many=True)
+                conn.commit()
+                report.inserted += len(rows)
+            except Exception as e:
+                conn.rollback()
+                for line_no in row_lines:
+                    report.add_error(line_no, f'Database error: {e}')
+
+    if not seen_rows:
+        raise ValueError('CSV must have header and data rows')
+    return report
@@ -0,0 +1,192 @@
+import os
+from datetime import date, datetime, timedelta
+from db_helper import get_db_params, is_postgres, execute_query, run_with_retry
+
+# Longest range /analytics/timeseries will return in one response
+ROLLUP_MAX_RANGE_DAYS = int(os.getenv('ROLLUP_MAX_RANGE_DAYS', 366))
+
+# group name -> (rollup table, key column); every table is (day, key) -> present_count
+ROLLUPS = {
+    'subject': ('attendance_daily_subject', 'subject_id'),
+    'division': ('attendance_daily_division', 'division'),
+    'student': ('attendance_daily_student', 'student_id')
+}
+
+# Key expression and FROM/WHERE for one NEW/OLD attendance row, used by the triggers
+_TRIGGER_SOURCES = {
+    'subject': ('subject_id', 'FROM sessions WHERE id = {row}.session_id AND subject_id IS NOT NULL'),
+    'division': ('division', 'FROM students WHERE student_id = {row}.student_id AND division IS NOT NULL'),
+    'student': ('{row}.student_id', 'WHERE {row}.student_id IS NOT NULL')
+}
+
+# The same keys for a set of attendance rows (alias a), used by backfills
+_KEY_SOURCES = {
+    'subject': ('JOIN sessions ses ON ses.id = a.session_id', 'ses.subject_id'),
+    'division': ('JOIN students st ON st.student_id = a.student_id', 'st.division'),
+    'student': ('', 'a.student_id')
+}
+
+def day_of(column):
+    """SQL expression for the calendar day of a timestamp column"""
+    return f'CAST({column} AS DATE)' if is_postgres() else f'date({column})'
+
+def create_rollup_schema(cursor, dialect):
+    """Create the daily rollup tables and the triggers that keep them current
+
+    Triggers mean every writer (direct inserts, the write queue, subject
+    deletes, manual backfills) updates the rollups in the same transaction as
+    the attendance row itself.
+    """
+    key_types = {'subject_id': 'INTEGER', 'division': 'TEXT', 'student_id': 'TEXT'}
+    day_type = 'DATE' if dialect['is_postgres'] else 'TEXT'
+    for table, key in ROLLUPS.values():
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                day {day_type} NOT NULL,
+                {key} {key_types[key]} NOT NULL,
+                present_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, {key})
+            )
+        ''')
+        # Per-key lookups (one student's history) scan by key first
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_{key} ON {table} ({key}, day)')
+
+    if dialect['is_postgres']:
+        _create_pg_triggers(cursor)
+    else:
+        _create_sqlite_triggers(cursor)
+
+def _trigger_statements(row, day, op):
+    """Increment (op='+') or decrement (op='-') statements for one attendance row"""
+    statements = []
+    for group, (table, key) in ROLLUPS.items():
+        expr, source = _TRIGGER_SOURCES[group]
+        expr, source = expr.format(row=row), source.format(row=row)
+        if op == '+':
+            statements.append(f'''
+                INSERT INTO {table} (day, {key}, present_count) SELECT {day}, {expr}, 1 {source}
+                ON CONFLICT (day, {key}) DO UPDATE SET present_count = {table}.present_count + 1;
+            ''')
+        else:
+            statements.append(f'''
+                UPDATE {table} SET present_count = present_count - 1
+                WHERE day = {day} AND {key} IN (SELECT {expr} {source});
+                DELETE FROM {table} WHERE day = {day} AND present_count <= 0;
+            ''')
+    return '\n'.join(statements)
+
+def _create_sqlite_triggers(cursor):
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_attendance_rollup_insert AFTER INSERT ON attendance
+        BEGIN
+            {_trigger_statements('NEW', 'date(NEW.marked_at)', '+')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_attendance_rollup_delete AFTER DELETE ON attendance
+        BEGIN
+            {_trigger_statements('OLD', 'date(OLD.marked_at)', '-')}
+        END
+    ''')
+
+def _create_pg_triggers(cursor):
+    cursor.execute(f'''
+        CREATE OR REPLACE FUNCTION attendance_rollup() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                {_trigger_statements('NEW', 'CAST(NEW.marked_at AS DATE)', '+')}
+            ELSE
+                {_trigger_statements('OLD', 'CAST(OLD.marked_at AS DATE)', '-')}
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    ''')
+    cursor.execute('DROP TRIGGER IF EXISTS trg_attendance_rollup ON attendance')
+    cursor.execute('''
+        CREATE TRIGGER trg_attendance_rollup AFTER INSERT OR DELETE ON attendance
+        FOR EACH ROW EXECUTE FUNCTION attendance_rollup()
+    ''')
+
+def backfill_rollups(cursor, placeholder, start=None, end=None):
+    """Recompute rollup rows for [start, end] (ISO dates, inclusive) from raw attendance"""
+    day = day_of('a.marked_at')
+    source_clauses, rollup_clauses, params = [], [], []
+    for op, value in (('>=', start), ('<=', end)):
+        if value:
+            source_clauses.append(f'{day} {op} {placeholder}')
+            rollup_clauses.append(f'day {op} {placeholder}')
+            params.append(value)
+
+    for group, (table, key) in ROLLUPS.items():
+        join, source = _KEY_SOURCES[group]
+        where = ' AND '.join(rollup_clauses)
+        cursor.execute(f'DELETE FROM {table}' + (f' WHERE {where}' if where else ''), tuple(params))
+        where = ' AND '.join([f'{source} IS NOT NULL'] + source_clauses)
+        cursor.execute(f'''
+            INSERT INTO {table} (day, {key}, present_count)
+            SELECT {day}, {source}, COUNT(*)
+            FROM attendance a {join}
+            WHERE {where}
+            GROUP BY {day}, {source}
+        ''', tuple(params))
+
+def rebuild_rollups(conn, start=None, end=None):
+    """Rebuild rollups from raw attendance, e.g. after a bulk import with triggers disabled"""
+    cursor = conn.cursor()
+    try:
+        run_with_retry(backfill_rollups, cursor, get_db_params()['placeholder'], start, end)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def parse_range(start, end, default_days=30):
+    """Validate an inclusive YYYY-MM-DD range; raises ValueError on bad input"""
+    # marked_at defaults to CURRENT_TIMESTAMP, which SQLite stores in UTC
+    end_day = date.fromisoformat(end) if end else datetime.utcnow().date()
+    start_day = date.fromisoformat(start) if start else end_day - timedelta(days=default_days - 1)
+    if start_day > end_day:
+        raise ValueError('from must not be after to')
+    if (end_day - start_day).days >= ROLLUP_MAX_RANGE_DAYS:
+        raise ValueError(f'Range is limited to {ROLLUP_MAX_RANGE_DAYS} days')
+    return start_day.isoformat(), end_day.isoformat()
+
+def distinct_present_students(conn, start, end):
+    """Number of students marked present at least once in [start, end]"""
+    row = execute_query(conn, '''
+        SELECT COUNT(DISTINCT student_id) AS present_count
+        FROM attendance_daily_student WHERE day >= ? AND day <= ?
+    ''', (start, end), fetch_one=True)
+    return row['present_count'] if row else 0
+
+def timeseries(conn, group, start, end, key=None):
+    """Daily present counts per group key over [start, end]"""
+    table, key_column = ROLLUPS[group]
+    query = f'SELECT day, {key_column} AS group_key, present_count FROM {table} WHERE day >= ? AND day <= ?'
+    params = [start, end]
+    if key is not None:
+        query += f' AND {key_column} = ?'
+        params.append(key)
+    query += f' ORDER BY day, {key_column}'
+    rows = execute_query(conn, query, tuple(params), fetch_all=True) or []
+    return [{'day': str(row['day']), 'key': row['group_key'], 'present': row['present_count']} for row in rows]
+
+def daily_totals(conn, start, end):
+    """Total present marks per day over [start, end]"""
+    rows = execute_query(conn, '''
+        SELECT day, SUM(present_count) AS present
+        FROM attendance_daily_student WHERE day >= ? AND day <= ?
+        GROUP BY day ORDER BY day
+    ''', (start, end), fetch_all=True) or []
+    return [{'day': str(row['day']), 'present': row['present']} for row in rows]
+
+if __name__ == '__main__':
+    import sys
+    from database import get_connection
+    conn = get_connection()
+    try:
+        rebuild_rollups(conn, *sys.argv[1:3])
+    finally:
+        conn.close()
+    print('Attendance rollups rebuilt')
@@ -1,29 +1,42 @@
 #!/usr/bin/env python3
 """
 QR Attendance System Runner
-Simple script to start the Flask application
+Starts the development server, or the production server with --production
 """
 
 import os
 import sys
-from app import app
+
+def run_production():
+    """Replace this process with a preforking gunicorn master (see gunicorn.conf.py)"""
+    root = os.path.dirname(os.path.abspath(__file__))
+    config = os.path.join(root, 'gunicorn.conf.py')
+    print("🎓 Starting QR Attendance System (production)...")
+    try:
+        os.execvp('gunicorn', ['gunicorn', '--config', config, '--chdir', root, 'app:app'])
+    except FileNotFoundError:
+        print("❌ gunicorn is not installed: pip install -r requirements.txt")
+        sys.exit(1)
 
 def main():
     """Run the Flask application"""
+    if '--production' in sys.argv[1:]:
+        run_production()
+    
+    from app import app
+    debug = os.environ.get('FLASK_DEBUG') == '1'
     print("🎓 Starting QR Attendance System...")
     print("📍 Server will be available at: http://localhost:5000")
     print("🛑 Press Ctrl+C to stop the server")
+    if debug:
+        print("⚠️  Debug mode is on; never use it in production")
     print("-" * 50)
     
-    # Set development mode if not in production
-    if not os.environ.get('FLASK_ENV'):
-        os.environ['FLASK_ENV'] = 'development'
-    
     try:
         app.run(
             host='0.0.0.0',
-            port=5000,
-            debug=True
+            port=int(os.environ.get('PORT', 5000)),
+            debug=debug
         )
     except KeyboardInterrupt:
         print("\n👋 Server stopped by user")
@@ -32,4 +45,4 @@ def main():
         sys.exit(1)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
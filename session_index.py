@@ -0,0 +1,170 @@
+import os
+import time
+import uuid
+import heapq
+import tempfile
+import threading
+from datetime import datetime
+from db_helper import execute_query
+
+# Any worker that creates or removes sessions rewrites this file with a new token; the
+# other workers notice the change on their next lookup and reload from the database.
+SESSION_INDEX_STAMP = os.getenv('SESSION_INDEX_STAMP',
+                                os.path.join(tempfile.gettempdir(), 'qr_attendance_sessions.stamp'))
+
+# Codes missing from the index are looked up in the database once, then remembered as
+# unknown for this long, so sessions created on another host are still accepted
+SESSION_INDEX_MISS_SECONDS = float(os.getenv('SESSION_INDEX_MISS_SECONDS', 5))
+SESSION_INDEX_MAX_MISSES = 10000
+
+def _parse_expiry(value):
+    if isinstance(value, datetime):
+        return value
+    return datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+
+def load_active_sessions(conn):
+    """Fetch every session that is active and not yet expired"""
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return execute_query(conn, '''
+        SELECT id, qr_data, subject, lecture_time, expiry_time
+        FROM sessions
+        WHERE is_active = ? AND expiry_time >= ?
+    ''', (True, now), fetch_all=True)
+
+def load_session(conn, qr_data):
+    """Fetch one active, unexpired session by qr_data, or None"""
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return execute_query(conn, '''
+        SELECT id, qr_data, subject, lecture_time, expiry_time
+        FROM sessions
+        WHERE qr_data = ? AND is_active = ? AND expiry_time >= ?
+    ''', (qr_data, True, now), fetch_one=True)
+
+class ActiveSessionIndex:
+    """In-process index of live QR sessions keyed by qr_data
+
+    Entries are evicted as soon as their expiry_time passes, so a lookup miss
+    means the code is expired or unknown. Cross-worker consistency comes from
+    the stamp file: if it changed since the last sync, the index reloads the
+    active sessions before answering. The stamp only reaches workers on the
+    same host, so a miss falls back to one indexed read of that session.
+    """
+
+    def __init__(self, stamp_path=SESSION_INDEX_STAMP):
+        self.stamp_path = stamp_path
+        self._entries = {}
+        self._expiry_heap = []
+        self._synced_stamp = None
+        self._misses = {}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def _read_stamp(self):
+        try:
+            with open(self.stamp_path, encoding='ascii') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _bump_stamp(self):
+        # A fresh token written to a temp file and renamed over the stamp: atomic, and the file stays tiny
+        stamp = uuid.uuid4().hex
+        directory = os.path.dirname(self.stamp_path) or '.'
+        fd, tmp_path = tempfile.mkstemp(prefix='.stamp-', dir=directory)
+        with os.fdopen(fd, 'w', encoding='ascii') as f:
+            f.write(stamp)
+        os.replace(tmp_path, self.stamp_path)
+        return stamp
+
+    @staticmethod
+    def _put(entries, heap, row):
+        entry = {
+            'id': row['id'],
+            'qr_data': row['qr_data'],
+            'subject': row['subject'],
+            'lecture_time': row['lecture_time'],
+            'expiry_time': _parse_expiry(row['expiry_time'])
+        }
+        entries[entry['qr_data']] = entry
+        heapq.heappush(heap, (entry['expiry_time'], entry['qr_data']))
+
+    def _evict_expired(self, now):
+        while self._expiry_heap and self._expiry_heap[0][0] < now:
+            expiry_time, qr_data = heapq.heappop(self._expiry_heap)
+            entry = self._entries.get(qr_data)
+            if entry is not None and entry['expiry_time'] == expiry_time:
+                del self._entries[qr_data]
+
+    def add(self, row):
+        """Register a newly generated session and notify the other workers"""
+        with self._lock:
+            self._put(self._entries, self._expiry_heap, row)
+            self._misses.pop(row['qr_data'], None)
+        # Our own index also reloads on its next lookup, picking up anything other workers added meanwhile
+        self._bump_stamp()
+
+    def invalidate(self):
+        """Drop all entries and force every worker to reload"""
+        with self._lock:
+            self._entries.clear()
+            self._expiry_heap = []
+            self._synced_stamp = None
+        self._bump_stamp()
+
+    def _reload(self, stamp, loader):
+        # One thread queries; others that saw the same change wait for it instead of repeating it.
+        # The index lock is only taken for the swap, so add() and up-to-date lookups never wait on the database
+        with self._load_lock:
+            if stamp == self._synced_stamp:
+                return
+            entries, heap = {}, []
+            for row in loader():
+                self._put(entries, heap, row)
+            with self._lock:
+                self._entries, self._expiry_heap = entries, heap
+                # The stamp was read before loading, so a change made during the query triggers another reload
+                self._synced_stamp = stamp
+
+    def lookup(self, qr_data, loader, fetch=None):
+        """Return the live session for qr_data, or None if it is expired or unknown
+
+        loader() is only called when another worker has changed the sessions
+        since our last sync and must return the rows of load_active_sessions.
+        fetch() is called on a miss and must return the row of load_session;
+        unknown codes are not fetched again for SESSION_INDEX_MISS_SECONDS.
+        Both run outside the index lock.
+        """
+        stamp = self._read_stamp()
+        if stamp is None:
+            stamp = self._bump_stamp()
+        if stamp != self._synced_stamp:
+            self._reload(stamp, loader)
+
+        with self._lock:
+            self._evict_expired(datetime.now())
+            entry = self._entries.get(qr_data)
+            if entry is not None or fetch is None:
+                return entry
+            if self._misses.get(qr_data, 0) > time.monotonic():
+                return None
+
+        row = fetch()
+        with self._lock:
+            if row is None:
+                self._remember_miss(qr_data)
+                return None
+            self._put(self._entries, self._expiry_heap, row)
+            return self._entries[qr_data]
+
+    def _remember_miss(self, qr_data):
+        now = time.monotonic()
+        if len(self._misses) >= SESSION_INDEX_MAX_MISSES:
+            self._misses = {key: until for key, until in self._misses.items() if until > now}
+            if len(self._misses) >= SESSION_INDEX_MAX_MISSES:
+                self._misses.clear()
+        self._misses[qr_data] = now + SESSION_INDEX_MISS_SECONDS
+
+    def __len__(self):
+        return len(self._entries)
+
+session_index = ActiveSessionIndex()
@@ -7,6 +7,7 @@ Initializes the database and creates default admin user
 import os
 import sys
 from database import init_db
+from db_helper import get_sqlite_path
 from werkzeug.security import generate_password_hash
 import sqlite3
 
@@ -15,7 +16,7 @@ def setup_database():
     print("🔧 Initializing database...")
     init_db()
     
-    conn = sqlite3.connect('attendance.db')
+    conn = sqlite3.connect(get_sqlite_path())
     conn.row_factory = sqlite3.Row
     
     # Check if admin already exists
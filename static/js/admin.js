@@ -10,10 +10,18 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 
     function showQRForm() {
+        // Same subject list as the attendance filter, so sessions carry a subject_id
+        const subjectOptions = Array.from(document.querySelectorAll('#attendanceSubject option'))
+            .filter(option => option.value)
+            .map(option => `<option value="${option.value}">${option.textContent}</option>`)
+            .join('');
         qrDisplay.innerHTML = `
             <div class="qr-form">
                 <h4>Generate QR Code</h4>
-                <input type="text" id="subject" placeholder="Subject" required>
+                <select id="subject" required>
+                    <option value="">Select subject</option>
+                    ${subjectOptions}
+                </select>
                 <input type="text" id="lectureTime" placeholder="Lecture Time" required>
                 <input type="text" id="location" placeholder="Location" required>
                 <select id="expiryMinutes">
@@ -29,7 +37,9 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     window.generateQR = async function() {
-        const subject = document.getElementById('subject').value;
+        const subjectSelect = document.getElementById('subject');
+        const subjectId = subjectSelect.value;
+        const subject = subjectId ? subjectSelect.selectedOptions[0].textContent : '';
         const lectureTime = document.getElementById('lectureTime').value;
         const location = document.getElementById('location').value;
         const expiryMinutes = document.getElementById('expiryMinutes').value;
@@ -47,6 +57,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 },
                 body: JSON.stringify({
                     subject,
+                    subject_id: subjectId,
                     lecture_time: lectureTime,
                     location,
                     expiry_minutes: expiryMinutes
@@ -67,21 +78,23 @@ document.addEventListener('DOMContentLoaded', function() {
     };
 
     function displayQRCode(data) {
-        const subject = document.getElementById('subject').value;
+        const subject = data.subject;
         const lectureTime = document.getElementById('lectureTime').value;
         const location = document.getElementById('location').value;
         
         qrDisplay.innerHTML = `
             <div style="text-align: center; color: white;">
-                <img src="${data.qr_code}" alt="QR Code" style="width: 250px; height: 250px; border-radius: 10px; margin-bottom: 15px;">
+                <img id="qrImage" src="${data.qr_code}" alt="QR Code" style="width: 250px; height: 250px; border-radius: 10px; margin-bottom: 15px;">
                 <div style="background: rgba(255,255,255,0.9); color: #333; padding: 10px; border-radius: 10px; margin-bottom: 15px;">
                     <p style="margin: 5px 0; font-weight: 600; background: #f8f9fa; padding: 8px; border-radius: 5px; border: 1px solid #e9ecef;">${subject} - ${lectureTime}</p>
                     <p style="margin: 5px 0; background: #f8f9fa; padding: 8px; border-radius: 5px; border: 1px solid #e9ecef;">Location: ${location}</p>
+                    <p style="margin: 5px 0; background: #f8f9fa; padding: 8px; border-radius: 5px; border: 1px solid #e9ecef;">Manual code: <strong id="manualCode" style="letter-spacing: 3px;"></strong></p>
                     <div class="countdown" id="countdown">Expires in: <span id="timer"></span></div>
                 </div>
                 <button onclick="window.location.reload()" style="background: #8B5CF6; color: white; border: none; padding: 12px 24px; border-radius: 8px; font-weight: 600; cursor: pointer;">Back to Dashboard</button>
             </div>
         `;
+        rotateQRImage('qrImage', data.qr_code, data.rotate_seconds, 'manualCode', data.manual_code_url);
     }
 
     function startCountdown(seconds) {
@@ -120,14 +133,45 @@ document.addEventListener('DOMContentLoaded', function() {
         `;
     };
 
-    refreshBtn.addEventListener('click', loadAttendance);
+    refreshBtn.addEventListener('click', () => loadAttendance());
+
+    const attendanceMore = document.getElementById('attendanceMore');
+    const attendanceFilters = document.getElementById('attendanceFilters');
+    attendanceMore.addEventListener('click', () => loadAttendance(attendanceMore.dataset.cursor));
+    attendanceFilters.addEventListener('change', () => loadAttendance());
+    attendanceFilters.addEventListener('submit', (e) => {
+        e.preventDefault();
+        loadAttendance();
+    });
+
+    function attendanceRow(record) {
+        return `
+            <tr>
+                <td>${record.student_id}</td>
+                <td>${record.student_name}</td>
+                <td>${record.session_id}</td>
+                <td>${record.timestamp}</td>
+            </tr>
+        `;
+    }
 
-    async function loadAttendance() {
+    // Without a cursor the list starts over with the current filters; with one the next page is appended
+    async function loadAttendance(cursor) {
         try {
-            const response = await fetch('/get_attendance');
-            const attendance = await response.json();
-            
-            if (attendance.length === 0) {
+            const page = await fetchPage('/get_attendance', {
+                from: document.getElementById('attendanceFrom').value,
+                to: document.getElementById('attendanceTo').value,
+                subject_id: document.getElementById('attendanceSubject').value,
+                student_id: document.getElementById('attendanceStudent').value.trim()
+            }, cursor);
+            setLoadMore(attendanceMore, page.nextCursor);
+
+            if (cursor) {
+                attendanceList.querySelector('tbody').insertAdjacentHTML('beforeend', page.items.map(attendanceRow).join(''));
+                return;
+            }
+
+            if (page.items.length === 0) {
                 attendanceList.innerHTML = '<p>No attendance records found.</p>';
                 return;
             }
@@ -143,14 +187,7 @@ document.addEventListener('DOMContentLoaded', function() {
                         </tr>
                     </thead>
                     <tbody>
-                        ${attendance.map(record => `
-                            <tr>
-                                <td>${record.student_id}</td>
-                                <td>${record.student_name}</td>
-                                <td>${record.session_id}</td>
-                                <td>${record.timestamp}</td>
-                            </tr>
-                        `).join('')}
+                        ${page.items.map(attendanceRow).join('')}
                     </tbody>
                 </table>
             `;
@@ -158,6 +195,7 @@ document.addEventListener('DOMContentLoaded', function() {
             attendanceList.innerHTML = table;
         } catch (error) {
             attendanceList.innerHTML = '<p class="error">Error loading attendance records</p>';
+            setLoadMore(attendanceMore, null);
         }
     }
 
@@ -0,0 +1,25 @@
+// Shared by the list views. List endpoints return one page at a time and send the
+// cursor for the next page in X-Next-Cursor; pages ask for more only when the user does.
+async function fetchPage(path, params, cursor) {
+    const query = new URLSearchParams();
+    Object.entries({ ...params, cursor }).forEach(([key, value]) => {
+        if (value !== undefined && value !== null && value !== '') {
+            query.set(key, value);
+        }
+    });
+    const response = await fetch(query.toString() ? `${path}?${query}` : path);
+    if (!response.ok) throw new Error(`Request failed: ${response.status}`);
+    return {
+        items: await response.json(),
+        nextCursor: response.headers.get('X-Next-Cursor')
+    };
+}
+
+// Show the "Load more" button only while another page exists
+function setLoadMore(button, nextCursor) {
+    if (!button) {
+        return;
+    }
+    button.dataset.cursor = nextCursor || '';
+    button.style.display = nextCursor ? '' : 'none';
+}
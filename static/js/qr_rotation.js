@@ -0,0 +1,42 @@
+// Shared by every page that shows a live QR session.
+// The QR payload is a signed token that rotates; reload the image for each new window.
+// The short manual-entry code rotates more slowly and is fetched again when its window changes.
+let qrRotation;
+
+function rotateQRImage(imageId, url, rotateSeconds, codeId, codeUrl) {
+    let codeWindow = null;
+
+    function refreshCode() {
+        const codeElement = codeId && document.getElementById(codeId);
+        if (!codeElement || !codeUrl) {
+            return;
+        }
+        fetch(codeUrl)
+            .then(response => response.json())
+            .then(data => {
+                if (data.success) {
+                    codeElement.textContent = data.code;
+                    codeWindow = Math.floor(Date.now() / 1000 / data.rotate_seconds);
+                    codeElement.dataset.rotateSeconds = data.rotate_seconds;
+                }
+            })
+            .catch(() => {});
+    }
+
+    clearInterval(qrRotation);
+    refreshCode();
+    qrRotation = setInterval(() => {
+        const qrImage = document.getElementById(imageId);
+        if (!qrImage) {
+            clearInterval(qrRotation);
+            return;
+        }
+        qrImage.src = url + '?r=' + Math.floor(Date.now() / 1000 / rotateSeconds);
+
+        const codeElement = codeId && document.getElementById(codeId);
+        const codeSeconds = codeElement && Number(codeElement.dataset.rotateSeconds);
+        if (codeSeconds && Math.floor(Date.now() / 1000 / codeSeconds) !== codeWindow) {
+            refreshCode();
+        }
+    }, Math.max(1, rotateSeconds / 2) * 1000);
+}
@@ -0,0 +1,487 @@
+function openLeaveModal() {
+    document.getElementById('leaveModal').classList.add('active');
+    const today = new Date().toISOString().split('T')[0];
+    document.getElementById('startDate').min = today;
+    document.getElementById('endDate').min = today;
+}
+
+function closeLeaveModal() {
+    document.getElementById('leaveModal').classList.remove('active');
+    document.getElementById('leaveForm').reset();
+}
+
+function submitLeave() {
+    const leaveType = document.getElementById('leaveType').value;
+    const startDate = document.getElementById('startDate').value;
+    const endDate = document.getElementById('endDate').value;
+    const reason = document.getElementById('reason').value;
+    const attachment = document.getElementById('attachment').files[0];
+    
+    if (!leaveType || !startDate || !endDate || !reason) {
+        alert('Please fill all required fields');
+        return;
+    }
+    
+    const formData = new FormData();
+    formData.append('leaveType', leaveType);
+    formData.append('startDate', startDate);
+    formData.append('endDate', endDate);
+    formData.append('reason', reason);
+    if (attachment) {
+        formData.append('attachment', attachment);
+    }
+    
+    fetch('/submit_leave', {
+        method: 'POST',
+        body: formData
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            alert('✅ Leave application submitted successfully!');
+            closeLeaveModal();
+        } else {
+            alert('❌ Error: ' + data.message);
+        }
+    })
+    .catch(error => {
+        alert('❌ Failed to submit application');
+    });
+}
+
+
+// Auto-hide login notification after 3 seconds
+setTimeout(() => {
+    const notification = document.getElementById('loginNotification');
+    if (notification) {
+        notification.style.display = 'none';
+    }
+}, 3000);
+
+
+
+function markAttendanceManual() {
+    const code = document.getElementById('qrInput').value.trim();
+    if (!code) {
+        alert('Please enter the code shown under the QR');
+        return;
+    }
+    
+    const studentId = document.body.dataset.studentId || '001';
+    
+    fetch('/mark_attendance', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            student_id: studentId,
+            code
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            alert('✅ Attendance marked successfully!');
+            document.getElementById('qrInput').value = '';
+        } else {
+            alert('❌ ' + data.message);
+        }
+    })
+    .catch(error => {
+        alert('❌ Failed to mark attendance');
+    });
+}
+
+
+let html5QrcodeScanner;
+
+function openQRScanner() {
+    const selectedSubject = sessionStorage.getItem('selectedSubject');
+    if (!selectedSubject) {
+        alert('Please browse and select a subject first!');
+        return;
+    }
+    document.getElementById('qrScannerModal').classList.add('active');
+    
+    html5QrcodeScanner = new Html5QrcodeScanner(
+        "qr-reader",
+        { 
+            fps: 10, 
+            qrbox: { width: 250, height: 250 },
+            aspectRatio: 1.0,
+            supportedScanTypes: [Html5QrcodeScanType.SCAN_TYPE_CAMERA]
+        },
+        false
+    );
+    
+    html5QrcodeScanner.render(onScanSuccess, onScanFailure);
+}
+
+function closeQRScanner() {
+    if (html5QrcodeScanner) {
+        html5QrcodeScanner.clear();
+    }
+    document.getElementById('qrScannerModal').classList.remove('active');
+}
+
+function onScanSuccess(decodedText, decodedResult) {
+    html5QrcodeScanner.clear();
+    
+    const studentId = document.body.dataset.studentId || '001';
+    
+    fetch('/mark_attendance', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            student_id: studentId,
+            session_id: decodedText
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            // Update attendance notification with current date
+            const today = new Date();
+            const dateStr = today.toLocaleDateString('en-GB', { 
+                day: 'numeric', 
+                month: 'long', 
+                year: 'numeric' 
+            });
+            document.getElementById('attendanceDate').textContent = dateStr;
+            document.getElementById('attendanceNotification').style.display = 'block';
+            
+            alert('✅ Attendance marked successfully!');
+            closeQRScanner();
+        } else {
+            alert('❌ ' + data.message);
+            closeQRScanner();
+        }
+    })
+    .catch(error => {
+        alert('❌ Failed to mark attendance');
+        closeQRScanner();
+    });
+}
+
+function onScanFailure(error) {
+    // Handle scan failure silently
+}
+
+function openAttendanceModal() {
+    document.getElementById('attendanceModal').classList.add('active');
+    loadAttendanceData();
+}
+
+function closeAttendanceModal() {
+    document.getElementById('attendanceModal').classList.remove('active');
+}
+
+function loadAttendanceData() {
+    const attendanceData = [
+        {
+            date: '2024-12-01',
+            subject: 'Web Development',
+            subjectCode: 'WD101',
+            time: '09:30 AM',
+            status: 'Present',
+            sessionId: 'attendance_20241201_093000'
+        },
+        {
+            date: '2024-11-30',
+            subject: 'Data Structures',
+            subjectCode: 'DS201',
+            time: '11:00 AM',
+            status: 'Present',
+            sessionId: 'attendance_20241130_110000'
+        },
+        {
+            date: '2024-11-29',
+            subject: 'Database Management',
+            subjectCode: 'DB301',
+            time: '02:30 PM',
+            status: 'Present',
+            sessionId: 'attendance_20241129_143000'
+        }
+    ];
+    
+    displayAttendanceData(attendanceData);
+    updateAttendanceSummary(attendanceData);
+}
+
+function displayAttendanceData(data) {
+    const tbody = document.getElementById('attendanceTableBody');
+    
+    let html = '';
+    data.forEach(record => {
+        const statusColor = record.status === 'Present' ? '#28a745' : '#dc3545';
+        const statusIcon = record.status === 'Present' ? '✅' : '❌';
+        
+        html += `
+            <tr>
+                <td style="padding: 12px; border: 1px solid #dee2e6;">${new Date(record.date).toLocaleDateString('en-GB')}</td>
+                <td style="padding: 12px; border: 1px solid #dee2e6;">${record.subject}</td>
+                <td style="padding: 12px; border: 1px solid #dee2e6;">${record.subjectCode}</td>
+                <td style="padding: 12px; border: 1px solid #dee2e6;">${record.time}</td>
+                <td style="padding: 12px; border: 1px solid #dee2e6; color: ${statusColor}; font-weight: bold;">${statusIcon} ${record.status}</td>
+                <td style="padding: 12px; border: 1px solid #dee2e6; font-family: monospace; font-size: 12px;">${record.sessionId}</td>
+            </tr>
+        `;
+    });
+    
+    tbody.innerHTML = html;
+}
+
+function updateAttendanceSummary(data) {
+    const totalPresent = data.filter(record => record.status === 'Present').length;
+    const totalClasses = data.length;
+    const attendancePercent = totalClasses > 0 ? Math.round((totalPresent / totalClasses) * 100) : 0;
+    
+    document.getElementById('totalPresent').textContent = totalPresent;
+    document.getElementById('totalClasses').textContent = totalClasses;
+    document.getElementById('attendancePercent').textContent = attendancePercent + '%';
+}
+
+function filterAttendance() {
+    loadAttendanceData();
+}
+
+function clearFilters() {
+    document.getElementById('subjectFilter').value = '';
+    document.getElementById('dateFrom').value = '';
+    document.getElementById('dateTo').value = '';
+    loadAttendanceData();
+}
+
+function downloadAttendanceCSV() {
+    const attendanceData = [
+        {
+            date: '2024-12-01',
+            subject: 'Web Development',
+            subjectCode: 'WD101',
+            time: '09:30 AM',
+            status: 'Present',
+            sessionId: 'attendance_20241201_093000'
+        },
+        {
+            date: '2024-11-30',
+            subject: 'Data Structures',
+            subjectCode: 'DS201',
+            time: '11:00 AM',
+            status: 'Present',
+            sessionId: 'attendance_20241130_110000'
+        },
+        {
+            date: '2024-11-29',
+            subject: 'Database Management',
+            subjectCode: 'DB301',
+            time: '02:30 PM',
+            status: 'Present',
+            sessionId: 'attendance_20241129_143000'
+        }
+    ];
+    
+    // Create CSV content
+    let csvContent = 'Date,Subject,Subject Code,Time,Status,Session ID\n';
+    
+    attendanceData.forEach(record => {
+        const row = [
+            new Date(record.date).toLocaleDateString('en-GB'),
+            record.subject,
+            record.subjectCode,
+            record.time,
+            record.status,
+            record.sessionId
+        ].join(',');
+        csvContent += row + '\n';
+    });
+    
+    // Create and download CSV file
+    const blob = new Blob([csvContent], { type: 'text/csv;charset=utf-8;' });
+    const link = document.createElement('a');
+    const url = URL.createObjectURL(blob);
+    
+    const studentId = document.body.dataset.studentId || 'REG2024001';
+    const today = new Date().toISOString().split('T')[0];
+    
+    link.setAttribute('href', url);
+    link.setAttribute('download', `Attendance_${studentId}_${today}.csv`);
+    link.style.visibility = 'hidden';
+    
+    document.body.appendChild(link);
+    link.click();
+    document.body.removeChild(link);
+    
+    alert('📈 Attendance CSV downloaded successfully!');
+}
+
+function openResultsModal() {
+    document.getElementById('resultsModal').classList.add('active');
+    loadResultsData();
+}
+
+function closeResultsModal() {
+    document.getElementById('resultsModal').classList.remove('active');
+}
+
+function loadResultsData() {
+    const resultsData = [
+        {
+            subject: 'Web Development',
+            examType: 'Mid Term',
+            date: '2024-11-15',
+            marks: '85/100',
+            grade: 'A',
+            status: 'Pass',
+            resultId: 'WD_MT_2024_001'
+        },
+        {
+            subject: 'Data Structures',
+            examType: 'Final',
+            date: '2024-11-20',
+            marks: '92/100',
+            grade: 'A+',
+            status: 'Pass',
+            resultId: 'DS_F_2024_001'
+        },
+        {
+            subject: 'Database Management',
+            examType: 'Assignment',
+            date: '2024-11-25',
+            marks: '78/100',
+            grade: 'B+',
+            status: 'Pass',
+            resultId: 'DB_A_2024_001'
+        },
+        {
+            subject: 'Web Development',
+            examType: 'Quiz',
+            date: '2024-11-28',
+            marks: '88/100',
+            grade: 'A',
+            status: 'Pass',
+            resultId: 'WD_Q_2024_001'
+        }
+    ];
+    
+    displayResultsData(resultsData);
+}
+
+function displayResultsData(data) {
+    const tbody = document.getElementById('resultsTableBody');
+    
+    let html = '';
+    data.forEach(record => {
+        const statusColor = record.status === 'Pass' ? '#28a745' : '#dc3545';
+        const gradeColor = record.grade.includes('A') ? '#28a745' : record.grade.includes('B') ? '#ffc107' : '#dc3545';
+        
+        html += `
+            <tr>
+                <td style="padding: 12px; border: 1px solid #dee2e6; font-weight: 600;">${record.subject}</td>
+                <td style="padding: 12px; border: 1px solid #dee2e6;">${record.examType}</td>
+                <td style="padding: 12px; border: 1px solid #dee2e6;">${new Date(record.date).toLocaleDateString('en-GB')}</td>
+                <td style="padding: 12px; border: 1px solid #dee2e6; font-weight: bold;">${record.marks}</td>
+                <td style="padding: 12px; border: 1px solid #dee2e6; color: ${gradeColor}; font-weight: bold; font-size: 16px;">${record.grade}</td>
+                <td style="padding: 12px; border: 1px solid #dee2e6; color: ${statusColor}; font-weight: bold;">${record.status}</td>
+                <td style="padding: 12px; border: 1px solid #dee2e6;">
+                    <button onclick="downloadSingleResult('${record.resultId}')" style="background: #17a2b8; color: white; border: none; padding: 5px 10px; border-radius: 3px; cursor: pointer; font-size: 12px;">
+                        <i class="fas fa-download"></i> PDF
+                    </button>
+                </td>
+            </tr>
+        `;
+    });
+    
+    tbody.innerHTML = html;
+}
+
+function filterResults() {
+    loadResultsData();
+}
+
+function downloadResultsPDF() {
+    // Generate comprehensive results PDF
+    const studentName = document.body.dataset.studentName || 'Ritesh Kumar';
+    const studentId = document.body.dataset.studentId || 'REG2024001';
+    
+    alert('📄 Downloading complete results PDF for ' + studentName + ' (' + studentId + ')');
+    
+    // Simulate PDF download
+    const link = document.createElement('a');
+    link.href = '#';
+    link.download = `Results_${studentId}_Complete.pdf`;
+    link.click();
+}
+
+function downloadSingleResult(resultId) {
+    alert('📄 Downloading result: ' + resultId + '.pdf');
+    
+    // Simulate single result PDF download
+    const link = document.createElement('a');
+    link.href = '#';
+    link.download = `Result_${resultId}.pdf`;
+    link.click();
+}
+
+function openSubjectsModal() {
+    document.getElementById('subjectsModal').classList.add('active');
+    loadSubjects();
+}
+
+function closeSubjectsModal() {
+    document.getElementById('subjectsModal').classList.remove('active');
+}
+
+function loadSubjects() {
+    fetch('/get_student_subjects')
+    .then(response => response.json())
+    .then(data => {
+        const grid = document.getElementById('subjectsGrid');
+        let html = '';
+        
+        data.forEach(subject => {
+            html += `
+                <div style="background: #f8f9fa; border-radius: 15px; padding: 20px; border: 2px solid #e9ecef; transition: all 0.3s ease;" onmouseover="this.style.borderColor='#667eea'" onmouseout="this.style.borderColor='#e9ecef'">
+                    <div style="display: flex; align-items: center; margin-bottom: 15px;">
+                        <div style="width: 50px; height: 50px; background: linear-gradient(135deg, #667eea, #764ba2); border-radius: 10px; display: flex; align-items: center; justify-content: center; margin-right: 15px;">
+                            <i class="fas fa-graduation-cap" style="color: white; font-size: 20px;"></i>
+                        </div>
+                        <div>
+                            <h4 style="margin: 0; color: #333;">${subject.name}</h4>
+                            <p style="margin: 0; color: #666; font-size: 14px;">${subject.code}</p>
+                        </div>
+                    </div>
+                    <div style="margin-bottom: 15px; font-size: 14px;">
+                        <div style="display: flex; justify-content: space-between; margin-bottom: 5px;">
+                            <span style="color: #666;">Year:</span>
+                            <span style="color: #333; font-weight: 600;">${subject.academic_year}</span>
+                        </div>
+                        <div style="display: flex; justify-content: space-between; margin-bottom: 5px;">
+                            <span style="color: #666;">Division:</span>
+                            <span style="color: #333; font-weight: 600;">${subject.division}</span>
+                        </div>
+                        <div style="display: flex; justify-content: space-between;">
+                            <span style="color: #666;">Credits:</span>
+                            <span style="color: #333; font-weight: 600;">${subject.credits}</span>
+                        </div>
+                    </div>
+                    <button onclick="selectSubjectFromModal(${subject.id}, '${subject.name}')" style="width: 100%; padding: 12px; background: linear-gradient(135deg, #667eea, #764ba2); color: white; border: none; border-radius: 8px; cursor: pointer; font-weight: 600;">
+                        <i class="fas fa-check"></i> Select Subject
+                    </button>
+                </div>
+            `;
+        });
+        
+        grid.innerHTML = html;
+    });
+}
+
+function selectSubjectFromModal(subjectId, subjectName) {
+    sessionStorage.setItem('selectedSubject', subjectId);
+    sessionStorage.setItem('selectedSubjectName', subjectName);
+    closeSubjectsModal();
+    alert('✅ Subject "' + subjectName + '" selected! You can now scan QR codes for this subject.');
+}
+
@@ -44,12 +44,22 @@ function viewReports() {
 }
 
 async function generateQRCode() {
-    // Show form first
+    // Show form first; the subject list gives each session its subject_id
     const qrDisplay = document.getElementById('qrDisplay');
+    let subjects = [];
+    try {
+        const response = await fetch('/get_students_subjects');
+        subjects = (await response.json()).subjects || [];
+    } catch (error) {
+        console.error('Error loading subjects:', error);
+    }
     qrDisplay.innerHTML = `
         <div class="qr-form">
             <h4>Generate QR Code</h4>
-            <input type="text" id="subject" placeholder="Subject" required>
+            <select id="subject" required>
+                <option value="">Select subject</option>
+                ${subjects.map(subject => `<option value="${subject.id}">${subject.name}</option>`).join('')}
+            </select>
             <input type="text" id="lectureTime" placeholder="Lecture Time" required>
             <input type="text" id="location" placeholder="Location" required>
             <select id="expiryMinutes">
@@ -65,7 +75,9 @@ async function generateQRCode() {
 }
 
 window.submitQRForm = async function() {
-    const subject = document.getElementById('subject').value;
+    const subjectSelect = document.getElementById('subject');
+    const subjectId = subjectSelect.value;
+    const subject = subjectId ? subjectSelect.selectedOptions[0].textContent : '';
     const lectureTime = document.getElementById('lectureTime').value;
     const location = document.getElementById('location').value;
     const expiryMinutes = document.getElementById('expiryMinutes').value;
@@ -83,6 +95,7 @@ window.submitQRForm = async function() {
             },
             body: JSON.stringify({
                 subject,
+                subject_id: subjectId,
                 lecture_time: lectureTime,
                 location,
                 expiry_minutes: expiryMinutes
@@ -95,16 +108,18 @@ window.submitQRForm = async function() {
             const qrDisplay = document.getElementById('qrDisplay');
             qrDisplay.innerHTML = `
                 <div style="text-align: center; color: white;">
-                    <img src="${data.qr_code}" alt="QR Code" style="width: 250px; height: 250px; border-radius: 10px; margin-bottom: 15px;">
+                    <img id="qrImage" src="${data.qr_code}" alt="QR Code" style="width: 250px; height: 250px; border-radius: 10px; margin-bottom: 15px;">
                     <div style="background: rgba(255,255,255,0.9); color: #333; padding: 10px; border-radius: 10px; margin-bottom: 15px;">
                         <p style="margin: 5px 0; font-weight: 600; background: #f8f9fa; padding: 8px; border-radius: 5px; border: 1px solid #e9ecef;">${subject} - ${lectureTime}</p>
                         <p style="margin: 5px 0; background: #f8f9fa; padding: 8px; border-radius: 5px; border: 1px solid #e9ecef;">Location: ${location}</p>
+                        <p style="margin: 5px 0; background: #f8f9fa; padding: 8px; border-radius: 5px; border: 1px solid #e9ecef;">Manual code: <strong id="manualCode" style="letter-spacing: 3px;"></strong></p>
                         <div class="countdown" id="countdown">Expires in: <span id="timer"></span></div>
                     </div>
                     <button onclick="window.location.reload()" style="background: #8B5CF6; color: white; border: none; padding: 12px 24px; border-radius: 8px; font-weight: 600; cursor: pointer;">Back to Dashboard</button>
                 </div>
             `;
             startCountdown(parseInt(expiryMinutes) * 60);
+            rotateQRImage('qrImage', data.qr_code, data.rotate_seconds, 'manualCode', data.manual_code_url);
         } else {
             alert('Error: ' + data.message);
         }
@@ -158,11 +173,10 @@ async function loadStudents() {
 
 async function loadAttendanceData() {
     try {
-        const response = await fetch('/get_attendance');
-        const attendanceData = await response.json();
+        const page = await fetchPage('/get_attendance', {});
         
         // Update activity list with real data if needed
-        console.log('Attendance data loaded:', attendanceData);
+        console.log('Attendance data loaded:', page.items);
     } catch (error) {
         console.error('Error loading attendance data:', error);
     }
@@ -0,0 +1,930 @@
+// Add fade-in animation on load
+document.addEventListener('DOMContentLoaded', function() {
+    const cards = document.querySelectorAll('.stat-card, .subject-card');
+    cards.forEach((card, index) => {
+        setTimeout(() => {
+            card.style.opacity = '1';
+            card.style.transform = 'translateY(0)';
+        }, index * 100);
+    });
+});
+
+// Add button click effects
+document.querySelectorAll('button, .action-btn').forEach(btn => {
+    btn.addEventListener('click', function(e) {
+        if (!this.classList.contains('no-effect')) {
+            const ripple = document.createElement('span');
+            ripple.style.cssText = `
+                position: absolute;
+                border-radius: 50%;
+                background: rgba(255,255,255,0.6);
+                transform: scale(0);
+                animation: ripple 0.6s linear;
+                pointer-events: none;
+            `;
+            
+            const rect = this.getBoundingClientRect();
+            const size = Math.max(rect.width, rect.height);
+            ripple.style.width = ripple.style.height = size + 'px';
+            ripple.style.left = (e.clientX - rect.left - size / 2) + 'px';
+            ripple.style.top = (e.clientY - rect.top - size / 2) + 'px';
+            
+            this.appendChild(ripple);
+            setTimeout(() => ripple.remove(), 600);
+        }
+    });
+});
+
+// Add ripple animation
+const style = document.createElement('style');
+style.textContent = `
+    @keyframes ripple {
+        to {
+            transform: scale(4);
+            opacity: 0;
+        }
+    }
+`;
+document.head.appendChild(style);
+
+// Add shake animation
+const shakeStyle = document.createElement('style');
+shakeStyle.textContent = `
+    @keyframes shake {
+        0%, 100% { transform: translateX(0); }
+        25% { transform: translateX(-5px); }
+        75% { transform: translateX(5px); }
+    }
+`;
+document.head.appendChild(shakeStyle);
+
+// Modal Functions
+function openCreateSubjectModal() {
+    const modal = document.getElementById('createSubjectModal');
+    const successMessage = document.getElementById('successMessage');
+    successMessage.classList.remove('show');
+    modal.classList.add('active');
+    document.body.style.overflow = 'hidden';
+}
+
+function closeCreateSubjectModal() {
+    const modal = document.getElementById('createSubjectModal');
+    modal.classList.remove('active');
+    document.body.style.overflow = 'auto';
+    document.getElementById('createSubjectForm').reset();
+}
+
+// Close modal when clicking outside
+document.getElementById('createSubjectModal').addEventListener('click', function(e) {
+    if (e.target === this) {
+        closeCreateSubjectModal();
+    }
+});
+
+document.getElementById('leaveApplicationsModal').addEventListener('click', function(e) {
+    if (e.target === this) {
+        closeLeaveApplicationsModal();
+    }
+});
+
+// Close modal with Escape key
+document.addEventListener('keydown', function(e) {
+    if (e.key === 'Escape') {
+        closeCreateSubjectModal();
+        closeLeaveApplicationsModal();
+        closeQRModal();
+    }
+});
+
+let qrSubjectId = null;
+
+function openQRModal(subjectName, subjectId) {
+    document.getElementById('qrModal').classList.add('active');
+    document.getElementById('subject').value = subjectName;
+    qrSubjectId = subjectId;
+    
+    const now = new Date();
+    const oneHourLater = new Date(now.getTime() + 60 * 60 * 1000);
+    document.getElementById('classStartTime').value = now.toISOString().slice(0, 16);
+    document.getElementById('classEndTime').value = oneHourLater.toISOString().slice(0, 16);
+    
+    document.body.style.overflow = 'hidden';
+}
+
+function closeQRModal() {
+    document.getElementById('qrModal').classList.remove('active');
+    document.getElementById('qrForm').reset();
+    document.body.style.overflow = 'auto';
+    if (window.countdownTimer) {
+        clearInterval(window.countdownTimer);
+    }
+}
+
+function generateQR() {
+    const subject = document.getElementById('subject').value;
+    const startTime = document.getElementById('classStartTime').value;
+    const endTime = document.getElementById('classEndTime').value;
+    const expiryValue = document.getElementById('expiryValue').value;
+    const expiryUnit = document.getElementById('expiryUnit').value;
+    
+    if (!startTime || !endTime || !expiryValue) {
+        alert('Please fill all required fields');
+        return;
+    }
+    
+    const generateBtn = document.getElementById('generateBtn');
+    generateBtn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Generating...';
+    generateBtn.disabled = true;
+    generateBtn.style.opacity = '0.7';
+    generateBtn.style.cursor = 'not-allowed';
+    
+    let expirySeconds;
+    if (expiryUnit === 'minutes') {
+        if (expiryValue < 1 || expiryValue > 20) {
+            alert('QR expiry must be between 1 and 20 minutes');
+            return;
+        }
+        expirySeconds = expiryValue * 60;
+    } else {
+        if (expiryValue < 30 || expiryValue > 1200) {
+            alert('QR expiry must be between 30 and 1200 seconds');
+            return;
+        }
+        expirySeconds = parseInt(expiryValue);
+    }
+    
+    fetch('/generate_qr', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            subject,
+            subject_id: qrSubjectId,
+            class_start_time: startTime,
+            class_end_time: endTime,
+            expiry_seconds: expirySeconds
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            window.location.href = '/qr_display/' + data.session_id;
+        } else {
+            alert('Error: ' + (data.message || 'Unknown error'));
+        }
+    })
+    .catch(error => {
+        alert('Failed to generate QR code');
+    })
+    .finally(() => {
+        generateBtn.innerHTML = '<i class="fas fa-qrcode"></i> Generate QR';
+        generateBtn.disabled = false;
+        generateBtn.style.opacity = '1';
+        generateBtn.style.cursor = 'pointer';
+    });
+}
+
+
+
+document.getElementById('qrModal').addEventListener('click', function(e) {
+    if (e.target === this) {
+        closeQRModal();
+    }
+});
+
+// Leave Applications Modal Functions
+function openLeaveApplicationsModal() {
+    const modal = document.getElementById('leaveApplicationsModal');
+    modal.classList.add('active');
+    document.body.style.overflow = 'hidden';
+    loadLeaveApplications();
+}
+
+function closeLeaveApplicationsModal() {
+    const modal = document.getElementById('leaveApplicationsModal');
+    modal.classList.remove('active');
+    document.body.style.overflow = 'auto';
+}
+
+// A new upload 404s until its thumbnail is written; try again a few times before giving up
+function retryPreview(img) {
+    const attempt = Number(img.dataset.attempt || 0) + 1;
+    if (attempt > 5) {
+        img.parentElement.remove();
+        return;
+    }
+    img.dataset.attempt = attempt;
+    setTimeout(() => {
+        img.src = `${img.src.split('?')[0]}?retry=${attempt}`;
+    }, attempt * 2000);
+}
+
+function leaveFilters() {
+    return {
+        status: document.getElementById('leaveStatusFilter').value,
+        from: document.getElementById('leaveFromFilter').value,
+        to: document.getElementById('leaveToFilter').value
+    };
+}
+
+function loadMoreLeaveApplications() {
+    loadLeaveApplications(document.getElementById('leaveApplicationsMore').dataset.cursor);
+}
+
+// Without a cursor the list starts over with the current filters; with one the next page is appended
+function loadLeaveApplications(cursor) {
+    fetchPage('/get_leave_applications', leaveFilters(), cursor)
+    .then(page => {
+        const container = document.getElementById('leaveApplicationsList');
+        const data = page.items;
+        setLoadMore(document.getElementById('leaveApplicationsMore'), page.nextCursor);
+        if (!cursor && data.length === 0) {
+            container.innerHTML = '<div class="no-applications">No leave applications found.</div>';
+            return;
+        }
+        
+        let html = '';
+        data.forEach(app => {
+            const statusClass = app.status === 'approved' ? 'approved' : app.status === 'rejected' ? 'rejected' : 'pending';
+            html += `
+                <div class="application-card">
+                    <div class="app-header">
+                        <div class="student-info">
+                            <h4>${app.student_name}</h4>
+                            <span class="student-id">ID: ${app.student_id}</span>
+                        </div>
+                        <div class="status-badge ${statusClass}">${app.status.toUpperCase()}</div>
+                    </div>
+                    <div class="app-details">
+                        <div class="detail-row">
+                            <span class="label">Leave Type:</span>
+                            <span class="value">${app.leave_type}</span>
+                        </div>
+                        <div class="detail-row">
+                            <span class="label">Duration:</span>
+                            <span class="value">${app.start_date} to ${app.end_date}</span>
+                        </div>
+                        <div class="detail-row">
+                            <span class="label">Reason:</span>
+                            <span class="value">${app.reason}</span>
+                        </div>
+                        ${app.attachment_path ? `
+                        <div class="detail-row">
+                            <span class="label">Attachment:</span>
+                            <span class="value"><button onclick="viewAttachment(${app.id})" style="background: none; border: none; color: var(--secondary-blue); cursor: pointer; padding: 0;"><i class="fas fa-eye"></i> View File</button></span>
+                        </div>
+                        ${app.attachment_preview ? `
+                        <div class="detail-row">
+                            <img src="${app.attachment_preview}" alt="Attachment preview" loading="lazy" onclick="viewAttachment(${app.id})" onerror="retryPreview(this)" style="max-width: 240px; max-height: 240px; border-radius: 6px; cursor: pointer;">
+                        </div>
+                        ` : ''}
+                        ` : ''}
+                        <div class="detail-row">
+                            <span class="label">Applied:</span>
+                            <span class="value">${new Date(app.applied_at).toLocaleDateString()}</span>
+                        </div>
+                    </div>
+                    ${app.status === 'pending' ? `
+                        <div class="app-actions">
+                            <button class="approve-btn" onclick="updateLeaveStatus(${app.id}, 'approved')">
+                                <i class="fas fa-check"></i> Approve
+                            </button>
+                            <button class="reject-btn" onclick="updateLeaveStatus(${app.id}, 'rejected')">
+                                <i class="fas fa-times"></i> Reject
+                            </button>
+                        </div>
+                    ` : ''}
+                </div>
+            `;
+        });
+        if (cursor) {
+            container.insertAdjacentHTML('beforeend', html);
+        } else {
+            container.innerHTML = html;
+        }
+    })
+    .catch(error => {
+        document.getElementById('leaveApplicationsList').innerHTML = '<div class="error">Failed to load applications.</div>';
+        setLoadMore(document.getElementById('leaveApplicationsMore'), null);
+    });
+}
+
+function updateLeaveStatus(appId, status) {
+    fetch('/update_leave_status', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            id: appId,
+            status: status
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            loadLeaveApplications(); // Reload the list
+        } else {
+            alert('Error: ' + data.message);
+        }
+    })
+    .catch(error => {
+        alert('Failed to update status');
+    });
+}
+
+function viewAttachment(appId) {
+    window.open(`/download_attachment/${appId}`, '_blank');
+}
+
+// Create Subject Function
+function createSubject() {
+    const form = document.getElementById('createSubjectForm');
+    const formData = new FormData(form);
+    
+    const subjectData = {
+        subjectName: formData.get('subjectName'),
+        academicYear: formData.get('academicYear'),
+        division: formData.get('division'),
+        subjectCode: formData.get('subjectCode'),
+        description: formData.get('description'),
+        semester: formData.get('semester')
+    };
+    
+    if (!subjectData.subjectName || !subjectData.academicYear || !subjectData.semester || !subjectData.division) {
+        alert('Please fill in all required fields (Subject Name, Academic Year, Semester, and Division)');
+        return;
+    }
+    
+    const createBtn = document.querySelector('.btn-primary');
+    const originalText = createBtn.innerHTML;
+    createBtn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Creating...';
+    createBtn.disabled = true;
+    
+    // Make API call to create subject
+    fetch('/create_subject', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(subjectData)
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            const successMessage = document.getElementById('successMessage');
+            successMessage.classList.add('show');
+            
+            // Reload the page to show the new subject with proper functionality
+            setTimeout(() => {
+                window.location.reload();
+            }, 1500);
+        } else {
+            alert('Error: ' + data.message);
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('Failed to create subject. Please try again.');
+    })
+    .finally(() => {
+        createBtn.innerHTML = originalText;
+        createBtn.disabled = false;
+    });
+}
+
+// Add new subject card to the grid
+function addNewSubjectCard(name, description, year, division, code) {
+    const subjectsGrid = document.querySelector('.subjects-grid');
+    const randomStudents = Math.floor(Math.random() * 30) + 20;
+    
+    const newCard = document.createElement('div');
+    newCard.className = 'subject-card fade-in';
+    newCard.style.opacity = '0';
+    newCard.style.transform = 'translateY(20px)';
+    newCard.innerHTML = `
+        <div class="subject-header">
+            <div class="subject-info">
+                <div class="subject-title">
+                    <div class="subject-icon">
+                        <i class="fas fa-book-open"></i>
+                    </div>
+                    <div class="subject-details">
+                        <h3>${name}</h3>
+                        <p>${description}</p>
+                    </div>
+                </div>
+                <div class="student-count">
+                    <i class="fas fa-users"></i>
+                    <span>${randomStudents}</span>
+                </div>
+            </div>
+        </div>
+        <div class="subject-meta">
+            <div class="meta-item">
+                <div class="meta-icon academic">
+                    <i class="fas fa-calendar"></i>
+                </div>
+                <div class="meta-label">Academic Year</div>
+                <div class="meta-value">${year}</div>
+            </div>
+            <div class="meta-item">
+                <div class="meta-icon division">
+                    <i class="fas fa-users"></i>
+                </div>
+                <div class="meta-label">Division</div>
+                <div class="meta-value">${division}</div>
+            </div>
+        </div>
+        <div class="subject-actions">
+            <button class="subject-btn qr" onclick="openQRModal('${name}', 'NEW_ID')">
+                <i class="fas fa-qrcode"></i>
+                Generate QR Code
+            </button>
+            <button class="subject-btn attendance" onclick="openAttendanceModal('NEW_ID', '${name}')">
+                <i class="fas fa-eye"></i>
+                View Attendance
+            </button>
+            <button class="subject-btn leave" onclick="openSubjectLeaveModal('NEW_ID', '${name}')">
+                <i class="fas fa-file-alt"></i>
+                Leave Applications
+            </button>
+        </div>
+    `;
+    
+    subjectsGrid.appendChild(newCard);
+    
+    // Animate the new card
+    setTimeout(() => {
+        newCard.style.opacity = '1';
+        newCard.style.transform = 'translateY(0)';
+    }, 100);
+}
+
+// Auto-generate subject code
+document.getElementById('subjectName').addEventListener('input', function(e) {
+    const subjectName = e.target.value;
+    const subjectCodeField = document.getElementById('subjectCode');
+    
+    if (subjectName && !subjectCodeField.value) {
+        const words = subjectName.split(' ');
+        let code = '';
+        words.forEach(word => {
+            if (word.length > 0) {
+                code += word.charAt(0).toUpperCase();
+            }
+        });
+        code += '101';
+        subjectCodeField.value = code;
+    }
+});
+
+// Subject-specific modal functions
+let currentSubjectId = null;
+let currentSubjectName = null;
+
+function openAttendanceModal(subjectId, subjectName) {
+    currentSubjectId = subjectId;
+    currentSubjectName = subjectName;
+    document.getElementById('attendanceModalTitle').textContent = `${subjectName} - Attendance`;
+    document.getElementById('attendanceModal').classList.add('active');
+    document.body.style.overflow = 'hidden';
+    loadSubjectAttendance(subjectId);
+}
+
+function closeAttendanceModal() {
+    document.getElementById('attendanceModal').classList.remove('active');
+    document.body.style.overflow = 'auto';
+    currentSubjectId = null;
+    currentSubjectName = null;
+}
+
+function openSubjectLeaveModal(subjectId, subjectName) {
+    currentSubjectId = subjectId;
+    currentSubjectName = subjectName;
+    document.getElementById('subjectLeaveModalTitle').textContent = `${subjectName} - Leave Applications`;
+    document.getElementById('subjectLeaveModal').classList.add('active');
+    document.body.style.overflow = 'hidden';
+    loadSubjectLeaveApplications(subjectId);
+}
+
+function closeSubjectLeaveModal() {
+    document.getElementById('subjectLeaveModal').classList.remove('active');
+    document.body.style.overflow = 'auto';
+    currentSubjectId = null;
+    currentSubjectName = null;
+}
+
+function loadSubjectAttendance(subjectId) {
+    fetch(`/get_subject_attendance/${subjectId}`)
+    .then(response => response.json())
+    .then(data => {
+        const container = document.getElementById('attendanceList');
+        if (data.length === 0) {
+            container.innerHTML = '<div class="no-applications">No attendance records found.</div>';
+            return;
+        }
+        
+        let html = '<div style="background: white; border-radius: 8px; overflow: hidden; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">';
+        html += '<table style="width: 100%; border-collapse: collapse;">';
+        html += '<thead style="background: var(--gray-100);"><tr>';
+        html += '<th style="padding: 12px; text-align: left; border-bottom: 1px solid #ddd; color: var(--gray-700);">Student Name</th>';
+        html += '<th style="padding: 12px; text-align: left; border-bottom: 1px solid #ddd; color: var(--gray-700);">Student ID</th>';
+        html += '<th style="padding: 12px; text-align: left; border-bottom: 1px solid #ddd; color: var(--gray-700);">Date & Time</th>';
+        html += '</tr></thead><tbody>';
+        
+        data.forEach((record, index) => {
+            const bgColor = index % 2 === 0 ? 'white' : 'var(--gray-50)';
+            html += `<tr style="background: ${bgColor};" class="attendance-row">`;
+            html += `<td style="padding: 12px; border-bottom: 1px solid #eee; color: var(--gray-800);">${record.student_name}</td>`;
+            html += `<td style="padding: 12px; border-bottom: 1px solid #eee; color: var(--gray-600);">${record.student_id}</td>`;
+            html += `<td style="padding: 12px; border-bottom: 1px solid #eee; color: var(--gray-600);">${new Date(record.timestamp).toLocaleString()}</td>`;
+            html += '</tr>';
+        });
+        
+        html += '</tbody></table></div>';
+        container.innerHTML = html;
+        
+        // Add search functionality
+        document.getElementById('attendanceSearch').addEventListener('input', function(e) {
+            const searchTerm = e.target.value.toLowerCase();
+            const rows = document.querySelectorAll('.attendance-row');
+            rows.forEach(row => {
+                const text = row.textContent.toLowerCase();
+                row.style.display = text.includes(searchTerm) ? '' : 'none';
+            });
+        });
+    })
+    .catch(error => {
+        document.getElementById('attendanceList').innerHTML = '<div class="error">Failed to load attendance records.</div>';
+    });
+}
+
+function loadSubjectLeaveApplications(subjectId) {
+    fetch(`/get_subject_leave_applications/${subjectId}`)
+    .then(response => response.json())
+    .then(data => {
+        const container = document.getElementById('subjectLeaveList');
+        if (data.length === 0) {
+            container.innerHTML = '<div class="no-applications">No leave applications found.</div>';
+            return;
+        }
+        
+        let html = '';
+        data.forEach(app => {
+            const statusClass = app.status === 'approved' ? 'approved' : app.status === 'rejected' ? 'rejected' : 'pending';
+            html += `
+                <div class="application-card">
+                    <div class="app-header">
+                        <div class="student-info">
+                            <h4>${app.student_name}</h4>
+                            <span class="student-id">ID: ${app.student_id}</span>
+                        </div>
+                        <div class="status-badge ${statusClass}">${app.status.toUpperCase()}</div>
+                    </div>
+                    <div class="app-details">
+                        <div class="detail-row">
+                            <span class="label">Leave Type:</span>
+                            <span class="value">${app.leave_type}</span>
+                        </div>
+                        <div class="detail-row">
+                            <span class="label">Duration:</span>
+                            <span class="value">${app.start_date} to ${app.end_date}</span>
+                        </div>
+                        <div class="detail-row">
+                            <span class="label">Reason:</span>
+                            <span class="value">${app.reason}</span>
+                        </div>
+                        <div class="detail-row">
+                            <span class="label">Applied:</span>
+                            <span class="value">${new Date(app.applied_at).toLocaleDateString()}</span>
+                        </div>
+                    </div>
+                    ${app.status === 'pending' ? `
+                        <div class="app-actions">
+                            <button class="approve-btn" onclick="updateLeaveStatus(${app.id}, 'approved')">
+                                <i class="fas fa-check"></i> Approve
+                            </button>
+                            <button class="reject-btn" onclick="updateLeaveStatus(${app.id}, 'rejected')">
+                                <i class="fas fa-times"></i> Reject
+                            </button>
+                        </div>
+                    ` : ''}
+                </div>
+            `;
+        });
+        container.innerHTML = html;
+    })
+    .catch(error => {
+        document.getElementById('subjectLeaveList').innerHTML = '<div class="error">Failed to load applications.</div>';
+    });
+}
+
+function downloadAttendanceCSV() {
+    if (currentSubjectId) {
+        window.open(`/download_attendance_csv/${currentSubjectId}`, '_blank');
+    }
+}
+
+// Close modals when clicking outside
+document.getElementById('attendanceModal').addEventListener('click', function(e) {
+    if (e.target === this) {
+        closeAttendanceModal();
+    }
+});
+
+document.getElementById('subjectLeaveModal').addEventListener('click', function(e) {
+    if (e.target === this) {
+        closeSubjectLeaveModal();
+    }
+});
+
+// Results modal functions
+function openResultsModal() {
+    document.getElementById('resultsModal').classList.add('active');
+    document.getElementById('successResultMessage').classList.remove('show');
+    document.body.style.overflow = 'hidden';
+    loadStudentsAndSubjects();
+}
+
+function closeResultsModal() {
+    document.getElementById('resultsModal').classList.remove('active');
+    document.body.style.overflow = 'auto';
+    document.getElementById('resultForm').reset();
+}
+
+function loadStudentsAndSubjects() {
+    fetch('/get_students_subjects')
+    .then(response => response.json())
+    .then(data => {
+        const studentSelect = document.getElementById('studentSelect');
+        const subjectSelect = document.getElementById('subjectSelect');
+        
+        studentSelect.innerHTML = '<option value="">Select student</option>';
+        subjectSelect.innerHTML = '<option value="">Select subject</option>';
+        
+        data.students.forEach(student => {
+            studentSelect.innerHTML += `<option value="${student.id}">${student.name} (${student.id})</option>`;
+        });
+        
+        data.subjects.forEach(subject => {
+            subjectSelect.innerHTML += `<option value="${subject.id}">${subject.name} (${subject.year} ${subject.division})</option>`;
+        });
+    })
+    .catch(error => {
+        console.error('Error loading data:', error);
+    });
+}
+
+function saveResult() {
+    const studentId = document.getElementById('studentSelect').value;
+    const subjectId = document.getElementById('subjectSelect').value;
+    const examType = document.getElementById('examType').value;
+    const marksObtained = document.getElementById('marksObtained').value;
+    const maxMarks = document.getElementById('maxMarks').value;
+    const remarks = document.getElementById('remarks').value;
+    
+    if (!studentId || !subjectId || !examType || !marksObtained || !maxMarks) {
+        alert('Please fill all required fields');
+        return;
+    }
+    
+    const saveBtn = document.querySelector('#resultsModal .btn-primary');
+    const originalText = saveBtn.innerHTML;
+    saveBtn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Saving...';
+    saveBtn.disabled = true;
+    
+    fetch('/enter_result', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            student_id: studentId,
+            subject_id: subjectId,
+            exam_type: examType,
+            marks_obtained: parseFloat(marksObtained),
+            max_marks: parseFloat(maxMarks),
+            remarks: remarks
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            const successMessage = document.getElementById('successResultMessage');
+            successMessage.classList.add('show');
+            document.getElementById('resultForm').reset();
+            
+            setTimeout(() => {
+                closeResultsModal();
+            }, 1500);
+        } else {
+            alert('Error: ' + data.message);
+        }
+    })
+    .catch(error => {
+        alert('Failed to save result');
+    })
+    .finally(() => {
+        saveBtn.innerHTML = originalText;
+        saveBtn.disabled = false;
+    });
+}
+
+// Close results modal when clicking outside
+document.getElementById('resultsModal').addEventListener('click', function(e) {
+    if (e.target === this) {
+        closeResultsModal();
+    }
+});
+
+// Tab switching functions
+function switchTab(tab) {
+    const manualTab = document.getElementById('manualTab');
+    const csvTab = document.getElementById('csvTab');
+    const manualSection = document.getElementById('manualSection');
+    const csvSection = document.getElementById('csvSection');
+    const saveBtn = document.getElementById('saveResultBtn');
+    const uploadBtn = document.getElementById('uploadCsvBtn');
+    
+    if (tab === 'manual') {
+        manualTab.classList.add('active');
+        csvTab.classList.remove('active');
+        manualSection.style.display = 'block';
+        csvSection.style.display = 'none';
+        saveBtn.style.display = 'flex';
+        uploadBtn.style.display = 'none';
+        manualTab.style.borderBottomColor = 'var(--secondary-blue)';
+        csvTab.style.borderBottomColor = 'transparent';
+    } else {
+        csvTab.classList.add('active');
+        manualTab.classList.remove('active');
+        csvSection.style.display = 'block';
+        manualSection.style.display = 'none';
+        uploadBtn.style.display = 'flex';
+        saveBtn.style.display = 'none';
+        csvTab.style.borderBottomColor = 'var(--secondary-blue)';
+        manualTab.style.borderBottomColor = 'transparent';
+    }
+}
+
+// Custom alert functions
+function showCustomAlert(title, message, showInput = false, onConfirm = null, onCancel = null) {
+    const alertHtml = `
+        <div class="custom-alert" id="customAlert">
+            <div class="alert-content">
+                <div class="alert-icon">
+                    <i class="fas fa-exclamation-triangle"></i>
+                </div>
+                <div class="alert-title">${title}</div>
+                <div class="alert-message">${message}</div>
+                ${showInput ? '<input type="text" class="confirm-input" id="confirmInput" placeholder="Type YES to confirm">' : ''}
+                <div class="alert-buttons">
+                    <button class="alert-btn cancel" onclick="closeCustomAlert()">Cancel</button>
+                    <button class="alert-btn confirm" onclick="confirmCustomAlert()">Confirm</button>
+                </div>
+            </div>
+        </div>
+    `;
+    
+    document.body.insertAdjacentHTML('beforeend', alertHtml);
+    setTimeout(() => document.getElementById('customAlert').classList.add('show'), 10);
+    
+    window.customAlertConfirm = onConfirm;
+    window.customAlertCancel = onCancel;
+}
+
+function closeCustomAlert() {
+    const alert = document.getElementById('customAlert');
+    if (alert) {
+        alert.classList.remove('show');
+        setTimeout(() => alert.remove(), 150);
+    }
+    if (window.customAlertCancel) window.customAlertCancel();
+}
+
+function confirmCustomAlert() {
+    const input = document.getElementById('confirmInput');
+    if (input && input.value !== 'YES') {
+        input.style.borderColor = '#ff6b6b';
+        input.style.animation = 'shake 0.5s';
+        return;
+    }
+    closeCustomAlert();
+    if (window.customAlertConfirm) window.customAlertConfirm();
+}
+
+// Delete subject function with fast confirmation
+function deleteSubject(subjectId, subjectName) {
+    showCustomAlert(
+        'Delete Subject',
+        `Are you sure you want to delete "${subjectName}"?`,
+        false,
+        () => {
+            // Show loading immediately
+            const alertContent = document.querySelector('.alert-content');
+            alertContent.innerHTML = `
+                <div class="alert-icon">
+                    <i class="fas fa-spinner fa-spin"></i>
+                </div>
+                <div class="alert-title">Deleting...</div>
+                <div class="alert-message">Please wait...</div>
+            `;
+            
+            // Immediate delete request
+            fetch('/delete_subject', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ subject_id: subjectId })
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (data.success) {
+                    // Close alert and reload immediately
+                    closeCustomAlert();
+                    window.location.reload();
+                } else {
+                    alertContent.innerHTML = `
+                        <div class="alert-icon">
+                            <i class="fas fa-times"></i>
+                        </div>
+                        <div class="alert-title">Error</div>
+                        <div class="alert-message">${data.message}</div>
+                        <div class="alert-buttons">
+                            <button class="alert-btn confirm" onclick="closeCustomAlert()">OK</button>
+                        </div>
+                    `;
+                }
+            })
+            .catch(() => {
+                alertContent.innerHTML = `
+                    <div class="alert-icon">
+                        <i class="fas fa-times"></i>
+                    </div>
+                    <div class="alert-title">Error</div>
+                    <div class="alert-message">Failed to delete subject</div>
+                    <div class="alert-buttons">
+                        <button class="alert-btn confirm" onclick="closeCustomAlert()">OK</button>
+                    </div>
+                `;
+            });
+        }
+    );
+}
+
+// CSV upload function
+function uploadCSV() {
+    const fileInput = document.getElementById('csvFile');
+    const file = fileInput.files[0];
+    
+    if (!file) {
+        alert('Please select a CSV file');
+        return;
+    }
+    
+    const uploadBtn = document.getElementById('uploadCsvBtn');
+    const originalText = uploadBtn.innerHTML;
+    uploadBtn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Uploading...';
+    uploadBtn.disabled = true;
+    
+    const formData = new FormData();
+    formData.append('file', file);
+    
+    fetch('/upload_results_csv', {
+        method: 'POST',
+        body: formData
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            if (data.errors && data.errors.length) {
+                const lines = data.errors.slice(0, 20).map(e => `Row ${e.row}: ${e.error}`);
+                if (data.error_count > lines.length) {
+                    lines.push(`...and ${data.error_count - lines.length} more`);
+                }
+                alert('Some rows were not imported:\n' + lines.join('\n'));
+            }
+            const successMessage = document.getElementById('successResultMessage');
+            successMessage.querySelector('span').textContent = data.message;
+            successMessage.classList.add('show');
+            document.getElementById('csvForm').reset();
+            
+            setTimeout(() => {
+                closeResultsModal();
+            }, 2000);
+        } else {
+            alert('Error: ' + data.message);
+        }
+    })
+    .catch(error => {
+        alert('Failed to upload CSV file');
+    })
+    .finally(() => {
+        uploadBtn.innerHTML = originalText;
+        uploadBtn.disabled = false;
+    });
+}
+
+
+
@@ -0,0 +1,74 @@
+import os
+import time
+import tempfile
+import threading
+from flask import g, before_render_template, template_rendered
+from flask.templating import Environment
+from jinja2 import FileSystemBytecodeCache
+
+# Shared by every worker on the host; '' disables the on-disk cache
+JINJA_BYTECODE_CACHE_DIR = os.getenv('JINJA_BYTECODE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'qr_attendance_jinja'))
+TEMPLATE_WARMUP = os.getenv('TEMPLATE_WARMUP', '0') == '1'
+
+class TemplateStats:
+    """Per-template compile and render counters for this process"""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, kind, seconds):
+        with self._lock:
+            entry = self._stats.setdefault(name, {
+                'compile_count': 0, 'compile_seconds': 0.0,
+                'render_count': 0, 'render_seconds': 0.0, 'render_max_seconds': 0.0
+            })
+            entry[f'{kind}_count'] += 1
+            entry[f'{kind}_seconds'] += seconds
+            if kind == 'render':
+                entry['render_max_seconds'] = max(entry['render_max_seconds'], seconds)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(entry) for name, entry in self._stats.items()}
+
+template_stats = TemplateStats()
+
+class TimedEnvironment(Environment):
+    """Flask's Jinja environment, timing each compile from source (bytecode cache misses)"""
+
+    def compile(self, source, name=None, filename=None, raw=False, defer_init=False):
+        started = time.perf_counter()
+        try:
+            return super().compile(source, name, filename, raw, defer_init)
+        finally:
+            if name is not None:
+                template_stats.record(name, 'compile', time.perf_counter() - started)
+
+def _before_render(sender, template, context, **extra):
+    g.setdefault('_template_render_started', {})[template.name] = time.perf_counter()
+
+def _after_render(sender, template, context, **extra):
+    started = g.get('_template_render_started', {}).pop(template.name, None)
+    if started is not None:
+        template_stats.record(template.name, 'render', time.perf_counter() - started)
+
+def warm_up(app):
+    """Load every template so each is compiled (or read from the bytecode cache) before traffic arrives"""
+    started = time.perf_counter()
+    names = app.jinja_env.list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names), time.perf_counter() - started
+
+def init_app(app, cache_dir=JINJA_BYTECODE_CACHE_DIR, warm=TEMPLATE_WARMUP):
+    """Attach the shared bytecode cache and timing hooks; must run before the first render"""
+    app.jinja_environment = TimedEnvironment
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(cache_dir)}
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+    if warm:
+        count, seconds = warm_up(app)
+        app.logger.info('Warmed up %d templates in %.0f ms', count, seconds * 1000)
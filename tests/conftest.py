@@ -0,0 +1,88 @@
+import os
+import sys
+import tempfile
+import uuid
+from datetime import datetime
+
+import pytest
+
+# Configuration is read at import time, so point everything at a scratch
+# directory before the app module is imported
+_scratch = tempfile.mkdtemp(prefix='qr_attendance_tests_')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_scratch, 'test.db'))
+os.environ.setdefault('ATTACHMENTS_DIR', os.path.join(_scratch, 'leave_documents'))
+os.environ.setdefault('CERTIFICATES_DIR', os.path.join(_scratch, 'certificates'))
+os.environ.setdefault('METRICS_DIR', os.path.join(_scratch, 'metrics'))
+os.environ.setdefault('RESPONSE_CACHE_PATH', os.path.join(_scratch, 'cache.db'))
+os.environ.setdefault('ASSETS_BUILD_ON_STARTUP', '0')
+os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def app():
+    import app as app_module
+    app_module.app.config['TESTING'] = True
+    return app_module.app
+
+
+def login(client, username, password, user_type):
+    response = client.post('/login', data={'username': username, 'password': password, 'user_type': user_type})
+    assert response.status_code == 302, response.data[:300]
+    return client
+
+
+@pytest.fixture
+def teacher(app):
+    return login(app.test_client(), 'teacher', 'teacher123', 'teacher')
+
+
+@pytest.fixture
+def student(app):
+    return login(app.test_client(), 'student1@gmail.com', 'student123', 'student')
+
+
+@pytest.fixture
+def admin(app):
+    return login(app.test_client(), 'admin', 'admin123', 'admin')
+
+
+@pytest.fixture
+def db(app):
+    """A pooled connection inside an app context, for checking what a request wrote"""
+    import app as app_module
+    with app.app_context():
+        yield app_module.get_db_connection()
+
+
+@pytest.fixture
+def subject_id(db):
+    """A new subject owned by the seeded teacher (inserted directly; /create_subject is SQLite-only)"""
+    from db_helper import execute_query, get_db_params
+    teacher_id = db.execute("SELECT id FROM users WHERE username = 'teacher'").fetchone()['id']
+    cursor = execute_query(db, f'''
+        INSERT INTO subjects (name, academic_year, division, teacher_id) VALUES (?, ?, ?, ?) {get_db_params()['returning']}
+    ''', (f'Subject {uuid.uuid4().hex[:8]}', '1st Year', 'Section A', teacher_id))
+    subject_id = cursor.fetchone()['id'] if get_db_params()['returning'] else cursor.lastrowid
+    db.commit()
+    return subject_id
+
+
+@pytest.fixture
+def qr_session(teacher, subject_id, db):
+    """A live attendance session: its sessions row id, qr_data and expiry (epoch seconds)"""
+    response = teacher.post('/generate_qr', json={'subject_id': subject_id, 'class_start_time': '2026-01-01T10:00',
+                                                  'class_end_time': '2026-01-01T11:00', 'expiry_seconds': 300})
+    assert response.json['success'], response.json
+    row = db.execute('SELECT id, qr_data, expiry_time FROM sessions WHERE qr_data = ?',
+                     (response.json['session_id'],)).fetchone()
+    expires_at = datetime.strptime(str(row['expiry_time']), '%Y-%m-%d %H:%M:%S').timestamp()
+    return {'id': row['id'], 'qr_data': row['qr_data'], 'expires_at': expires_at}
+
+
+@pytest.fixture
+def scan_token(app, qr_session):
+    """What a student's scanner reads off the QR code right now"""
+    from qr_tokens import issue_token
+    return issue_token(app.secret_key, qr_session['qr_data'], qr_session['expires_at'])
@@ -0,0 +1,69 @@
+import threading
+import uuid
+
+from at_risk import AT_RISK_MIN_SESSIONS, AtRiskScheduler, compute_at_risk
+from db_helper import acquire_connection, get_db_params, release_connection
+
+
+def test_one_scheduler_claims_each_run(db):
+    db.execute('UPDATE at_risk_schedule SET claimed_at = ? WHERE id = 1', ('2000-01-01 00:00:00',))
+    db.commit()
+    schedulers = [AtRiskScheduler(interval_minutes=60) for _ in range(8)]
+    claims = []
+    barrier = threading.Barrier(len(schedulers))
+
+    def claim(scheduler):
+        barrier.wait()
+        claims.append(scheduler._claim())
+
+    threads = [threading.Thread(target=claim, args=(scheduler,)) for scheduler in schedulers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert claims.count(True) == 1
+    # Not due again until the interval has passed
+    assert not AtRiskScheduler(interval_minutes=60)._claim()
+
+
+def _insert(db, statement, params):
+    cursor = db.execute(f'{statement} {get_db_params()["returning"]}', params)
+    return cursor.fetchone()['id'] if get_db_params()['returning'] else cursor.lastrowid
+
+
+def test_absent_and_failing_students_are_flagged(db):
+    # A cohort of its own, so other tests' students and subjects do not interfere
+    year = f'Year {uuid.uuid4().hex[:6]}'
+    teacher_id = db.execute("SELECT id FROM users WHERE username = 'teacher'").fetchone()['id']
+    subject_id = _insert(db, 'INSERT INTO subjects (name, academic_year, division, teacher_id) VALUES (?, ?, ?, ?)',
+                         ('At risk', year, 'Section A', teacher_id))
+    present, absent, failing = (f'{year}-{name}' for name in ('present', 'absent', 'failing'))
+    for student_id in (present, absent, failing):
+        db.execute('INSERT INTO students (student_id, name, academic_year, division) VALUES (?, ?, ?, ?)',
+                   (student_id, student_id, year, 'Section A'))
+    for n in range(AT_RISK_MIN_SESSIONS):
+        session_pk = _insert(db, '''
+            INSERT INTO sessions (qr_data, subject, subject_id, lecture_time, location, expiry_time, is_active)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (uuid.uuid4().hex, 'At risk', subject_id, '10:00', 'R1', '2000-01-01 00:00:00', False))
+        for student_id in (present, failing):
+            db.execute('INSERT INTO attendance (student_id, session_id) VALUES (?, ?)', (student_id, session_pk))
+    for student_id, marks in ((present, 80), (failing, 20)):
+        db.execute('''
+            INSERT INTO results (student_id, subject_id, exam_type, marks_obtained, max_marks, teacher_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (student_id, subject_id, 'midterm', marks, 100, teacher_id))
+    db.commit()
+
+    conn = acquire_connection()
+    try:
+        rows, evaluated = compute_at_risk(conn)
+    finally:
+        release_connection(conn)
+
+    flagged = {row[0]: row for row in rows if row[1] == subject_id}
+    assert set(flagged) == {absent, failing}
+    assert flagged[absent][3:5] == (0, 0.0) and flagged[absent][6] == 'attendance'
+    assert flagged[failing][5] == 20.0 and flagged[failing][6] == 'results'
+    assert evaluated >= 3
@@ -0,0 +1,126 @@
+import hashlib
+import io
+import os
+import uuid
+
+import pytest
+from PIL import Image
+
+import attachment_pipeline
+from attachment_pipeline import process_attachment, repoint_if_moved, thumbnail_path
+from attachments import store_upload
+from db_helper import get_db_params
+
+
+class Upload:
+    def __init__(self, data, filename):
+        self.stream = io.BytesIO(data)
+        self.filename = filename
+
+
+def _png(size):
+    # Random noise would not compress; a fractal is detailed but shrinks well as a JPEG
+    image = Image.effect_mandelbrot(size, (-2, -1.3, 1, 1.2), 90).convert('RGB')
+    # A unique corner pixel, so every test stores its own file
+    image.putpixel((0, 0), tuple(uuid.uuid4().bytes[:3]))
+    out = io.BytesIO()
+    image.save(out, 'PNG')
+    return out.getvalue()
+
+
+@pytest.fixture
+def small_max_dimension(monkeypatch):
+    # Small images are re-encoded too, so the tests stay fast
+    monkeypatch.setattr(attachment_pipeline, 'ATTACHMENT_MAX_DIMENSION', 200)
+
+
+def _apply(db, stored):
+    cursor = db.execute(f'''
+        INSERT INTO leave_applications (student_id, student_name, leave_type, start_date, end_date, reason,
+                                        attachment_path, attachment_name, attachment_sha256)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) {get_db_params()['returning']}
+    ''', ('001', 'Student 1', 'sick', '2026-03-01', '2026-03-02', 'flu', stored.path, stored.filename, stored.sha256))
+    row_id = cursor.fetchone()['id'] if get_db_params()['returning'] else cursor.lastrowid
+    db.commit()
+    return row_id
+
+
+def _attachment(db, row_id):
+    db.commit()
+    return db.execute('SELECT attachment_path, attachment_name, attachment_sha256 FROM leave_applications WHERE id = ?',
+                      (row_id,)).fetchone()
+
+
+def test_image_within_limits_keeps_original(db):
+    stored = store_upload(Upload(_png((120, 80)), 'note.png'))
+    row_id = _apply(db, stored)
+    assert process_attachment(stored.path, stored.filename) == (stored.size, stored.size)
+    assert os.path.exists(thumbnail_path(stored.path))
+    assert _attachment(db, row_id)['attachment_path'] == stored.path
+
+
+def test_reencode_moves_rows_to_the_copy_and_retires_the_original(db, small_max_dimension):
+    data = _png((600, 400))
+    stored = store_upload(Upload(data, 'scan.png'))
+    row_id = _apply(db, stored)
+    original_size, new_size = process_attachment(stored.path, stored.filename)
+    assert new_size < original_size
+
+    row = _attachment(db, row_id)
+    assert row['attachment_path'] != stored.path
+    assert row['attachment_name'] == 'scan.jpg'
+    with open(row['attachment_path'], 'rb') as f:
+        assert hashlib.sha256(f.read()).hexdigest() == row['attachment_sha256']
+    assert os.path.exists(thumbnail_path(row['attachment_path']))
+    assert not os.path.exists(stored.path)
+
+    # An identical upload after the swap resolves to the copy
+    assert store_upload(Upload(data, 'scan.png')).path == row['attachment_path']
+
+
+def test_row_inserted_during_the_swap_is_moved_before_the_original_goes(db, small_max_dimension, monkeypatch):
+    data = _png((600, 400))
+    first = store_upload(Upload(data, 'scan.png'))
+    late = store_upload(Upload(data, 'scan.png'))
+    assert late.path == first.path
+    first_id = _apply(db, first)
+
+    # The identical upload's row lands right after the first pass has moved the existing rows
+    record = attachment_pipeline._record_reencode
+    late_ids = []
+
+    def racing(*args):
+        record(*args)
+        if not late_ids:
+            late_ids.append(_apply(db, late))
+
+    monkeypatch.setattr(attachment_pipeline, '_record_reencode', racing)
+    process_attachment(first.path, first.filename)
+
+    moved = _attachment(db, first_id)['attachment_path']
+    assert moved != first.path and os.path.exists(moved)
+    assert _attachment(db, late_ids[0])['attachment_path'] == moved
+    assert not os.path.exists(first.path)
+
+
+def test_row_inserted_after_the_swap_moves_itself(db, small_max_dimension):
+    data = _png((600, 400))
+    first = store_upload(Upload(data, 'scan.png'))
+    late = store_upload(Upload(data, 'scan.png'))
+    first_id = _apply(db, first)
+    process_attachment(first.path, first.filename)
+
+    late_id = _apply(db, late)
+    assert repoint_if_moved(late.path) == _attachment(db, first_id)['attachment_path']
+    assert _attachment(db, late_id)['attachment_path'] == _attachment(db, first_id)['attachment_path']
+
+
+def test_original_is_kept_while_a_row_still_points_at_it(db, small_max_dimension, monkeypatch, caplog):
+    stored = store_upload(Upload(_png((600, 400)), 'scan.png'))
+    row_id = _apply(db, stored)
+    # Rows that never move (say, a writer that keeps re-inserting) keep the original alive
+    monkeypatch.setattr(attachment_pipeline, '_record_reencode', lambda *args: None)
+    process_attachment(stored.path, stored.filename)
+    assert os.path.exists(stored.path)
+    assert _attachment(db, row_id)['attachment_path'] == stored.path
+    assert 'still referenced' in caplog.text
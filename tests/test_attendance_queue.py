@@ -0,0 +1,56 @@
+import threading
+
+import pytest
+
+import attendance_queue
+from attendance_queue import ACCEPTED, DUPLICATE, AttendanceWriter, PendingScan
+
+
+def test_cancelled_scan_is_never_claimed():
+    scan = PendingScan('001', 1)
+    assert scan.cancel()
+    assert not scan.claim()
+
+
+def test_claimed_scan_cannot_be_cancelled():
+    scan = PendingScan('001', 1)
+    assert scan.claim()
+    assert not scan.cancel()
+
+
+def test_batch_coalesces_scans_and_double_taps(app, qr_session, db):
+    writer = AttendanceWriter(flush_interval_ms=50)
+    student_ids = [f'Q{n:03d}' for n in range(20)]
+    results = {}
+
+    def scan(index, student_id):
+        results[index] = writer.submit(student_id, qr_session['id'])
+
+    threads = [threading.Thread(target=scan, args=(index, student_id))
+               for index, student_id in enumerate(student_ids + student_ids[:5])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert list(results.values()).count(ACCEPTED) == 20
+    assert list(results.values()).count(DUPLICATE) == 5
+    stored = db.execute('SELECT COUNT(*) AS n FROM attendance WHERE session_id = ?', (qr_session['id'],)).fetchone()
+    assert stored['n'] == 20
+
+
+def test_timed_out_scan_is_withdrawn(monkeypatch):
+    writer = AttendanceWriter()
+    # No writer thread, so the scan is still queued when the caller gives up
+    monkeypatch.setattr(writer, '_ensure_started', lambda: None)
+    with pytest.raises(TimeoutError):
+        writer.submit('001', 1, timeout=0.01)
+    assert not writer._queue.get_nowait().claim()
+
+
+def test_queue_mode_marks_once(monkeypatch, student, scan_token):
+    monkeypatch.setattr(attendance_queue, 'ATTENDANCE_WRITE_MODE', 'queue')
+    first = student.post('/mark_attendance', json={'student_id': '001', 'session_id': scan_token})
+    second = student.post('/mark_attendance', json={'student_id': '001', 'session_id': scan_token})
+    assert first.json['success'], first.json
+    assert second.json == {'success': False, 'message': 'Already marked attendance'}
@@ -0,0 +1,58 @@
+import threading
+
+from change_counters import get_change_versions
+from db_helper import acquire_connection, release_connection
+
+
+def _add_leave(db):
+    db.execute('''
+        INSERT INTO leave_applications (student_id, student_name, leave_type, start_date, end_date, reason)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', ('001', 'Student 1', 'sick', '2026-03-01', '2026-03-02', 'flu'))
+    db.commit()
+
+
+def test_unchanged_list_answers_304(teacher):
+    first = teacher.get('/get_leave_applications')
+    assert first.status_code == 200 and first.headers['ETag'].startswith('W/')
+    again = teacher.get('/get_leave_applications', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304 and again.data == b''
+    assert again.headers['ETag'] == first.headers['ETag']
+
+
+def test_write_changes_the_etag(teacher, db):
+    etag = teacher.get('/get_leave_applications').headers['ETag']
+    _add_leave(db)
+    changed = teacher.get('/get_leave_applications', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+
+def test_etag_is_per_viewer(teacher, admin):
+    assert teacher.get('/get_leave_applications').headers['ETag'] != admin.get('/get_leave_applications').headers['ETag']
+
+
+def test_concurrent_writes_are_all_counted(db):
+    before, = get_change_versions(db, ('leave_applications',))
+    db.commit()
+
+    def write(count):
+        conn = acquire_connection()
+        try:
+            for _ in range(count):
+                conn.cursor().execute('''
+                    INSERT INTO leave_applications (student_id, student_name, leave_type, start_date, end_date, reason)
+                    VALUES ('001', 'Student 1', 'sick', '2026-03-01', '2026-03-02', 'flu')
+                ''')
+                conn.commit()
+        finally:
+            release_connection(conn)
+
+    threads = [threading.Thread(target=write, args=(5,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    after, = get_change_versions(db, ('leave_applications',))
+    assert after - before == 20
@@ -0,0 +1,56 @@
+import threading
+
+from conftest import login
+
+
+def _attendance_rows(db, qr_session, student_id='001'):
+    return db.execute('SELECT COUNT(*) AS n FROM attendance WHERE session_id = ? AND student_id = ?',
+                      (qr_session['id'], student_id)).fetchone()['n']
+
+
+def test_second_scan_is_a_no_op(student, scan_token, qr_session, db):
+    first = student.post('/mark_attendance', json={'student_id': '001', 'session_id': scan_token})
+    second = student.post('/mark_attendance', json={'student_id': '001', 'session_id': scan_token})
+    assert first.json['success'], first.json
+    assert second.json == {'success': False, 'message': 'Already marked attendance'}
+    assert _attendance_rows(db, qr_session) == 1
+
+
+def test_unknown_student_is_not_recorded(student, scan_token, qr_session, db):
+    response = student.post('/mark_attendance', json={'student_id': 'nobody', 'session_id': scan_token})
+    assert response.json == {'success': False, 'message': 'Student not found'}
+    assert _attendance_rows(db, qr_session, 'nobody') == 0
+
+
+def test_closed_session_is_not_recorded(student, scan_token, qr_session, db):
+    # The signed token is still fresh; the conditional insert checks the row itself
+    db.execute('UPDATE sessions SET is_active = ? WHERE id = ?', (False, qr_session['id']))
+    db.commit()
+    response = student.post('/mark_attendance', json={'student_id': '001', 'session_id': scan_token})
+    assert response.json == {'success': False, 'message': 'QR code expired or invalid'}
+    assert _attendance_rows(db, qr_session) == 0
+
+
+def test_concurrent_double_taps_store_one_row(app, scan_token, qr_session, db):
+    clients = [login(app.test_client(), 'student1@gmail.com', 'student123', 'student') for _ in range(8)]
+    results = []
+
+    def scan(client):
+        results.append(client.post('/mark_attendance', json={'student_id': '001', 'session_id': scan_token}).json)
+
+    threads = [threading.Thread(target=scan, args=(client,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(result['success'] for result in results) == 1
+    assert _attendance_rows(db, qr_session) == 1
+
+
+def test_unique_index_ignores_repeated_insert(qr_session, db):
+    for _ in range(2):
+        db.execute('INSERT INTO attendance (student_id, session_id) VALUES (?, ?) '
+                   'ON CONFLICT (student_id, session_id) DO NOTHING', ('002', qr_session['id']))
+    db.commit()
+    assert _attendance_rows(db, qr_session, '002') == 1
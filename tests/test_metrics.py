@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+
+import metrics
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def _write_snapshot(directory, pid, count):
+    os.makedirs(directory, exist_ok=True)
+    snapshot = {'pid': pid, 'counters': [['http_requests_total', {'route': '/x', 'method': 'GET', 'status': '200'}, count]],
+                'histograms': [], 'gauges': []}
+    with open(os.path.join(directory, f'{pid}-1.json'), 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f)
+
+
+def _requests_to_x():
+    key = metrics._key('http_requests_total', {'route': '/x', 'method': 'GET', 'status': '200'})
+    return metrics.collect().get(key, 0)
+
+
+def test_collect_merges_only_this_servers_snapshots():
+    other_server = os.path.join(metrics.METRICS_DIR, str(os.getppid()))
+    _write_snapshot(other_server, 1, 7)
+    _write_snapshot(metrics._server_dir(), _dead_pid(), 3)
+    # A recycled worker's counts stay; another live server's do not
+    assert _requests_to_x() == 3
+    metrics.clear()
+    assert _requests_to_x() == 0
+    assert os.path.isdir(other_server)
+
+
+def test_prune_removes_exited_servers_and_legacy_files():
+    dead_server = os.path.join(metrics.METRICS_DIR, str(_dead_pid()))
+    _write_snapshot(dead_server, 1, 5)
+    legacy = os.path.join(metrics.METRICS_DIR, '123-1.json')
+    with open(legacy, 'w', encoding='utf-8') as f:
+        f.write('{}')
+    metrics.prune()
+    assert not os.path.exists(dead_server)
+    assert not os.path.exists(legacy)
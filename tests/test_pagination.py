@@ -0,0 +1,58 @@
+import uuid
+
+import pytest
+
+from pagination import decode_cursor, encode_cursor, keyset_clause
+
+MARKED_AT = ['2026-02-01 09:00:00'] * 4 + ['2026-02-02 09:00:00', '2026-02-03 09:00:00', '2026-02-03 10:00:00']
+
+
+@pytest.fixture
+def marked(qr_session, db):
+    """Seven attendance rows in one subject; four share a timestamp, so only the id breaks the tie"""
+    prefix = uuid.uuid4().hex[:6]
+    student_ids = [f'{prefix}-{n}' for n in range(len(MARKED_AT))]
+    for student_id, marked_at in zip(student_ids, MARKED_AT):
+        db.execute('INSERT INTO students (student_id, name) VALUES (?, ?)', (student_id, f'Student {student_id}'))
+        db.execute('INSERT INTO attendance (student_id, session_id, marked_at) VALUES (?, ?, ?)',
+                   (student_id, qr_session['id'], marked_at))
+    db.commit()
+    return student_ids
+
+
+def _walk(client, query):
+    pages, cursor = [], None
+    while True:
+        response = client.get(f'/get_attendance?{query}' + (f'&cursor={cursor}' if cursor else ''))
+        assert response.status_code == 200
+        pages.append([record['student_id'] for record in response.json])
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            return pages
+        assert 'rel="next"' in response.headers['Link']
+
+
+def test_keyset_walk_returns_every_row_once_newest_first(teacher, subject_id, marked):
+    pages = _walk(teacher, f'subject_id={subject_id}&limit=3')
+    assert [len(page) for page in pages] == [3, 3, 1]
+    walked = [student_id for page in pages for student_id in page]
+    # Newest first; equal timestamps come back in descending id order
+    assert walked == list(reversed(marked))
+
+
+def test_date_and_student_filters(teacher, subject_id, marked):
+    pages = _walk(teacher, f'subject_id={subject_id}&from=2026-02-01&to=2026-02-01&limit=2')
+    assert sorted(student_id for page in pages for student_id in page) == sorted(marked[:4])
+    response = teacher.get(f'/get_attendance?student_id={marked[5]}')
+    assert [record['student_id'] for record in response.json] == [marked[5]]
+
+
+@pytest.mark.parametrize('query', ['cursor=not-a-cursor', 'limit=0', 'from=02/01/2026'])
+def test_bad_page_arguments_are_rejected(teacher, query):
+    assert teacher.get(f'/get_attendance?{query}').status_code == 400
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(['2026-02-01 09:00:00', 42])) == ['2026-02-01 09:00:00', 42]
+    with pytest.raises(ValueError):
+        keyset_clause(['marked_at', 'id'], ['2026-02-01 09:00:00'])
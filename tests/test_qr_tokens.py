@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from qr_tokens import (InvalidToken, QR_CODE_ROTATE_SECONDS, QR_TOKEN_GRACE_SECONDS, QR_TOKEN_ROTATE_SECONDS,
+                       issue_token, manual_code, match_manual_code, verify_token)
+from session_index import ActiveSessionIndex
+
+SECRET = 'test-secret'
+NOW = 1_800_000_000
+
+
+def test_token_round_trip():
+    token = issue_token(SECRET, 'SESSION1', NOW + 300, issued_at=NOW)
+    assert verify_token(SECRET, token, now=NOW + 1) == ('SESSION1', NOW + 300)
+
+
+@pytest.mark.parametrize('tamper', [
+    lambda token: token.replace('SESSION1', 'SESSION2'),
+    lambda token: token[:-2] + ('AA' if not token.endswith('AA') else 'BB'),
+    lambda token: 'not-a-token',
+])
+def test_tampered_token_is_rejected(tamper):
+    token = issue_token(SECRET, 'SESSION1', NOW + 300, issued_at=NOW)
+    with pytest.raises(InvalidToken):
+        verify_token(SECRET, tamper(token), now=NOW)
+
+
+def test_other_secret_is_rejected():
+    token = issue_token('another-secret', 'SESSION1', NOW + 300, issued_at=NOW)
+    with pytest.raises(InvalidToken, match='signature'):
+        verify_token(SECRET, token, now=NOW)
+
+
+def test_stale_and_expired_tokens_are_rejected():
+    token = issue_token(SECRET, 'SESSION1', NOW + 300, issued_at=NOW)
+    with pytest.raises(InvalidToken, match='no longer current'):
+        verify_token(SECRET, token, now=NOW + QR_TOKEN_ROTATE_SECONDS + QR_TOKEN_GRACE_SECONDS + 1)
+    with pytest.raises(InvalidToken, match='expired'):
+        verify_token(SECRET, issue_token(SECRET, 'SESSION1', NOW + 5, issued_at=NOW), now=NOW + 6)
+
+
+def test_manual_code_matches_current_and_previous_window():
+    window = NOW // QR_CODE_ROTATE_SECONDS
+    code = manual_code(SECRET, 'SESSION1', window)
+    assert match_manual_code(SECRET, code, ['SESSION0', 'SESSION1'], now=NOW) == 'SESSION1'
+    assert match_manual_code(SECRET, code.lower(), ['SESSION1'], now=NOW + QR_CODE_ROTATE_SECONDS) == 'SESSION1'
+    assert match_manual_code(SECRET, code, ['SESSION1'], now=NOW + 2 * QR_CODE_ROTATE_SECONDS) is None
+
+
+def test_manual_code_is_typed_without_confusables():
+    code = manual_code(SECRET, 'SESSION1', NOW // QR_CODE_ROTATE_SECONDS)
+    typed = code[:3] + '-' + code[3:].replace('0', 'O').replace('1', 'l')
+    assert match_manual_code(SECRET, typed, ['SESSION1'], now=NOW) == 'SESSION1'
+
+
+def _session_row(qr_data, minutes=10):
+    expiry = (datetime.now() + timedelta(minutes=minutes)).strftime('%Y-%m-%d %H:%M:%S')
+    return {'id': 1, 'qr_data': qr_data, 'subject': 'Math', 'lecture_time': '10:00', 'expiry_time': expiry}
+
+
+def test_index_miss_falls_back_to_one_read(tmp_path):
+    index = ActiveSessionIndex(stamp_path=str(tmp_path / 'stamp'))
+    fetches = []
+
+    def fetch(row):
+        fetches.append(row)
+        return row
+
+    # Created on another host: not in this index and no stamp change, so it is read once
+    entry = index.lookup('REMOTE', lambda: [], lambda: fetch(_session_row('REMOTE')))
+    assert entry['qr_data'] == 'REMOTE'
+    assert index.lookup('REMOTE', lambda: [], lambda: fetch(None))['qr_data'] == 'REMOTE'
+    # Unknown codes are read once and then remembered as misses
+    assert index.lookup('UNKNOWN', lambda: [], lambda: fetch(None)) is None
+    assert index.lookup('UNKNOWN', lambda: [], lambda: fetch(None)) is None
+    assert len(fetches) == 2
+
+
+def test_index_add_clears_a_remembered_miss(tmp_path):
+    index = ActiveSessionIndex(stamp_path=str(tmp_path / 'stamp'))
+    assert index.lookup('LATE', lambda: [], lambda: None) is None
+    index.add(_session_row('LATE'))
+    assert index.lookup('LATE', lambda: [_session_row('LATE')], lambda: None)['qr_data'] == 'LATE'
+
+
+def test_scan_with_manual_code(app, student, qr_session, db):
+    code = manual_code(app.secret_key, qr_session['qr_data'])
+    response = student.post('/mark_attendance', json={'student_id': '001', 'code': code})
+    assert response.json['success'], response.json
+    assert student.post('/mark_attendance', json={'student_id': '001', 'code': 'ZZZZZZ'}).json['success'] is False
+
+
+def test_scan_with_forged_token_is_rejected(student, qr_session):
+    forged = issue_token('not-the-app-secret', qr_session['qr_data'], qr_session['expires_at'])
+    response = student.post('/mark_attendance', json={'student_id': '001', 'session_id': forged})
+    assert response.json == {'success': False, 'message': 'QR code expired or invalid'}
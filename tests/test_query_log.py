@@ -0,0 +1,29 @@
+import pytest
+
+from query_log import explain, query_budget, statement_shape
+
+
+def test_statement_shape_folds_literals_and_in_lists():
+    assert statement_shape("SELECT * FROM t WHERE a = 'x' AND b IN (?, ?, ?) AND c = 3") == \
+        'SELECT * FROM t WHERE a = ? AND b IN (?) AND c = ?'
+
+
+def test_query_budget_counts_request_statements(teacher):
+    with query_budget(50) as capture:
+        assert teacher.get('/get_attendance').status_code == 200
+    assert capture.count > 0
+
+
+def test_query_budget_fails_over_budget(teacher):
+    with pytest.raises(AssertionError, match='budget is 0'):
+        with query_budget(0):
+            teacher.get('/get_attendance')
+
+
+def test_explain_failure_leaves_transaction_usable(db):
+    cursor = db.cursor()
+    cursor.execute('SELECT 1')
+    with pytest.raises(Exception):
+        explain(cursor, 'SELECT * FROM no_such_table', None)
+    cursor.execute('SELECT COUNT(*) AS n FROM users')
+    assert cursor.fetchone()['n'] > 0